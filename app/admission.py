@@ -0,0 +1,312 @@
+"""
+Admission control.
+
+Requests are admitted (or rejected early, with ``Retry-After``) in two
+places:
+
+- :class:`AdmissionMiddleware` applies a per-client token bucket to every
+  API request and sheds load with 503 when the estimated queue wait for a
+  request slot exceeds the latency SLO.
+- :meth:`AdmissionController.llm_slot` guards Gemini generations: a separate,
+  much smaller per-client bucket, a global cap on in-flight generations and
+  the same SLO-based shedding on the generation queue.
+
+Clients are identified by their ``X-API-Key`` header, or by IP address.
+Rejecting early keeps queues short, so admitted requests keep a stable p99
+under bursts instead of every request waiting behind the burst.
+"""
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AbstractSet, AsyncIterator, Dict, Iterable, Optional, Tuple
+import asyncio
+import json
+import math
+import time
+
+# Paths never subject to admission control (probes and docs)
+EXEMPT_PATHS = ("/health", "/docs", "/redoc", "/openapi.json")
+
+# Longest Retry-After sent (a rate of 0 never refills: the wait is infinite)
+MAX_RETRY_AFTER_SECONDS = 3600
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused admission"""
+    
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+    
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Response headers telling the client when to retry"""
+        return {"Retry-After": str(max(1, math.ceil(min(self.retry_after, MAX_RETRY_AFTER_SECONDS))))}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second"""
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+    
+    def take(self, now: Optional[float] = None) -> float:
+        """
+        Take one token if available
+        
+        Args:
+            now: Monotonic time (default: now)
+        
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class RateLimiter:
+    """Per-client token buckets, keeping at most ``max_clients`` buckets"""
+    
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+    
+    def check(self, client: str, now: Optional[float] = None) -> float:
+        """
+        Take a token from a client's bucket
+        
+        Args:
+            client: Client key
+            now: Monotonic time (default: now)
+        
+        Returns:
+            0 if admitted, otherwise seconds until the client may retry
+        """
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[client] = bucket
+            # Least recently seen clients are forgotten (they start with a full bucket)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take(now)
+
+
+class ConcurrencyGate:
+    """
+    Concurrency limit with SLO-based load shedding
+    
+    The expected wait of a new arrival is estimated from the number of
+    requests ahead of it and a moving average of how long each one holds a
+    slot; arrivals that would wait longer than the SLO are refused.
+    """
+    
+    def __init__(self, limit: int, slo_seconds: float, initial_service_seconds: float = 0.05):
+        self.limit = limit
+        self.slo_seconds = slo_seconds
+        self.service_seconds = initial_service_seconds
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+    
+    def estimated_wait(self) -> float:
+        """Expected queue wait in seconds for a request arriving now"""
+        ahead = self.in_flight + self.waiting - self.limit + 1
+        if ahead <= 0:
+            return 0.0
+        return ahead * self.service_seconds / self.limit
+    
+    def admit(self, what: str) -> None:
+        """
+        Refuse an arrival whose estimated wait exceeds the SLO
+        
+        Args:
+            what: Name of the guarded resource, used in the rejection message
+        
+        Raises:
+            AdmissionRejected: 503 with the estimated wait as Retry-After
+        """
+        wait = self.estimated_wait()
+        if wait > self.slo_seconds:
+            raise AdmissionRejected(503, wait, f"Server overloaded: {what} queue is full, retry later")
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one slot for the duration of the block, waiting for it if needed"""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        
+        self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            # Exponential moving average of slot hold time
+            self.service_seconds += 0.1 * (time.monotonic() - start - self.service_seconds)
+
+
+class AdmissionController:
+    """Rate limits and concurrency gates for the API and the LLM path"""
+    
+    def __init__(
+        self,
+        enabled: bool = True,
+        rate_per_second: float = 50.0,
+        burst: float = 100.0,
+        llm_rate_per_second: float = 1.0,
+        llm_burst: float = 5.0,
+        max_in_flight: int = 64,
+        llm_max_concurrency: int = 8,
+        slo_seconds: float = 2.0,
+        llm_slo_seconds: float = 10.0
+    ):
+        self.enabled = enabled
+        self.requests = RateLimiter(rate_per_second, burst)
+        self.llm_requests = RateLimiter(llm_rate_per_second, llm_burst)
+        self.request_gate = ConcurrencyGate(max_in_flight, slo_seconds)
+        self.llm_gate = ConcurrencyGate(llm_max_concurrency, llm_slo_seconds, initial_service_seconds=2.0)
+        self.rejected: Dict[Tuple[int, str], int] = {}
+    
+    @asynccontextmanager
+    async def request_slot(self, client: str) -> AsyncIterator[None]:
+        """
+        Admit one API request for the duration of the block
+        
+        Args:
+            client: Client key
+        
+        Raises:
+            AdmissionRejected: 429 over the client's rate, 503 when overloaded
+        """
+        if not self.enabled:
+            yield
+            return
+        
+        retry_after = self.requests.check(client)
+        if retry_after:
+            raise self._reject(AdmissionRejected(429, retry_after, "Rate limit exceeded"), "request")
+        self._admit(self.request_gate, "request", "request")
+        async with self.request_gate.slot():
+            yield
+    
+    @asynccontextmanager
+    async def llm_slot(self, client: str) -> AsyncIterator[None]:
+        """
+        Admit one LLM generation for the duration of the block
+        
+        Args:
+            client: Client key
+        
+        Raises:
+            AdmissionRejected: 429 over the client's LLM rate, 503 when the
+                generation queue would exceed the LLM SLO
+        """
+        if not self.enabled:
+            yield
+            return
+        
+        retry_after = self.llm_requests.check(client)
+        if retry_after:
+            raise self._reject(AdmissionRejected(429, retry_after, "LLM rate limit exceeded"), "llm")
+        self._admit(self.llm_gate, "LLM generation", "llm")
+        async with self.llm_gate.slot():
+            yield
+    
+    def _admit(self, gate: ConcurrencyGate, what: str, path: str) -> None:
+        """Apply a gate's SLO check, counting rejections"""
+        try:
+            gate.admit(what)
+        except AdmissionRejected as e:
+            raise self._reject(e, path)
+    
+    def _reject(self, error: AdmissionRejected, path: str) -> AdmissionRejected:
+        """Count a rejection by status code and path"""
+        key = (error.status_code, path)
+        self.rejected[key] = self.rejected.get(key, 0) + 1
+        return error
+
+
+def client_key(
+    headers: Dict[str, str],
+    client_host: Optional[str],
+    api_keys: AbstractSet[str] = frozenset()
+) -> str:
+    """
+    Identify the client of a request
+    
+    Unknown API keys are ignored: otherwise a client could send a fresh key
+    with every request, get a full burst each time and evict real clients'
+    buckets.
+    
+    Args:
+        headers: Request headers (lower-case names)
+        client_host: Peer IP address
+        api_keys: API keys that identify a client
+    
+    Returns:
+        ``key:<api key>`` when a known API key is sent, else ``ip:<address>``
+    """
+    api_key = headers.get("x-api-key")
+    if api_key and api_key in api_keys:
+        return f"key:{api_key}"
+    return f"ip:{client_host or 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying :meth:`AdmissionController.request_slot`"""
+    
+    def __init__(self, app, controller: AdmissionController, api_keys: Iterable[str] = ()):
+        self.app = app
+        self.controller = controller
+        self.api_keys = frozenset(api_keys)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+        
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        client = client_key(headers, scope["client"][0] if scope.get("client") else None, self.api_keys)
+        scope.setdefault("state", {})["client_key"] = client
+        
+        started = False
+        
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+        
+        try:
+            async with self.controller.request_slot(client):
+                await self.app(scope, receive, tracking_send)
+        except AdmissionRejected as e:
+            if started:
+                raise
+            await self._send_rejection(send, e)
+    
+    async def _send_rejection(self, send, error: AdmissionRejected) -> None:
+        """Send a JSON error response for a rejected request"""
+        body = json.dumps({"detail": error.detail}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        headers += [(k.lower().encode(), v.encode()) for k, v in error.headers.items()]
+        await send({"type": "http.response.start", "status": error.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
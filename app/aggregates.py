@@ -0,0 +1,228 @@
+"""
+Materialized enrollment rollups.
+
+``course_enrollment_rollups`` (course, year) and ``category_grade_rollups``
+(category, grade) hold pre-aggregated enrollment counts. SQLite triggers
+keep them current incrementally; :func:`refresh_aggregates` rebuilds them
+from scratch for maintenance or after bulk changes made with triggers off.
+
+:class:`AggregateRewriter` recognises generated queries that re-aggregate
+``enrollments`` and rewrites them to read the rollups instead, so their cost
+depends on the number of courses/categories rather than on enrollments.
+"""
+import re
+from typing import Callable, List, Pattern, Tuple
+
+from sqlalchemy import text
+
+
+AGGREGATE_TRIGGERS: List[str] = [
+    # New enrollment: +1 on both rollups
+    """CREATE TRIGGER IF NOT EXISTS enrollments_rollup_ai AFTER INSERT ON enrollments BEGIN
+        INSERT INTO course_enrollment_rollups(course_id, year, enrollment_count)
+        VALUES (new.course_id, IFNULL(strftime('%Y', new.enrolled_at), ''), 1)
+        ON CONFLICT(course_id, year) DO UPDATE SET enrollment_count = enrollment_count + 1;
+        INSERT INTO category_grade_rollups(category, grade, enrollment_count)
+        SELECT c.category, s.grade, 1 FROM courses c, students s
+        WHERE c.id = new.course_id AND s.id = new.student_id
+        ON CONFLICT(category, grade) DO UPDATE SET enrollment_count = enrollment_count + 1;
+    END""",
+    # Removed enrollment: -1 on both rollups
+    """CREATE TRIGGER IF NOT EXISTS enrollments_rollup_ad AFTER DELETE ON enrollments BEGIN
+        UPDATE course_enrollment_rollups SET enrollment_count = enrollment_count - 1
+        WHERE course_id = old.course_id AND year = IFNULL(strftime('%Y', old.enrolled_at), '');
+        UPDATE category_grade_rollups SET enrollment_count = enrollment_count - 1
+        WHERE category = (SELECT category FROM courses WHERE id = old.course_id)
+          AND grade = (SELECT grade FROM students WHERE id = old.student_id);
+    END""",
+    # Moved enrollment: -1 on the old keys, +1 on the new ones
+    """CREATE TRIGGER IF NOT EXISTS enrollments_rollup_au AFTER UPDATE OF student_id, course_id, enrolled_at ON enrollments BEGIN
+        UPDATE course_enrollment_rollups SET enrollment_count = enrollment_count - 1
+        WHERE course_id = old.course_id AND year = IFNULL(strftime('%Y', old.enrolled_at), '');
+        UPDATE category_grade_rollups SET enrollment_count = enrollment_count - 1
+        WHERE category = (SELECT category FROM courses WHERE id = old.course_id)
+          AND grade = (SELECT grade FROM students WHERE id = old.student_id);
+        INSERT INTO course_enrollment_rollups(course_id, year, enrollment_count)
+        VALUES (new.course_id, IFNULL(strftime('%Y', new.enrolled_at), ''), 1)
+        ON CONFLICT(course_id, year) DO UPDATE SET enrollment_count = enrollment_count + 1;
+        INSERT INTO category_grade_rollups(category, grade, enrollment_count)
+        SELECT c.category, s.grade, 1 FROM courses c, students s
+        WHERE c.id = new.course_id AND s.id = new.student_id
+        ON CONFLICT(category, grade) DO UPDATE SET enrollment_count = enrollment_count + 1;
+    END""",
+    # Course changes category: move that course's counts between categories
+    """CREATE TRIGGER IF NOT EXISTS courses_rollup_au AFTER UPDATE OF category ON courses BEGIN
+        UPDATE category_grade_rollups SET enrollment_count = enrollment_count - (
+            SELECT COUNT(*) FROM enrollments e JOIN students s ON s.id = e.student_id
+            WHERE e.course_id = old.id AND s.grade = category_grade_rollups.grade
+        ) WHERE category = old.category;
+        INSERT INTO category_grade_rollups(category, grade, enrollment_count)
+        SELECT new.category, s.grade, COUNT(*) FROM enrollments e JOIN students s ON s.id = e.student_id
+        WHERE e.course_id = new.id GROUP BY s.grade
+        ON CONFLICT(category, grade) DO UPDATE SET enrollment_count = enrollment_count + excluded.enrollment_count;
+    END""",
+    # Student changes grade: move that student's counts between grades
+    """CREATE TRIGGER IF NOT EXISTS students_rollup_au AFTER UPDATE OF grade ON students BEGIN
+        UPDATE category_grade_rollups SET enrollment_count = enrollment_count - (
+            SELECT COUNT(*) FROM enrollments e JOIN courses c ON c.id = e.course_id
+            WHERE e.student_id = old.id AND c.category = category_grade_rollups.category
+        ) WHERE grade = old.grade;
+        INSERT INTO category_grade_rollups(category, grade, enrollment_count)
+        SELECT c.category, new.grade, COUNT(*) FROM enrollments e JOIN courses c ON c.id = e.course_id
+        WHERE e.student_id = new.id GROUP BY c.category
+        ON CONFLICT(category, grade) DO UPDATE SET enrollment_count = enrollment_count + excluded.enrollment_count;
+    END""",
+]
+
+REFRESH_STATEMENTS: List[str] = [
+    "DELETE FROM course_enrollment_rollups",
+    """INSERT INTO course_enrollment_rollups(course_id, year, enrollment_count)
+       SELECT course_id, IFNULL(strftime('%Y', enrolled_at), ''), COUNT(*)
+       FROM enrollments GROUP BY 1, 2""",
+    "DELETE FROM category_grade_rollups",
+    """INSERT INTO category_grade_rollups(category, grade, enrollment_count)
+       SELECT c.category, s.grade, COUNT(*)
+       FROM enrollments e JOIN courses c ON c.id = e.course_id JOIN students s ON s.id = e.student_id
+       GROUP BY 1, 2""",
+]
+
+
+def install_aggregates(target, connection, **kw) -> None:
+    """
+    Create the rollup maintenance triggers (metadata ``after_create`` hook)
+
+    Rollups are back-filled when they are empty but enrollments already
+    exist, e.g. the first start after upgrading an existing database.
+
+    Args:
+        target: MetaData being created
+        connection: Connection used for DDL
+    """
+    if connection.dialect.name != "sqlite":
+        return
+
+    for statement in AGGREGATE_TRIGGERS:
+        connection.execute(text(statement))
+
+    needs_backfill = connection.execute(text(
+        "SELECT NOT EXISTS (SELECT 1 FROM course_enrollment_rollups) "
+        "AND EXISTS (SELECT 1 FROM enrollments)"
+    )).scalar()
+    if needs_backfill:
+        refresh_aggregates(connection)
+
+
+def refresh_aggregates(connection) -> None:
+    """
+    Rebuild all rollup tables from ``enrollments``
+
+    Args:
+        connection: Connection or Session to run the refresh on
+    """
+    for statement in REFRESH_STATEMENTS:
+        connection.execute(text(statement))
+
+
+# --- Query rewriting ---------------------------------------------------------
+
+_JOIN = (
+    r"(?:courses (?P<c>\w+) join enrollments (?P<e>\w+) on (?P=c)\.id = (?P=e)\.course_id"
+    r"|enrollments (?P<e2>\w+) join courses (?P<c2>\w+) on (?P=e2)\.course_id = (?P=c2)\.id)"
+)
+_COUNT = r"count\((?:\*|\w+\.id|\w+\.student_id)\)"
+
+_TOP_COURSES = re.compile(
+    r"^select (?P<ca>\w+)\.name, " + _COUNT + r" as (?P<alias>\w+) from " + _JOIN +
+    r" group by (?P=ca)\.(?P<group>id|name)(?:, (?P=ca)\.(?P<group2>id|name))?"
+    r"(?: order by (?:(?P=alias)|" + _COUNT + r") (?P<dir>desc|asc))?(?: limit (?P<limit>\d+))?$",
+    re.IGNORECASE,
+)
+_TOTAL_ENROLLMENTS = re.compile(
+    r"^select " + _COUNT + r"(?: as (?P<alias>\w+))? from enrollments(?: \w+)?$",
+    re.IGNORECASE,
+)
+_ENROLLMENTS_IN_YEAR = re.compile(
+    r"^select " + _COUNT + r"(?: as (?P<alias>\w+))? from enrollments(?: (?P<e>\w+))?"
+    r" where strftime\('%Y', (?:\w+\.)?enrolled_at\) = '(?P<year>\d{4})'$",
+    re.IGNORECASE,
+)
+_ENROLLMENTS_BY_CATEGORY = re.compile(
+    r"^select (?P<ca>\w+)\.category, " + _COUNT + r" as (?P<alias>\w+) from " + _JOIN +
+    r" group by (?P=ca)\.category"
+    r"(?: order by (?:(?P=alias)|" + _COUNT + r") (?P<dir>desc|asc))?(?: limit (?P<limit>\d+))?$",
+    re.IGNORECASE,
+)
+
+
+def _order_limit(match: "re.Match", alias: str) -> str:
+    clause = ""
+    if match.group("dir"):
+        clause += f" ORDER BY {alias} {match.group('dir').upper()}"
+    if match.group("limit"):
+        clause += f" LIMIT {int(match.group('limit'))}"
+    return clause
+
+
+def _top_courses(match: "re.Match") -> str:
+    alias = match.group("alias")
+    # Grouping by name alone merges courses that share a name; keep that
+    group = "r.course_id" if "id" in (match.group("group"), match.group("group2")) else "c.name"
+    return (
+        f"SELECT c.name, SUM(r.enrollment_count) AS {alias} "
+        f"FROM course_enrollment_rollups r JOIN courses c ON c.id = r.course_id "
+        f"GROUP BY {group} HAVING SUM(r.enrollment_count) > 0" + _order_limit(match, alias)
+    )
+
+
+def _total_enrollments(match: "re.Match") -> str:
+    alias = match.group("alias") or "enrollment_count"
+    return f"SELECT IFNULL(SUM(enrollment_count), 0) AS {alias} FROM course_enrollment_rollups"
+
+
+def _enrollments_in_year(match: "re.Match") -> str:
+    alias = match.group("alias") or "enrollment_count"
+    return (
+        f"SELECT IFNULL(SUM(enrollment_count), 0) AS {alias} FROM course_enrollment_rollups "
+        f"WHERE year = '{match.group('year')}'"
+    )
+
+
+def _enrollments_by_category(match: "re.Match") -> str:
+    alias = match.group("alias")
+    return (
+        f"SELECT category, SUM(enrollment_count) AS {alias} FROM category_grade_rollups "
+        f"GROUP BY category HAVING SUM(enrollment_count) > 0" + _order_limit(match, alias)
+    )
+
+
+class AggregateRewriter:
+    """Rewrites enrollment re-aggregations to read the materialized rollups"""
+
+    def __init__(self):
+        self.rules: List[Tuple[Pattern, Callable[["re.Match"], str]]] = [
+            (_TOP_COURSES, _top_courses),
+            (_TOTAL_ENROLLMENTS, _total_enrollments),
+            (_ENROLLMENTS_IN_YEAR, _enrollments_in_year),
+            (_ENROLLMENTS_BY_CATEGORY, _enrollments_by_category),
+        ]
+
+    def rewrite(self, sql: str) -> str:
+        """
+        Rewrite a query to use the rollups when it matches a known shape
+
+        Args:
+            sql: Generated SQL query
+
+        Returns:
+            Equivalent rollup query, or the original SQL if no rule matches
+        """
+        normalized = self._normalize(sql)
+        for pattern, build in self.rules:
+            match = pattern.match(normalized)
+            if match:
+                return build(match)
+        return sql
+
+    def _normalize(self, sql: str) -> str:
+        """Collapse whitespace and drop a trailing semicolon"""
+        return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
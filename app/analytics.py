@@ -1,30 +1,79 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, desc
-from app.models import QueryLog
-from typing import List, Dict, Any, Optional
+from app.models import QueryLog, QueryLogArchiveDay
+from app.sketches import SpaceSaving, SlidingWindowTopK
+from typing import List, Dict, Any, Optional, Iterable
+from datetime import datetime, timedelta, timezone
+import json
 import re
-from collections import Counter
+import threading
+import time
+
+# Common stop words to exclude
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from',
+    'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on', 'that', 'the',
+    'to', 'was', 'were', 'will', 'with', 'how', 'many', 'what', 'when',
+    'where', 'who', 'which', 'did', 'do', 'does'
+}
+
+# Counters kept by each keyword sketch; bounds memory regardless of traffic
+KEYWORD_SKETCH_CAPACITY = 1000
+
+
+def extract_words(question: str) -> List[str]:
+    """
+    Tokenize a question into analytics keywords
+    
+    Args:
+        question: Question string
+    
+    Returns:
+        Lowercase words with stop words and short words removed
+    """
+    words = re.findall(r'\b[a-z]+\b', question.lower())
+    return [w for w in words if w not in STOP_WORDS and len(w) > 2]
 
 
 class AnalyticsService:
     """Service for query analytics"""
     
-    def get_stats(self, db: Session) -> Dict[str, Any]:
+    def __init__(self):
+        self.trends = SlidingWindowTopK(capacity=KEYWORD_SKETCH_CAPACITY)
+        # Newest query log id already counted in the trends (None: not loaded)
+        self._trends_last_id: Optional[int] = None
+        self._trends_lock = threading.Lock()
+    
+    def get_stats(self, db: Session, window: Optional[str] = None) -> Dict[str, Any]:
         """
         Get analytics statistics
         
         Args:
             db: Database session
-            
+            window: Optional keyword window ("hour", "day" or "week");
+                all-time keywords when omitted
+        
         Returns:
             Dictionary containing analytics stats
         """
-        # Total number of queries
-        total_queries = db.query(QueryLog).count()
+        # Total number of queries, live and archived
+        archived_queries = db.query(func.sum(QueryLogArchiveDay.query_count)).scalar() or 0
+        total_queries = db.query(QueryLog).count() + archived_queries
         
-        # Get all questions for keyword analysis
-        queries = db.query(QueryLog.question).all()
-        keywords = self._extract_keywords([q[0] for q in queries])
+        # Keyword analysis
+        if window:
+            self._sync_trends(db)
+            keywords = [
+                {"keyword": word, "count": count}
+                for word, count in self.trends.top(window, 10)
+            ]
+        else:
+            questions = (q[0] for q in db.query(QueryLog.question).yield_per(1000))
+            archived_keywords = (
+                json.loads(k[0]) for k in db.query(QueryLogArchiveDay.keywords).yield_per(100)
+            ) if archived_queries else ()
+            keywords = self._extract_keywords(questions, archived_keywords)
         
         # Get slowest query
         slowest_query = db.query(QueryLog).order_by(desc(QueryLog.execution_time)).first()
@@ -38,42 +87,145 @@ class AnalyticsService:
                 "created_at": slowest_query.created_at.isoformat()
             }
         
+        if archived_queries:
+            slowest_archived = (
+                db.query(QueryLogArchiveDay)
+                .order_by(desc(QueryLogArchiveDay.slowest_execution_time))
+                .first()
+            )
+            if slowest_archived and (
+                slowest_query_data is None
+                or slowest_archived.slowest_execution_time > slowest_query_data["execution_time_ms"]
+            ):
+                slowest_query_data = {
+                    "question": slowest_archived.slowest_question,
+                    "generated_sql": slowest_archived.slowest_sql,
+                    "execution_time_ms": slowest_archived.slowest_execution_time,
+                    "created_at": slowest_archived.slowest_created_at.isoformat()
+                }
+        
         return {
             "total_queries": total_queries,
             "most_common_keywords": keywords,
             "slowest_query": slowest_query_data
         }
     
-    def _extract_keywords(self, questions: List[str]) -> List[Dict[str, Any]]:
+    async def get_stats_async(self, db: AsyncSession, window: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async version of :meth:`get_stats`
+        
+        Runs the same ORM queries through ``AsyncSession.run_sync``, so the
+        database round trips await the async driver instead of blocking
+        the event loop.
+        
+        Args:
+            db: Async database session
+            window: Optional keyword window ("hour", "day" or "week")
+        
+        Returns:
+            Dictionary containing analytics stats
+        """
+        return await db.run_sync(self.get_stats, window)
+    
+    def get_stats_version(self, db: Session, window: Optional[str] = None) -> List[Any]:
+        """
+        Cheap fingerprint of everything :meth:`get_stats` reads
+        
+        New query logs raise the newest log id, retention runs change the
+        archived totals, and a windowed trend also changes when its oldest
+        bucket slides out, so equal fingerprints mean equal stats.
+        
+        Args:
+            db: Database session
+            window: Keyword window, as passed to :meth:`get_stats`
+        
+        Returns:
+            List of version values
+        """
+        newest_log = db.query(func.max(QueryLog.id)).scalar() or 0
+        archived = db.query(
+            func.count(QueryLogArchiveDay.day), func.coalesce(func.sum(QueryLogArchiveDay.query_count), 0)
+        ).one()
+        version: List[Any] = [newest_log, archived[0], archived[1], window]
+        if window:
+            width, _ = self.trends.WINDOWS[window]
+            version.append(int(time.time() // width))
+        return version
+    
+    async def get_stats_version_async(self, db: AsyncSession, window: Optional[str] = None) -> List[Any]:
+        """
+        Async version of :meth:`get_stats_version`
+        
+        Args:
+            db: Async database session
+            window: Keyword window
+        
+        Returns:
+            List of version values
+        """
+        return await db.run_sync(self.get_stats_version, window)
+    
+    def _sync_trends(self, db: Session) -> None:
+        """
+        Catch the keyword trends up with the query log
+        
+        The first call loads the last week of questions; later calls add
+        only rows past the newest id already counted. Reading the shared
+        log, rather than this process's own queries, gives every worker
+        the same trends.
+        
+        Args:
+            db: Database session
+        """
+        with self._trends_lock:
+            query = db.query(QueryLog.id, QueryLog.question, QueryLog.created_at)
+            if self._trends_last_id is None:
+                # Start the cursor at the newest row, so an empty week never
+                # leaves it at 0 (which would replay the whole history next time)
+                newest = db.query(func.max(QueryLog.id)).scalar() or 0
+                query = query.filter(
+                    QueryLog.created_at >= datetime.utcnow() - timedelta(days=7), QueryLog.id <= newest
+                )
+                self._trends_last_id = newest
+            else:
+                query = query.filter(QueryLog.id > self._trends_last_id)
+            for log_id, question, created_at in query.order_by(QueryLog.id).yield_per(1000):
+                self.trends.add(extract_words(question), self._timestamp(created_at))
+                self._trends_last_id = log_id
+    
+    def _timestamp(self, created_at: Optional[datetime]) -> Optional[float]:
+        """Convert a naive UTC log timestamp to a Unix timestamp"""
+        if created_at is None:
+            return None
+        return created_at.replace(tzinfo=timezone.utc).timestamp()
+    
+    def _extract_keywords(
+        self,
+        questions: Iterable[str],
+        archived_counts: Iterable[Dict[str, int]] = ()
+    ) -> List[Dict[str, Any]]:
         """
         Extract and count common keywords from questions
         
+        Counting uses a fixed-size Space-Saving sketch, so memory stays
+        bounded; counts are exact while the vocabulary fits in the sketch.
+        
         Args:
-            questions: List of question strings
-            
+            questions: Iterable of question strings
+            archived_counts: Per-day keyword counts of archived query logs
+        
         Returns:
             List of dictionaries with keyword and count
         """
-        # Common stop words to exclude
-        stop_words = {
-            'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from',
-            'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on', 'that', 'the',
-            'to', 'was', 'were', 'will', 'with', 'how', 'many', 'what', 'when',
-            'where', 'who', 'which', 'did', 'do', 'does'
-        }
-        
-        all_words = []
+        sketch = SpaceSaving(capacity=KEYWORD_SKETCH_CAPACITY)
         for question in questions:
-            # Convert to lowercase and extract words
-            words = re.findall(r'\b[a-z]+\b', question.lower())
-            # Filter out stop words and short words
-            filtered_words = [w for w in words if w not in stop_words and len(w) > 2]
-            all_words.extend(filtered_words)
-        
-        # Count keywords
-        keyword_counts = Counter(all_words)
+            for word in extract_words(question):
+                sketch.add(word)
+        for counts in archived_counts:
+            for word, count in counts.items():
+                sketch.add(word, count)
         
         # Get top 10 most common keywords
-        most_common = keyword_counts.most_common(10)
+        most_common = sketch.top(10)
         
         return [{"keyword": word, "count": count} for word, count in most_common]
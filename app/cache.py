@@ -0,0 +1,479 @@
+"""
+Caches used by the NLP-to-SQL and execution services.
+
+All backends implement :class:`CacheBackend` (string keys, TTLs, bulk
+get/set):
+
+- :class:`LRUCache`: in-process, per worker
+- :class:`SQLiteCache`: a SQLite file shared by the workers of one host
+- :class:`RedisCache`: a Redis-protocol server shared by the whole fleet
+
+:class:`NamespacedCache` prefixes keys, e.g. with the schema version, so a
+schema change never serves entries written for the old one.
+:class:`DataVersionTracker` does the same for data: bulk loads bump a
+counter that result cache keys include.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+from datetime import datetime
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class CacheBackend(ABC):
+    """Interface shared by all cache backends"""
+    
+    # Calls may block on disk or network I/O; async code runs them in a thread
+    blocking = True
+    
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a value, or default if missing or expired"""
+    
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value with an optional expiry"""
+    
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a key if present"""
+    
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove every key starting with prefix"""
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Get several values at once
+        
+        Args:
+            keys: Keys to look up
+        
+        Returns:
+            Dictionary of the keys that were found
+        """
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+    
+    def set_many(self, mapping: Mapping[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store several values at once
+        
+        Args:
+            mapping: Keys and values to store
+            ttl_seconds: Expiry applied to every entry
+        """
+        for key, value in mapping.items():
+            self.set(key, value, ttl_seconds)
+    
+    def clear(self) -> None:
+        """Remove all entries"""
+        self.delete_prefix("")
+
+
+_MISSING = object()
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU cache with optional expiry"""
+    
+    blocking = False
+    
+    def __init__(self, maxsize: int = 1024, ttl_seconds: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a cached value
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+        
+        Returns:
+            Cached value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value, evicting the least recently used entry when full
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Expiry for this entry (default: the cache's TTL)
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def delete(self, key: str) -> None:
+        """Remove a key if present"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove every key starting with prefix"""
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """Cache stored in a SQLite file, shared by worker processes on one host"""
+    
+    # Expired entries are purged and the size limit enforced every N writes
+    PURGE_EVERY = 256
+    
+    def __init__(self, path: str = "./cache.db", max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One autocommit connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a value, or default if missing or expired"""
+        return self.get_many([key]).get(key, default)
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several values with one query per 500 keys"""
+        keys = list(keys)
+        now = time.time()
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._connection().execute(
+                f"SELECT key, value FROM cache_entries WHERE key IN ({','.join('?' * len(chunk))}) "
+                f"AND (expires_at IS NULL OR expires_at > ?)",
+                (*chunk, now)
+            )
+            for key, value in rows:
+                found[key] = json.loads(value)
+        return found
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value with an optional expiry"""
+        self.set_many({key: value}, ttl_seconds)
+    
+    def set_many(self, mapping: Mapping[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        """Store several values in one transaction"""
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        rows = [(key, json.dumps(value, default=str), expires_at) for key, value in mapping.items()]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)", rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._writes += len(rows)
+        if self._writes >= self.PURGE_EVERY:
+            self._writes = 0
+            self._purge()
+    
+    def delete(self, key: str) -> None:
+        """Remove a key if present"""
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+    
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove every key starting with prefix"""
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+    
+    def _purge(self) -> None:
+        """Drop expired entries, then the oldest ones beyond max_entries"""
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache_entries WHERE rowid IN ("
+            "SELECT rowid FROM cache_entries ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+class RedisCache(CacheBackend):
+    """Cache on a Redis-protocol server, shared across workers and pods"""
+    
+    def __init__(self, client: Any):
+        """
+        Args:
+            client: Redis client exposing get/set/mget/delete/scan_iter/pipeline
+                (``redis.Redis`` or a compatible stand-in)
+        """
+        self.client = client
+    
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCache":
+        """
+        Connect with redis-py
+        
+        Raises:
+            ImportError: If the optional ``redis`` package is not installed
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis cache backend requires the 'redis' package") from e
+        return cls(redis.Redis.from_url(url))
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a value, or default if missing or expired"""
+        value = self.client.get(key)
+        return default if value is None else json.loads(value)
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several values with a single MGET"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        return {
+            key: json.loads(value)
+            for key, value in zip(keys, self.client.mget(keys))
+            if value is not None
+        }
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value with an optional expiry"""
+        px = int(ttl_seconds * 1000) if ttl_seconds else None
+        self.client.set(key, json.dumps(value, default=str), px=px)
+    
+    def set_many(self, mapping: Mapping[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        """Store several values in one pipelined round trip"""
+        px = int(ttl_seconds * 1000) if ttl_seconds else None
+        pipe = self.client.pipeline()
+        for key, value in mapping.items():
+            pipe.set(key, json.dumps(value, default=str), px=px)
+        pipe.execute()
+    
+    def delete(self, key: str) -> None:
+        """Remove a key if present"""
+        self.client.delete(key)
+    
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove every key starting with prefix"""
+        keys: List[Any] = list(self.client.scan_iter(match=f"{prefix}*", count=500))
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+
+class NamespacedCache(CacheBackend):
+    """View of a backend where every key is prefixed with a namespace"""
+    
+    def __init__(self, backend: CacheBackend, namespace: str, ttl_seconds: Optional[float] = None):
+        self.backend = backend
+        self.prefix = f"{namespace}:"
+        self.ttl_seconds = ttl_seconds
+    
+    @property
+    def blocking(self) -> bool:
+        return self.backend.blocking
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.backend.get(self.prefix + key, default)
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self.backend.set(self.prefix + key, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        found = self.backend.get_many([self.prefix + key for key in keys])
+        return {key[len(self.prefix):]: value for key, value in found.items()}
+    
+    def set_many(self, mapping: Mapping[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        self.backend.set_many(
+            {self.prefix + key: value for key, value in mapping.items()},
+            self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+    
+    def delete(self, key: str) -> None:
+        self.backend.delete(self.prefix + key)
+    
+    def delete_prefix(self, prefix: str) -> None:
+        self.backend.delete_prefix(self.prefix + prefix)
+
+
+class DataVersionTracker:
+    """
+    Database-backed counter of bulk data loads
+    
+    Result cache keys include the current version, so bumping it makes
+    every cached result unreachable at once, in every worker and on every
+    backend (stale entries age out by TTL or LRU). Reads are cached for
+    ``ttl_seconds``, so other workers see a bump within that delay.
+    """
+    
+    def __init__(self, session_factory: Callable[[], Any], ttl_seconds: float = 1.0, name: str = "default"):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._version = 0
+        self._checked_at = float("-inf")
+    
+    def current(self) -> int:
+        """
+        Get the data version, re-reading it at most once per ``ttl_seconds``
+        
+        Returns:
+            Current version (0 before the first bulk load)
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.ttl_seconds:
+            return self._version
+        
+        from app.models import DataVersion
+        
+        db = self.session_factory()
+        try:
+            row = db.get(DataVersion, self.name)
+            self._version = row.version if row is not None else 0
+        except Exception as e:
+            # e.g. a database created before the table existed
+            print(f"Failed to read data version: {e}")
+        finally:
+            db.close()
+        self._checked_at = now
+        return self._version
+    
+    async def current_async(self) -> int:
+        """
+        Async version of :meth:`current`; a re-read runs off the event loop
+        
+        Returns:
+            Current version (0 before the first bulk load)
+        """
+        if time.monotonic() - self._checked_at < self.ttl_seconds:
+            return self._version
+        return await asyncio.to_thread(self.current)
+    
+    def create_table(self) -> None:
+        """Create the ``data_versions`` table in a database that predates it"""
+        from app.models import DataVersion
+        
+        db = self.session_factory()
+        try:
+            DataVersion.__table__.create(bind=db.get_bind(), checkfirst=True)
+        finally:
+            db.close()
+    
+    def bump(self, db: Any) -> int:
+        """
+        Increment the data version in the caller's transaction
+        
+        The ``data_versions`` table is created with the other models.
+        
+        Args:
+            db: Database session; the caller commits
+        
+        Returns:
+            New version
+        """
+        from sqlalchemy import update
+        from app.models import DataVersion
+        
+        updated = db.execute(
+            update(DataVersion)
+            .where(DataVersion.name == self.name)
+            .values(version=DataVersion.version + 1, updated_at=datetime.utcnow())
+        )
+        if updated.rowcount == 0:
+            db.add(DataVersion(name=self.name, version=1, updated_at=datetime.utcnow()))
+            db.flush()
+        self._version = db.get(DataVersion, self.name, populate_existing=True).version
+        self._checked_at = time.monotonic()
+        return self._version
+
+
+def cache_key(*parts: Any) -> str:
+    """
+    Build a compact, fixed-length cache key from arbitrary parts
+    
+    Args:
+        parts: Values identifying the cached item (e.g. SQL text)
+    
+    Returns:
+        Hex digest suitable for any backend
+    """
+    return hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()
+
+
+def schema_version() -> str:
+    """
+    Short fingerprint of the database schema used to namespace cache entries
+    
+    Returns:
+        First 12 hex digits of a hash over table and column definitions
+    """
+    from app.models import Base
+    
+    description = [
+        (table.name, [(column.name, str(column.type)) for column in table.columns])
+        for table in Base.metadata.sorted_tables
+    ]
+    return cache_key(description)[:12]
+
+
+def create_cache_backend(backend: str, url: Optional[str] = None, max_entries: int = 10_000) -> CacheBackend:
+    """
+    Build the configured cache backend
+    
+    Args:
+        backend: "memory", "sqlite" or "redis"
+        url: SQLite file path or Redis URL
+        max_entries: Size limit for the memory and SQLite backends
+    
+    Returns:
+        Cache backend instance
+    """
+    if backend == "memory":
+        return LRUCache(maxsize=max_entries)
+    if backend == "sqlite":
+        return SQLiteCache(url or "./cache.db", max_entries=max_entries)
+    if backend == "redis":
+        return RedisCache.from_url(url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown cache backend: {backend}")
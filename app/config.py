@@ -1,14 +1,129 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
     """Application settings"""
-    gemini_api_key: str
+    gemini_api_key: Optional[str] = None  # required only for LLM generation
     database_url: str = "sqlite:///./edtech.db"
     
+    # Serving
+    web_workers: int = 0  # 0 sizes worker processes from available CPUs
+    threadpool_size: int = 40  # threads per worker for blocking DB/LLM calls
+    graceful_shutdown_seconds: int = 30
+    sqlite_busy_timeout_ms: int = 5000
+    db_pool_size: int = 20  # async engine connections per worker
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: int = 30
+    query_log_batching: bool = False  # write query logs on a background thread
+    query_log_batch_size: int = 100
+    maintenance_lock_path: str = "./maintenance.lock"  # elects the worker running retention/shared warm-up
+    
+    # Admission control (per API key or client IP)
+    admission_enabled: bool = True
+    admission_api_keys: List[str] = []  # keys limited per key (with TENANT_API_KEYS); others by IP
+    rate_limit_per_second: float = 50.0  # all API requests
+    rate_limit_burst: int = 100
+    llm_rate_limit_per_second: float = 1.0  # questions that need Gemini
+    llm_rate_limit_burst: int = 5
+    max_in_flight_requests: int = 64
+    llm_max_concurrency: int = 8
+    request_slo_seconds: float = 2.0  # shed with 503 when queue wait would exceed
+    llm_slo_seconds: float = 10.0
+    
+    # Batched questions (/query/batch)
+    query_batch_max_questions: int = 100
+    
+    # Bulk export (/query/export)
+    export_chunk_size: int = 10000  # rows per fetchmany batch
+    
+    # Bulk ingestion (python -m app.ingest; /ingest exists only when enabled)
+    ingest_enabled: bool = False
+    ingest_token: Optional[str] = None  # X-Ingest-Token value required by /ingest
+    ingest_batch_size: int = 1000  # rows per transaction
+    ingest_pause_seconds: float = 0.0  # pause between batches to yield to readers
+    data_version_ttl_seconds: float = 1.0  # how often workers re-read the data version
+    
+    # Traffic replay: answer LLM questions with the SQL recorded in this file
+    # (python -m app.replay export) instead of calling Gemini
+    llm_replay_file: Optional[str] = None
+    
+    # Build the Gemini client during startup instead of on the first LLM call
+    warmup_on_startup: bool = False
+    
+    # Caches
+    cache_backend: str = "memory"  # memory, sqlite or redis
+    cache_url: Optional[str] = None  # SQLite file path or Redis URL
+    cache_max_entries: int = 10000
+    sql_cache_ttl_seconds: int = 86400
+    result_cache_ttl_seconds: int = 0  # 0 disables the result cache
+    cache_warmup_enabled: bool = True
+    cache_warmup_top_n: int = 100
+    cache_warmup_rate_per_second: float = 5.0
+    cache_warmup_interval_seconds: int = 3600  # 0 warms only at startup
+    cache_warmup_results: bool = False
+    
+    # Local intent routing of paraphrased questions (skips the LLM)
+    intent_routing_enabled: bool = True
+    intent_confidence_threshold: float = 0.6
+    intent_margin: float = 0.1  # required lead over the runner-up label
+    intent_max_examples: int = 20000
+    
+    # Near-duplicate reuse of answered questions (MinHash/LSH)
+    near_duplicate_enabled: bool = True
+    near_duplicate_threshold: float = 0.8  # estimated Jaccard similarity of question shingles
+    near_duplicate_num_perm: int = 64
+    near_duplicate_bands: int = 16
+    near_duplicate_max_entries: int = 50000
+    near_duplicate_index_path: Optional[str] = "./near_duplicates.npz"  # None keeps it in memory only
+    
+    # HTTP caching: Cache-Control max-age per endpoint (0: revalidate with the ETag every time)
+    stats_max_age_seconds: int = 5
+    query_max_age_seconds: int = 0
+    
+    # Response compression (zstd needs the optional zstandard package, else gzip)
+    compression_enabled: bool = True
+    compression_min_size: int = 1024  # bytes; smaller bodies are sent as is
+    compression_gzip_level: int = 1  # fastest; higher levels cost 2-10x the CPU for 15-50% fewer bytes
+    compression_zstd_level: int = 1
+    
+    # Request profiling (the middleware and /profiles exist only when enabled)
+    profiling_enabled: bool = False
+    profiling_token: Optional[str] = None  # X-Profile-Token / ?profile_token= value that profiles a request
+    profiling_sample_rate: float = 0.0  # fraction of all requests profiled in the background
+    profiling_interval_ms: float = 1.0
+    profiling_dir: str = "./profiles"
+    profiling_max_profiles: int = 50
+    
+    # Multi-tenancy: one database per tenant (school), selected per request
+    tenancy_enabled: bool = False  # off: every request uses DATABASE_URL
+    tenant_database_url: str = "sqlite:///./tenants/{tenant}.db"  # may also use {shard}
+    tenant_shards: int = 1  # {shard} = stable hash of the tenant id modulo this
+    tenant_api_keys: Dict[str, str] = {}  # API key -> tenant id (JSON); wins over the header
+    tenant_ids: List[str] = []  # other tenants (JSON) whose database may be created on first use
+    tenant_header: Optional[str] = "X-Tenant-ID"  # None: tenants only come from API keys (default with keys)
+    tenant_max_open: int = 32  # tenants whose engines stay open (least recently used are closed)
+    tenant_db_pool_size: int = 5  # async engine connections per open tenant
+    tenant_db_max_overflow: int = 5
+    
+    # Query log retention
+    log_retention_days: int = 30
+    log_archive_dir: str = "./archive"
+    log_retention_batch_size: int = 500
+    log_retention_interval_seconds: int = 0  # 0 disables the background task
+    minute_bucket_retention_days: int = 7
+    
     class Config:
         env_file = ".env"
+    
+    @model_validator(mode="after")
+    def _keys_only_tenancy(self) -> "Settings":
+        """With tenant API keys, ignore the tenant header unless it was configured explicitly"""
+        if self.tenant_api_keys and "tenant_header" not in self.model_fields_set:
+            self.tenant_header = None
+        return self
 
 
 @lru_cache()
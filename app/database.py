@@ -1,24 +1,135 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from starlette.requests import Request
 from app.config import get_settings
-from typing import Generator
+from functools import lru_cache
+from typing import AsyncGenerator, Generator
 
-settings = get_settings()
+# Session factories; bound to their engines when those are first created
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
 
-# Create engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+# Async drivers used for each synchronous database URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@lru_cache()
+def get_engine() -> Engine:
+    """Create the database engine on first use"""
+    settings = get_settings()
+    engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+    )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _configure_sqlite)
+    SessionLocal.configure(bind=engine)
+    return engine
 
-def get_db() -> Generator[Session, None, None]:
-    """Get database session"""
-    db = SessionLocal()
+
+def async_database_url(url: str) -> str:
+    """
+    Translate a database URL to its async driver
+    
+    Args:
+        url: Database URL, e.g. ``sqlite:///./edtech.db``
+    
+    Returns:
+        URL using the async driver, e.g. ``sqlite+aiosqlite:///./edtech.db``
+    """
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme or scheme not in ASYNC_DRIVERS:
+        return url
+    return f"{ASYNC_DRIVERS[scheme]}{sep}{rest}"
+
+
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    """
+    Create the async database engine on first use
+    
+    The pool is sized for many concurrent requests on one event loop
+    (``DB_POOL_SIZE`` + ``DB_MAX_OVERFLOW`` connections), with pre-ping so
+    connections dropped while idle are replaced transparently.
+    """
+    settings = get_settings()
+    engine = create_async_engine(
+        async_database_url(settings.database_url),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=True
+    )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _configure_sqlite)
+    AsyncSessionLocal.configure(bind=engine)
+    return engine
+
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    """
+    Make a SQLite file safe to share between worker processes
+    
+    WAL lets readers run alongside the single writer, and the busy timeout
+    makes a writer wait for the lock instead of failing with "database is
+    locked".
+    """
+    settings = get_settings()
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.close()
+
+
+def __getattr__(name: str):
+    """Lazily resolve ``engine`` so importing this module stays cheap"""
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _tenant(request: Request):
+    """Tenant selected for the request by the tenancy middleware, if any"""
+    return getattr(request.state, "tenant", None)
+
+
+def get_db(request: Request) -> Generator[Session, None, None]:
+    """Get database session (of the request's tenant, with tenancy enabled)"""
+    db = get_session_factory(request)()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_session_factory(request: Request) -> sessionmaker:
+    """
+    Get the session factory, for work that outlives the request
+    
+    Streamed responses keep reading after request dependencies have been
+    cleaned up, so they open (and close) their own session.
+    """
+    tenant = _tenant(request)
+    if tenant is not None:
+        return tenant.session_factory
+    get_engine()
+    return SessionLocal
+
+
+async def get_async_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Get async database session (of the request's tenant, with tenancy enabled)"""
+    tenant = _tenant(request)
+    if tenant is not None:
+        session_factory = tenant.async_session_factory
+    else:
+        get_async_engine()
+        session_factory = AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
@@ -0,0 +1,260 @@
+"""
+Bulk result export.
+
+Encodes query results for ``/query/export`` as CSV, Arrow IPC stream or
+Parquet. Rows arrive as ``fetchmany`` batches and each batch is encoded and
+yielded as soon as it is read, so memory stays bounded by the batch size
+however many rows the query returns. Arrow and Parquet need the optional
+``pyarrow`` package, and their schema is written before the first batch:
+on SQLite, whose columns can mix storage classes, the column types come
+from a ``typeof`` pass over the whole result so no later batch can
+conflict with them.
+"""
+from typing import AbstractSet, Any, Iterable, Iterator, List, Optional, Sequence
+import csv
+import io
+import zlib
+
+# Media type and file extension of each export format
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Compression codecs accepted by each format (None: uncompressed)
+COMPRESSIONS = {
+    "csv": (None, "gzip"),
+    "arrow": (None, "lz4", "zstd"),
+    "parquet": (None, "snappy", "gzip", "zstd"),
+}
+
+# Arrow type factory for each SQLite storage class (``typeof``)
+STORAGE_TYPES = {
+    "integer": "int64",
+    "real": "float64",
+    "text": "string",
+    "blob": "binary",
+}
+
+
+def _require_pyarrow():
+    """
+    Import pyarrow for the columnar formats
+    
+    Raises:
+        ImportError: If the optional ``pyarrow`` package is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("Arrow and Parquet exports require the 'pyarrow' package") from e
+    return pyarrow
+
+
+def _column_array(pa, values: Sequence[Any], type_):
+    """
+    Build an Arrow array of the schema type for one column of a batch
+    
+    Text columns (including columns that were all NULL in the first batch)
+    accept any value as its string form; other mismatches raise.
+    """
+    try:
+        return pa.array(values, type=type_)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        if not pa.types.is_string(type_):
+            raise
+        return pa.array([None if value is None else str(value) for value in values], type=type_)
+
+
+def _storage_type(pa, classes: AbstractSet[str]):
+    """
+    Arrow type for a column from the SQLite storage classes it holds
+    
+    Integers mixed with reals become doubles; any other mix, and columns
+    that are entirely NULL, become text.
+    """
+    classes = set(classes) - {"null"}
+    if classes == {"integer", "real"}:
+        return pa.float64()
+    if len(classes) == 1:
+        return getattr(pa, STORAGE_TYPES[classes.pop()])()
+    return pa.string()
+
+
+class _ChunkSink:
+    """Write-only file object collecting the bytes a writer emits"""
+    
+    closed = False
+    
+    def __init__(self):
+        self._parts: List[bytes] = []
+    
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        pass
+    
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain"""
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class ResultExporter:
+    """Service for streaming query results in bulk formats"""
+    
+    def check(self, fmt: str, compression: Optional[str]) -> None:
+        """
+        Check that a format and compression can be produced
+        
+        Called before the query runs, so bad requests fail with an error
+        response instead of a truncated download.
+        
+        Args:
+            fmt: "csv", "arrow" or "parquet"
+            compression: Codec name, or None for uncompressed
+        
+        Raises:
+            ValueError: If the format or codec is not supported
+            ImportError: If the format needs pyarrow and it is missing
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        if compression not in COMPRESSIONS[fmt]:
+            codecs = ", ".join(c for c in COMPRESSIONS[fmt] if c)
+            raise ValueError(f"Unsupported compression for {fmt}: {compression} (supported: {codecs})")
+        if fmt != "csv":
+            _require_pyarrow()
+    
+    def media_type(self, fmt: str) -> str:
+        """Media type of an export format"""
+        return EXPORT_FORMATS[fmt][0]
+    
+    def filename(self, fmt: str, compression: Optional[str], stem: str = "export") -> str:
+        """Download file name; compressed CSV is a ``.csv.gz`` file"""
+        name = f"{stem}.{EXPORT_FORMATS[fmt][1]}"
+        return f"{name}.gz" if fmt == "csv" and compression == "gzip" else name
+    
+    def stream(
+        self,
+        columns: Sequence[str],
+        batches: Iterable[Sequence[Sequence[Any]]],
+        fmt: str,
+        compression: Optional[str] = None,
+        storage_classes: Optional[Sequence[AbstractSet[str]]] = None
+    ) -> Iterator[bytes]:
+        """
+        Encode row batches as a byte stream
+        
+        Args:
+            columns: Column names
+            batches: Row batches, e.g. from ``fetchmany``
+            fmt: "csv", "arrow" or "parquet"
+            compression: Codec name, or None for uncompressed
+            storage_classes: SQLite storage classes of each column over the
+                whole result, which fix the Arrow/Parquet schema up front;
+                None infers it from the first batch
+        
+        Returns:
+            Iterator of encoded chunks, one or more per batch
+        """
+        self.check(fmt, compression)
+        if fmt == "csv":
+            return self._csv(columns, batches, compression)
+        return self._columnar(columns, batches, fmt, compression, storage_classes)
+    
+    def _csv(
+        self,
+        columns: Sequence[str],
+        batches: Iterable[Sequence[Sequence[Any]]],
+        compression: Optional[str]
+    ) -> Iterator[bytes]:
+        """Encode batches as CSV with a header row, optionally gzipped"""
+        # wbits=31 writes a gzip container (header and CRC), not a raw zlib stream
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compression == "gzip" else None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        
+        def encode(rows) -> bytes:
+            writer.writerows(rows)
+            data = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            return compressor.compress(data) if compressor else data
+        
+        yield encode([columns])
+        for batch in batches:
+            chunk = encode(batch)
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+    
+    def _columnar(
+        self,
+        columns: Sequence[str],
+        batches: Iterable[Sequence[Sequence[Any]]],
+        fmt: str,
+        compression: Optional[str],
+        storage_classes: Optional[Sequence[AbstractSet[str]]] = None
+    ) -> Iterator[bytes]:
+        """
+        Encode batches as an Arrow IPC stream or a Parquet file
+        
+        The schema comes from the storage classes when given, otherwise it
+        is inferred from the first batch (enough for databases that enforce
+        column types); each batch becomes one Arrow record batch (or Parquet
+        row group) of that schema.
+        """
+        pa = _require_pyarrow()
+        sink = _ChunkSink()
+        writer = None
+        schema = None
+        if storage_classes is not None:
+            schema = pa.schema([
+                pa.field(name, _storage_type(pa, classes)) for name, classes in zip(columns, storage_classes)
+            ])
+        
+        for batch in batches:
+            if not batch:
+                continue
+            values = list(zip(*batch))
+            if schema is None:
+                arrays = [pa.array(column) for column in values]
+                # All-NULL columns in the first batch have no type yet; use text
+                arrays = [array.cast(pa.string()) if pa.types.is_null(array.type) else array for array in arrays]
+                schema = pa.schema([pa.field(name, array.type) for name, array in zip(columns, arrays)])
+            else:
+                arrays = [_column_array(pa, column, field.type) for column, field in zip(values, schema)]
+            if writer is None:
+                writer = self._writer(pa, sink, schema, fmt, compression)
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        
+        if writer is None:
+            # No rows: still emit a valid, empty file (text columns unless typed)
+            if schema is None:
+                schema = pa.schema([pa.field(name, pa.string()) for name in columns])
+            writer = self._writer(pa, sink, schema, fmt, compression)
+        writer.close()
+        yield sink.drain()
+    
+    def _writer(self, pa, sink: _ChunkSink, schema, fmt: str, compression: Optional[str]):
+        """Open an Arrow IPC stream or Parquet writer on a sink"""
+        out = pa.PythonFile(sink, mode="w")
+        if fmt == "arrow":
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            return pa.ipc.new_stream(out, schema, options=options)
+        
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(out, schema, compression=compression or "none")
@@ -0,0 +1,81 @@
+"""
+HTTP conditional request helpers.
+
+Responses that are a pure function of a few version counters carry an ETag
+built from those counters; a client repeating the request with
+``If-None-Match`` gets a 304 and the handler skips the work entirely.
+"""
+from app.cache import cache_key
+from typing import Any, Optional
+import re
+
+# SQL whose result depends on more than the data (time, randomness)
+_NONDETERMINISTIC = re.compile(
+    r"\b(?:random|randomblob|changes|last_insert_rowid|total_changes)\s*\("
+    r"|\bcurrent_(?:date|time|timestamp)\b"
+    r"|'now'",
+    re.IGNORECASE
+)
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong entity tag for a response identified by parts
+    
+    Args:
+        parts: Values the response body is a function of
+    
+    Returns:
+        Quoted ETag header value
+    """
+    return f'"{cache_key(*parts)[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an entity tag (weak comparison)
+    
+    Args:
+        if_none_match: Header value: "*" or comma-separated entity tags
+        etag: Current entity tag
+    
+    Returns:
+        True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == current:
+            return True
+    return False
+
+
+def cache_control(max_age: int) -> str:
+    """
+    Cache-Control value for a revalidatable response
+    
+    Args:
+        max_age: Seconds clients may reuse the response without asking;
+            0 makes them revalidate (with the ETag) every time
+    
+    Returns:
+        Cache-Control header value
+    """
+    return f"max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def is_deterministic(sql: str) -> bool:
+    """
+    Whether a query's result depends only on the data it reads
+    
+    Args:
+        sql: SQL query
+    
+    Returns:
+        False if the SQL reads the clock or random numbers
+    """
+    return _NONDETERMINISTIC.search(sql) is None
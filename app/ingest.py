@@ -0,0 +1,361 @@
+"""
+Bulk ingestion of students, courses and enrollments.
+
+Records are parsed incrementally from CSV or NDJSON and validated: types,
+required fields, and foreign keys checked against in-memory id sets. They
+are then inserted with ``executemany`` in batches, each batch its own short
+transaction, so readers (WAL) are never held up for long. With ``upsert``,
+rows whose id already exists are updated in place. Invalid rows are
+rejected and reported without aborting the load. A load that changes any
+rows bumps the data version, which invalidates cached query results.
+
+Run from the command line::
+
+    python -m app.ingest --students students.csv --courses courses.csv --enrollments enrollments.ndjson --upsert
+
+With tenancy, ``--tenant`` loads into that tenant's database instead.
+"""
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.models import Course, Enrollment, Student
+from app.cache import DataVersionTracker
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from datetime import datetime
+import argparse
+import codecs
+import csv
+import json
+import os
+import time
+
+# Errors included in a load report (the rest are only counted)
+MAX_REPORTED_ERRORS = 20
+
+
+def _parse_datetime(value: Any) -> datetime:
+    """Parse an ISO 8601 date or timestamp"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip().replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+# Loadable tables: model and column -> (parser, required)
+TABLES: Dict[str, Tuple[Any, Dict[str, Tuple[Callable[[Any], Any], bool]]]] = {
+    "students": (Student, {
+        "id": (int, False),
+        "name": (str, True),
+        "grade": (int, True),
+        "created_at": (_parse_datetime, False),
+    }),
+    "courses": (Course, {
+        "id": (int, False),
+        "name": (str, True),
+        "category": (str, True),
+    }),
+    "enrollments": (Enrollment, {
+        "id": (int, False),
+        "student_id": (int, True),
+        "course_id": (int, True),
+        "enrolled_at": (_parse_datetime, False),
+    }),
+}
+
+# Foreign key columns and the model they reference
+FOREIGN_KEYS: Dict[str, Dict[str, Any]] = {
+    "enrollments": {"student_id": Student, "course_id": Course},
+}
+
+# Timestamp columns defaulted to the load time when missing
+TIMESTAMP_COLUMNS = ("created_at", "enrolled_at")
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Split a stream of byte chunks into text lines
+    
+    Only "\n" (or "\r\n") ends a line: ``str.splitlines`` would also split
+    on form feeds, "\x1c"-"\x1e", "\x85" and "\u2028", which may appear
+    inside CSV values and JSON strings.
+    
+    Args:
+        chunks: UTF-8 encoded chunks (a leading BOM is dropped)
+    
+    Returns:
+        Iterator of lines, each ending in "\n" except possibly the last
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        # The last piece may be an incomplete line; keep it for the next chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.removesuffix("\r") + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.removesuffix("\r")
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Union[Dict[str, Any], ValueError]]]:
+    """
+    Parse CSV (with a header row) or NDJSON records
+    
+    Args:
+        lines: Text lines
+        fmt: "csv" or "ndjson"
+    
+    Returns:
+        Iterator of (line number, record); unparseable lines yield a
+        ValueError in place of the record
+    
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Empty cells mean "not given"
+            yield reader.line_num, {k: v for k, v in record.items() if k is not None and v not in ("", None)}
+    elif fmt == "ndjson":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, ValueError(f"Invalid JSON: {e.msg}")
+                continue
+            yield number, record if isinstance(record, dict) else ValueError("Expected a JSON object")
+    else:
+        raise ValueError(f"Unsupported ingest format: {fmt}")
+
+
+class IngestService:
+    """Service for bulk loading application data"""
+    
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        pause_seconds: float = 0.0,
+        data_version: Optional[DataVersionTracker] = None
+    ):
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.data_version = data_version
+    
+    def ingest(
+        self,
+        db: Session,
+        table: str,
+        records: Iterable[Tuple[int, Union[Dict[str, Any], ValueError]]],
+        upsert: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Validate and bulk-insert records into one table
+        
+        Batches are committed as they fill, so rows loaded before a failing
+        batch stay loaded.
+        
+        Args:
+            db: Database session
+            table: "students", "courses" or "enrollments"
+            records: (line number, record) pairs, e.g. from :func:`read_records`
+            upsert: Update rows whose id already exists instead of rejecting them
+        
+        Returns:
+            Load report: row counts, first errors, duration and rows/second
+        
+        Raises:
+            ValueError: If the table is not loadable
+        """
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        model, columns = TABLES[table]
+        start_time = time.time()
+        loaded_at = datetime.utcnow()
+        
+        # Id sets for duplicate and foreign key checks, loaded once
+        existing: Set[int] = set(db.scalars(select(model.id)))
+        references = {
+            column: set(db.scalars(select(referenced.id)))
+            for column, referenced in FOREIGN_KEYS.get(table, {}).items()
+        }
+        db.rollback()
+        
+        report: Dict[str, Any] = {
+            "table": table, "rows": 0, "inserted": 0, "updated": 0, "rejected": 0, "errors": []
+        }
+        batch: List[Dict[str, Any]] = []
+        committed = 0
+        try:
+            for line, record in records:
+                report["rows"] += 1
+                try:
+                    row = self._validate(record, columns, references, loaded_at)
+                    if row["id"] in existing and not upsert:
+                        raise ValueError(f"id {row['id']} already exists (use upsert to update it)")
+                except ValueError as e:
+                    report["rejected"] += 1
+                    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                        report["errors"].append({"line": line, "error": str(e)})
+                    continue
+                
+                if row["id"] in existing:
+                    report["updated"] += 1
+                else:
+                    report["inserted"] += 1
+                    if row["id"] is not None:
+                        existing.add(row["id"])
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    committed += self._write(db, model, batch, upsert)
+                    batch = []
+                    if self.pause_seconds:
+                        time.sleep(self.pause_seconds)
+            if batch:
+                committed += self._write(db, model, batch, upsert)
+        finally:
+            # Invalidate cached results even when a later batch failed
+            report["data_version"] = None
+            if committed and self.data_version is not None:
+                report["data_version"] = self.data_version.bump(db)
+                db.commit()
+        
+        report["seconds"] = round(time.time() - start_time, 3)
+        report["rows_per_second"] = round(report["rows"] / max(report["seconds"], 1e-6), 1)
+        return report
+    
+    def _validate(
+        self,
+        record: Union[Dict[str, Any], ValueError],
+        columns: Dict[str, Tuple[Callable[[Any], Any], bool]],
+        references: Dict[str, Set[int]],
+        loaded_at: datetime
+    ) -> Dict[str, Any]:
+        """
+        Convert a record to a row with every column of the table
+        
+        Raises:
+            ValueError: If the record cannot be loaded
+        """
+        if isinstance(record, ValueError):
+            raise record
+        
+        row = {}
+        for column, (parse, required) in columns.items():
+            value = record.get(column)
+            if value is None:
+                if required:
+                    raise ValueError(f"Missing required field: {column}")
+                row[column] = loaded_at if column in TIMESTAMP_COLUMNS else None
+                continue
+            try:
+                row[column] = parse(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid {column}: {value!r}")
+        
+        for column, ids in references.items():
+            if row[column] not in ids:
+                raise ValueError(f"Unknown {column}: {row[column]}")
+        return row
+    
+    def _write(self, db: Session, model: Any, rows: List[Dict[str, Any]], upsert: bool) -> int:
+        """Insert (or upsert) one batch with executemany and commit it; returns the row count"""
+        with_id = [row for row in rows if row["id"] is not None]
+        # Rows without an id get one from the database
+        without_id = [{k: v for k, v in row.items() if k != "id"} for row in rows if row["id"] is None]
+        try:
+            if with_id:
+                statement = self._upsert(db, model, with_id[0].keys()) if upsert else insert(model)
+                db.execute(statement, with_id)
+            if without_id:
+                db.execute(insert(model), without_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(rows)
+    
+    def _upsert(self, db: Session, model: Any, columns: Iterable[str]):
+        """
+        INSERT ... ON CONFLICT (id) DO UPDATE for the session's database
+        
+        Raises:
+            ValueError: If the database has no upsert support here
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            raise ValueError(f"Upsert is not supported on {dialect}")
+        
+        statement = dialect_insert(model)
+        return statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={column: statement.excluded[column] for column in columns if column != "id"}
+        )
+
+
+def main() -> None:
+    """Command line entry point"""
+    from app.config import get_settings
+    from app.database import get_engine, SessionLocal, _configure_sqlite
+    
+    parser = argparse.ArgumentParser(description="Bulk load students, courses and enrollments")
+    for table in TABLES:
+        parser.add_argument(f"--{table}", metavar="PATH", help=f"CSV or NDJSON file of {table}")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Input format (default: from file extension)")
+    parser.add_argument("--upsert", action="store_true", help="Update rows whose id already exists")
+    parser.add_argument("--batch-size", type=int, help="Rows per transaction (default: INGEST_BATCH_SIZE)")
+    parser.add_argument("--tenant", help="Load into this tenant's database (TENANT_DATABASE_URL)")
+    args = parser.parse_args()
+    
+    settings = get_settings()
+    if args.tenant:
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.orm import sessionmaker
+        from app.models import Base
+        from app.tenancy import tenant_database_url
+        
+        url = tenant_database_url(settings.tenant_database_url, args.tenant, settings.tenant_shards)
+        if url.startswith("sqlite:///"):
+            os.makedirs(os.path.dirname(os.path.abspath(url[len("sqlite:///"):])), exist_ok=True)
+        engine = create_engine(url)
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", _configure_sqlite)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    else:
+        get_engine()
+        session_factory = SessionLocal
+    service = IngestService(
+        batch_size=args.batch_size or settings.ingest_batch_size,
+        pause_seconds=settings.ingest_pause_seconds,
+        data_version=DataVersionTracker(session_factory)
+    )
+    
+    # Referenced tables first, so enrollments can point at rows loaded in this run
+    for table in TABLES:
+        path = getattr(args, table)
+        if not path:
+            continue
+        fmt = args.format or ("ndjson" if os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl") else "csv")
+        db = session_factory()
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                report = service.ingest(db, table, read_records(f, fmt), upsert=args.upsert)
+        finally:
+            db.close()
+        
+        print(
+            f"{table}: {report['rows']} rows ({report['inserted']} inserted, {report['updated']} updated, "
+            f"{report['rejected']} rejected) in {report['seconds']}s, {report['rows_per_second']} rows/s"
+        )
+        for error in report["errors"]:
+            print(f"  line {error['line']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    main()
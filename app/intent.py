@@ -0,0 +1,252 @@
+"""
+Local intent classification.
+
+:class:`IntentClassifier` maps a question to the label of the most similar
+known question (a template name or previously generated SQL) with a cosine
+confidence score, so paraphrases of answered questions can skip the LLM.
+
+Questions are vectorized as TF-IDF over hashed word unigrams and character
+n-grams (robust to plurals, typos and word order). Examples live in
+immutable, feature-sorted sparse segments; scoring a batch of questions is a
+few NumPy gathers and one ``bincount`` per segment. New examples go to a
+small segment and equal-sized segments are merged (IDF refreshed), so the
+index grows incrementally instead of being rebuilt per example.
+"""
+from collections import Counter
+from typing import Iterable, List, Sequence, Tuple
+import re
+import threading
+
+import numpy as np
+
+# Hashed feature space (sparse, so it can be large)
+FEATURE_BITS = 20
+
+# Character n-gram lengths taken from each space-padded word
+NGRAM_SIZES = (3, 4)
+
+# Questions scored together in one dense block by classify_many
+QUERY_BLOCK = 32
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def question_features(question: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashed word and character n-gram features of a question
+    
+    Args:
+        question: Natural language question
+    
+    Returns:
+        Tuple of (feature ids, counts), feature ids unique
+    """
+    counts: Counter = Counter()
+    for word in _WORD.findall(question.lower()):
+        counts["w:" + word] += 1
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+    
+    mask = (1 << FEATURE_BITS) - 1
+    hashed: Counter = Counter()
+    for gram, count in counts.items():
+        hashed[hash(gram) & mask] += count
+    features = np.fromiter(hashed.keys(), dtype=np.int64, count=len(hashed))
+    values = np.fromiter(hashed.values(), dtype=np.float32, count=len(hashed))
+    return features, values
+
+
+class _Segment:
+    """
+    Immutable inverted index over a contiguous range of examples
+    
+    Postings are sorted by feature; weights are TF-IDF values normalized per
+    example with the IDF at build time.
+    """
+    
+    def __init__(self, start: int, docs: np.ndarray, features: np.ndarray, counts: np.ndarray, idf: np.ndarray):
+        self.start = start
+        self.n_docs = int(docs.max()) - start + 1 if len(docs) else 0
+        # Raw postings, kept so segments can be merged with a fresh IDF
+        self.raw = (docs, features, counts)
+        
+        local = docs - start
+        weights = (1 + np.log(counts)) * idf
+        norms = np.sqrt(np.bincount(local, weights * weights, minlength=self.n_docs))
+        weights = weights / norms[local]
+        
+        order = np.argsort(features, kind="stable")
+        sorted_features = features[order]
+        self.features, first = np.unique(sorted_features, return_index=True)
+        self.indptr = np.append(first, len(sorted_features))
+        self.docs = local[order]
+        self.weights = weights[order].astype(np.float32)
+    
+    def scores(self, query_ids: np.ndarray, features: np.ndarray, weights: np.ndarray, n_queries: int) -> np.ndarray:
+        """
+        Dot products of weighted query features with every example
+        
+        Args:
+            query_ids: Query index of each query feature
+            features: Query feature ids
+            weights: Query feature weights (normalized per query)
+            n_queries: Number of queries in the batch
+        
+        Returns:
+            (n_queries, n_docs) score matrix
+        """
+        pos = np.searchsorted(self.features, features)
+        pos_clipped = np.minimum(pos, len(self.features) - 1)
+        hit = (pos < len(self.features)) & (self.features[pos_clipped] == features)
+        query_ids, pos, weights = query_ids[hit], pos[hit], weights[hit]
+        
+        starts = self.indptr[pos]
+        lengths = self.indptr[pos + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros((n_queries, self.n_docs), dtype=np.float32)
+        
+        # Expand each matched feature into its posting list
+        postings = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        cells = self.docs[postings]
+        if n_queries > 1:
+            cells = cells + np.repeat(query_ids * self.n_docs, lengths)
+        contributions = self.weights[postings] * np.repeat(weights.astype(np.float32), lengths)
+        scores = np.bincount(cells, contributions, minlength=n_queries * self.n_docs)
+        return scores.reshape(n_queries, self.n_docs).astype(np.float32)
+
+
+class IntentClassifier:
+    """Nearest-example question classifier over TF-IDF character n-grams"""
+    
+    def __init__(self, max_examples: int = 20000):
+        self.max_examples = max_examples
+        self.labels: List[str] = []
+        self._seen = set()
+        self._df = np.zeros(1 << FEATURE_BITS, dtype=np.int32)
+        self._segments: List[_Segment] = []
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.labels)
+    
+    def add(self, question: str, label: str) -> bool:
+        """
+        Add an example question with its label
+        
+        Args:
+            question: Example question
+            label: Label returned for questions similar to it
+        
+        Returns:
+            True if added (False for repeats and once the index is full)
+        """
+        key = " ".join(_WORD.findall(question.lower()))
+        with self._lock:
+            if not key or key in self._seen or len(self.labels) >= self.max_examples:
+                return False
+            self._seen.add(key)
+            features, counts = question_features(question)
+            self._df[features] += 1
+            self.labels.append(label)
+            self._pending.append((features, counts))
+            return True
+    
+    def add_many(self, examples: Iterable[Tuple[str, str]]) -> int:
+        """Add (question, label) examples; returns how many were new"""
+        return sum(self.add(question, label) for question, label in examples)
+    
+    def classify(self, question: str, top_k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Most similar labels for one question
+        
+        Args:
+            question: Natural language question
+            top_k: Maximum number of distinct labels returned
+        
+        Returns:
+            (label, cosine similarity) pairs, best first
+        """
+        return self.classify_many([question], top_k)[0]
+    
+    def classify_many(self, questions: Sequence[str], top_k: int = 3) -> List[List[Tuple[str, float]]]:
+        """
+        Most similar labels for a batch of questions, scored together
+        
+        Args:
+            questions: Natural language questions
+            top_k: Maximum number of distinct labels per question
+        
+        Returns:
+            For each question, (label, cosine similarity) pairs, best first
+        """
+        self._flush()
+        segments, labels = self._segments, self.labels
+        if not segments or not questions:
+            return [[] for _ in questions]
+        
+        results = []
+        # Blocks keep the dense score matrix small and cache-resident
+        for block_start in range(0, len(questions), QUERY_BLOCK):
+            block = questions[block_start:block_start + QUERY_BLOCK]
+            query_ids, features, weights = self._vectorize(block, len(labels))
+            scores = np.concatenate(
+                [segment.scores(query_ids, features, weights, len(block)) for segment in segments], axis=1
+            )
+            results.extend(self._rank(row, labels, top_k) for row in scores)
+        return results
+    
+    @staticmethod
+    def _rank(row: np.ndarray, labels: List[str], top_k: int) -> List[Tuple[str, float]]:
+        """Best distinct labels of one score row"""
+        candidates = min(len(row), top_k * 8)
+        best = np.argpartition(-row, candidates - 1)[:candidates]
+        ranked: List[Tuple[str, float]] = []
+        for doc in best[np.argsort(-row[best])]:
+            if row[doc] <= 0 or len(ranked) == top_k:
+                break
+            if all(labels[doc] != label for label, _ in ranked):
+                ranked.append((labels[doc], float(row[doc])))
+        return ranked
+    
+    def _vectorize(self, questions: Sequence[str], n_docs: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Unit-length TF-IDF query vectors in coordinate form"""
+        query_ids, features, weights = [], [], []
+        for i, question in enumerate(questions):
+            f, counts = question_features(question)
+            w = (1 + np.log(counts)) * self._idf(f, n_docs)
+            norm = float(np.sqrt(np.dot(w, w))) or 1.0
+            query_ids.append(np.full(len(f), i))
+            features.append(f)
+            weights.append(w / norm)
+        return np.concatenate(query_ids), np.concatenate(features), np.concatenate(weights)
+    
+    def _idf(self, features: np.ndarray, n_docs: int) -> np.ndarray:
+        """Smoothed inverse document frequency of features"""
+        return np.log((1 + n_docs) / (1 + self._df[features].astype(np.float32))) + 1
+    
+    def _flush(self) -> None:
+        """Index pending examples as a new segment, merging equal-sized tail segments"""
+        if not self._pending:
+            return
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            start = len(self.labels) - len(pending)
+            docs = np.concatenate([np.full(len(f), start + i) for i, (f, _) in enumerate(pending)])
+            features = np.concatenate([f for f, _ in pending])
+            counts = np.concatenate([c for _, c in pending])
+            
+            segments = list(self._segments)
+            n_docs = len(self.labels)
+            segments.append(_Segment(start, docs, features, counts, self._idf(features, n_docs)))
+            # Size-tiered merging keeps O(log n) segments
+            while len(segments) > 1 and segments[-1].n_docs * 2 >= segments[-2].n_docs:
+                newer, older = segments.pop(), segments.pop()
+                raw = [np.concatenate(parts) for parts in zip(older.raw, newer.raw)]
+                segments.append(_Segment(older.start, raw[0], raw[1], raw[2], self._idf(raw[1], n_docs)))
+            self._segments = segments
@@ -0,0 +1,136 @@
+"""
+Background query log writer.
+
+With :class:`QueryLogWriter` attached to the executor, ``/query`` no longer
+commits its own ``query_logs`` row. Entries are queued and a single thread
+per process writes them in batches, one transaction per batch, which keeps
+SQLite write-lock contention between worker processes low. ``close()``
+drains the queue, so a graceful shutdown loses no log entries.
+"""
+from sqlalchemy.orm import Session
+from app.models import QueryLog
+from app.timeseries import TimeseriesService
+from typing import Callable, List, NamedTuple, Optional
+from datetime import datetime
+import queue
+import threading
+import time
+
+# Queue item telling the writer thread to flush and exit
+_STOP = object()
+
+
+class LogEntry(NamedTuple):
+    """One pending query log row"""
+    question: str
+    generated_sql: str
+    execution_time: int
+    created_at: datetime
+
+
+class QueryLogWriter:
+    """Batches query log inserts on a background thread"""
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        timeseries: Optional[TimeseriesService] = None,
+        batch_size: int = 100,
+        flush_interval: float = 0.2,
+        max_queue: int = 10000
+    ):
+        self.session_factory = session_factory
+        self.timeseries = timeseries or TimeseriesService()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+    
+    def start(self) -> None:
+        """Start the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+            self._thread.start()
+    
+    def submit(self, entry: LogEntry) -> None:
+        """
+        Queue a log entry
+        
+        Blocks briefly when the queue is full; entries that still do not fit
+        are dropped rather than stalling the request.
+        
+        Args:
+            entry: Log entry to write
+        """
+        try:
+            self._queue.put(entry, timeout=1.0)
+        except queue.Full:
+            self.dropped += 1
+    
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Flush all queued entries and stop the writer thread
+        
+        Never waits longer than ``timeout`` in total, even when the queue is
+        full because the writer thread is stalled or dead.
+        
+        Args:
+            timeout: Seconds to wait for the queue to drain (None: no limit)
+        """
+        if self._thread is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print(f"Query log writer did not drain within {timeout}s; {self._queue.qsize()} entries not written")
+        else:
+            self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self._thread = None
+    
+    def _run(self) -> None:
+        """Writer thread: collect entries into batches and write them"""
+        stopping = False
+        while not stopping:
+            batch: List[LogEntry] = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            
+            if batch:
+                self._write(batch)
+    
+    def _write(self, batch: List[LogEntry]) -> None:
+        """
+        Write a batch of entries in one transaction
+        
+        Args:
+            batch: Entries to write
+        """
+        db = self.session_factory()
+        try:
+            db.add_all([QueryLog(**entry._asdict()) for entry in batch])
+            for entry in batch:
+                self.timeseries.record(db, entry.execution_time, entry.created_at)
+            db.commit()
+            self.written += len(batch)
+        except Exception as e:
+            print(f"Failed to write {len(batch)} query logs: {e}")
+            db.rollback()
+        finally:
+            db.close()
@@ -1,19 +1,191 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Iterator, Literal, Optional
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import hmac
+import os
+import re
+import anyio.from_thread
+import anyio.to_thread
 
-from app.database import get_db
-from app.schemas import QueryRequest, QueryResponse, StatsResponse
-from app.nlp2sql import NLP2SQLService
+from app.config import get_settings
+from app.database import (
+    get_db, get_async_db, get_engine, get_async_engine, get_session_factory,
+    SessionLocal, AsyncSessionLocal, _configure_sqlite
+)
+from app.schemas import (
+    BatchQueryRequest, BatchQueryResponse, BatchQueryResult, ExportRequest, IngestResponse,
+    QueryRequest, QueryResponse, StatsResponse, TimeseriesResponse
+)
+from app.nlp2sql import NLP2SQLService, SQLQuery
+from app.replay import load_recorded_sql
+from app.intent import IntentClassifier
+from app.near_duplicates import NearDuplicateIndex
+from app.sql_validation import validate_sql
 from app.sql_executor import SQLExecutor
+from app.export import ResultExporter
+from app.ingest import IngestService, iter_lines, read_records
 from app.analytics import AnalyticsService
+from app.timeseries import TimeseriesService
+from app.retention import RetentionService, retention_loop, tenant_retention_loop
+from app.warmup import CacheWarmer, warmup_loop
+from app.cache import DataVersionTracker, NamespacedCache, create_cache_backend, schema_version
+from app.log_writer import QueryLogWriter
+from app.profiling import ProfileStore, ProfilingMiddleware
+from app.server import MaintenanceLock
+from app.compression import CompressionMiddleware
+from app.tenancy import Tenant, TenantMiddleware, TenantRegistry
+from app.http_cache import cache_control, etag_matches, is_deterministic, make_etag
+from app.admission import AdmissionController, AdmissionMiddleware, AdmissionRejected
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared clients and start/stop background maintenance tasks"""
+    settings = get_settings()
+    get_engine()
+    async_engine = get_async_engine()
+    
+    # Databases created before the data_versions table get it once here
+    try:
+        await asyncio.to_thread(data_version.create_table)
+    except Exception as e:
+        print(f"Failed to create the data_versions table: {e}")
+    
+    # Blocking DB/LLM work runs in handler threads; size that pool explicitly
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    
+    if settings.warmup_on_startup:
+        await asyncio.to_thread(nlp2sql_service.warm_up)
+    
+    # Shared cache backend, namespaced by schema version
+    cache_backend = create_cache_backend(
+        settings.cache_backend, settings.cache_url, settings.cache_max_entries
+    )
+    namespace = f"edtech:{schema_version()}"
+    nlp2sql_service.sql_cache = NamespacedCache(
+        cache_backend, f"{namespace}:sql", ttl_seconds=settings.sql_cache_ttl_seconds or None
+    )
+    if settings.result_cache_ttl_seconds > 0:
+        sql_executor.result_cache = NamespacedCache(
+            cache_backend, f"{namespace}:result", ttl_seconds=settings.result_cache_ttl_seconds
+        )
+    
+    # Near-duplicate index saved by the previous run
+    near_duplicates = nlp2sql_service.near_duplicates
+    index_path = settings.near_duplicate_index_path
+    if near_duplicates is not None and index_path and os.path.exists(index_path):
+        try:
+            await asyncio.to_thread(near_duplicates.load, index_path, schema_version())
+        except Exception as e:
+            print(f"Near-duplicate index not loaded from {index_path}: {e}")
+    
+    log_writer = None
+    if settings.query_log_batching:
+        log_writer = QueryLogWriter(
+            SessionLocal,
+            timeseries=timeseries_service,
+            batch_size=settings.query_log_batch_size
+        )
+        log_writer.start()
+        sql_executor.log_writer = log_writer
+    
+    tasks = []
+    # Loops touching state shared by all workers run in one elected worker per host
+    maintenance_lock = MaintenanceLock(settings.maintenance_lock_path)
+    maintenance = []
+    
+    # Warm caches from the query log; /health reports ready once done
+    cache_warmer = CacheWarmer(
+        nlp2sql_service,
+        sql_executor,
+        top_n=settings.cache_warmup_top_n,
+        rate_per_second=settings.cache_warmup_rate_per_second,
+        warm_results=settings.cache_warmup_results
+    )
+    app.state.cache_warmer = cache_warmer
+    if settings.cache_warmup_enabled:
+        warmup = functools.partial(
+            warmup_loop,
+            cache_warmer,
+            SessionLocal,
+            interval_seconds=settings.cache_warmup_interval_seconds
+        )
+        if settings.cache_backend == "memory":
+            # In-process caches: every worker warms its own
+            tasks.append(asyncio.create_task(warmup()))
+        else:
+            # Shared caches are warmed once, by the elected worker
+            maintenance.append(warmup)
+            cache_warmer.ready.set()
+    else:
+        cache_warmer.ready.set()
+    
+    if settings.log_retention_interval_seconds > 0:
+        retention_service = RetentionService(
+            archive_dir=settings.log_archive_dir,
+            batch_size=settings.log_retention_batch_size
+        )
+        maintenance.append(functools.partial(
+            retention_loop,
+            retention_service,
+            SessionLocal,
+            older_than=timedelta(days=settings.log_retention_days),
+            minute_buckets_older_than=timedelta(days=settings.minute_bucket_retention_days),
+            interval_seconds=settings.log_retention_interval_seconds
+        ))
+        if tenants is not None:
+            # Tenant databases keep their own query logs and buckets
+            maintenance.append(functools.partial(
+                tenant_retention_loop,
+                tenants,
+                settings.log_archive_dir,
+                settings.log_retention_batch_size,
+                older_than=timedelta(days=settings.log_retention_days),
+                minute_buckets_older_than=timedelta(days=settings.minute_bucket_retention_days),
+                interval_seconds=settings.log_retention_interval_seconds
+            ))
+    
+    if maintenance:
+        async def run_maintenance() -> None:
+            await maintenance_lock.wait()
+            await asyncio.gather(*(loop() for loop in maintenance))
+        
+        tasks.append(asyncio.create_task(run_maintenance()))
+    
+    yield
+    
+    for task in tasks:
+        task.cancel()
+    maintenance_lock.release()
+    
+    # Drain queued query logs before the worker exits
+    if log_writer is not None:
+        sql_executor.log_writer = None
+        await asyncio.to_thread(log_writer.close, settings.graceful_shutdown_seconds)
+    if near_duplicates is not None and index_path and len(near_duplicates):
+        try:
+            await asyncio.to_thread(near_duplicates.save, index_path, schema_version())
+        except Exception as e:
+            print(f"Near-duplicate index not saved to {index_path}: {e}")
+    if tenants is not None:
+        await tenants.close()
+    await async_engine.dispose()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="EdTech NLP-to-SQL API",
     description="AI-powered backend service that converts natural language questions into SQL queries",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -25,10 +197,144 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+settings = get_settings()
+
+# Compress large JSON/text/Arrow responses for clients that accept it
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        min_size=settings.compression_min_size,
+        gzip_level=settings.compression_gzip_level,
+        zstd_level=settings.compression_zstd_level
+    )
+
+# Admission control: per-client rate limits and load shedding
+admission = AdmissionController(
+    enabled=settings.admission_enabled,
+    rate_per_second=settings.rate_limit_per_second,
+    burst=settings.rate_limit_burst,
+    llm_rate_per_second=settings.llm_rate_limit_per_second,
+    llm_burst=settings.llm_rate_limit_burst,
+    max_in_flight=settings.max_in_flight_requests,
+    llm_max_concurrency=settings.llm_max_concurrency,
+    slo_seconds=settings.request_slo_seconds,
+    llm_slo_seconds=settings.llm_slo_seconds
+)
+if admission.enabled:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        api_keys=set(settings.admission_api_keys) | set(settings.tenant_api_keys)
+    )
+
+# Request profiling: not even installed unless enabled
+profile_store = ProfileStore(settings.profiling_dir, max_profiles=settings.profiling_max_profiles)
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        token=settings.profiling_token,
+        sample_rate=settings.profiling_sample_rate,
+        interval_ms=settings.profiling_interval_ms
+    )
+
+# SQL reading these tables changes with every logged query
+_LOG_TABLES = re.compile(r"\bquery_log", re.IGNORECASE)
+
 # Initialize services
-nlp2sql_service = NLP2SQLService()
-sql_executor = SQLExecutor()
+nlp2sql_service = NLP2SQLService(
+    intents=IntentClassifier(settings.intent_max_examples) if settings.intent_routing_enabled else None,
+    intent_threshold=settings.intent_confidence_threshold,
+    intent_margin=settings.intent_margin,
+    near_duplicates=NearDuplicateIndex(
+        threshold=settings.near_duplicate_threshold,
+        num_perm=settings.near_duplicate_num_perm,
+        bands=settings.near_duplicate_bands,
+        max_entries=settings.near_duplicate_max_entries
+    ) if settings.near_duplicate_enabled else None,
+    recorded_sql=load_recorded_sql(settings.llm_replay_file) if settings.llm_replay_file else None
+)
 analytics_service = AnalyticsService()
+timeseries_service = TimeseriesService(minute_retention=timedelta(days=settings.minute_bucket_retention_days))
+data_version = DataVersionTracker(SessionLocal, ttl_seconds=settings.data_version_ttl_seconds)
+sql_executor = SQLExecutor(timeseries=timeseries_service, data_version=data_version)
+result_exporter = ResultExporter()
+ingest_service = IngestService(
+    batch_size=settings.ingest_batch_size,
+    pause_seconds=settings.ingest_pause_seconds,
+    data_version=data_version
+)
+
+# Without tenancy every request is served by the shared database's services
+default_tenant = Tenant(
+    None,
+    SessionLocal,
+    AsyncSessionLocal,
+    executor=sql_executor,
+    analytics=analytics_service,
+    timeseries=timeseries_service,
+    data_version=data_version,
+    ingest=ingest_service
+)
+
+
+def _tenant_services(tenant_id: str, session_factory: sessionmaker) -> dict:
+    """
+    Build the services of a newly opened tenant, bound to its database
+    
+    The NLP-to-SQL service (SQL cache, intents, near-duplicates) is shared:
+    every tenant has the same schema. Cached results are namespaced per
+    tenant, and query logs are written directly (no batching thread per
+    tenant).
+    """
+    tenant_analytics = AnalyticsService()
+    tenant_timeseries = TimeseriesService(minute_retention=timeseries_service.minute_retention)
+    tenant_version = DataVersionTracker(session_factory, ttl_seconds=settings.data_version_ttl_seconds)
+    shared_results = sql_executor.result_cache
+    return {
+        "executor": SQLExecutor(
+            timeseries=tenant_timeseries,
+            data_version=tenant_version,
+            result_cache=NamespacedCache(
+                shared_results.backend, f"{shared_results.prefix}tenant:{tenant_id}", shared_results.ttl_seconds
+            ) if isinstance(shared_results, NamespacedCache) else None
+        ),
+        "analytics": tenant_analytics,
+        "timeseries": tenant_timeseries,
+        "data_version": tenant_version,
+        "ingest": IngestService(
+            batch_size=settings.ingest_batch_size,
+            pause_seconds=settings.ingest_pause_seconds,
+            data_version=tenant_version
+        ),
+    }
+
+
+# Tenancy: per-tenant databases, opened on demand (not installed unless enabled)
+tenants = None
+if settings.tenancy_enabled:
+    tenants = TenantRegistry(
+        settings.tenant_database_url,
+        _tenant_services,
+        shards=settings.tenant_shards,
+        max_open=settings.tenant_max_open,
+        pool_size=settings.tenant_db_pool_size,
+        max_overflow=settings.tenant_db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        configure_sqlite=_configure_sqlite,
+        known_tenants=set(settings.tenant_ids) | set(settings.tenant_api_keys.values())
+    )
+    app.add_middleware(
+        TenantMiddleware,
+        registry=tenants,
+        api_keys=settings.tenant_api_keys,
+        header=settings.tenant_header
+    )
+
+
+def _tenant_of(http_request: Request) -> Tenant:
+    """Tenant selected for a request (the shared database without tenancy)"""
+    return getattr(http_request.state, "tenant", None) or default_tenant
 
 
 @app.get("/")
@@ -40,34 +346,138 @@ async def root():
 @app.post("/query", response_model=QueryResponse)
 async def query_endpoint(
     request: QueryRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Convert natural language question to SQL and execute it
     
+    Only questions that need the LLM count against the LLM admission
+    limits (see :func:`_resolve_query`).
+    
     Args:
         request: Query request containing the natural language question
+        http_request: Incoming HTTP request (carries the client key)
         db: Database session
         
     Returns:
         QueryResponse with SQL, results, and execution time
     """
+    return await _answer_query(request.question, http_request, db)
+
+
+@app.get("/query", response_model=QueryResponse)
+async def query_get_endpoint(
+    question: str,
+    http_request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Cacheable variant of ``POST /query`` for clients that poll
+    
+    Deterministic queries carry an ETag derived from the SQL and the data
+    version (see :func:`_query_etag`); a matching ``If-None-Match`` gets a
+    304 without executing or logging the query.
+    
+    Args:
+        question: Natural language question
+        http_request: Incoming HTTP request
+        response: Outgoing response (carries the caching headers)
+        db: Database session
+    
+    Returns:
+        QueryResponse with SQL, results, and execution time
+    """
+    return await _answer_query(question, http_request, db, response=response)
+
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch_endpoint(
+    request: BatchQueryRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Answer several questions in one round trip
+    
+    Questions are answered in order on one session, each exactly as
+    ``POST /query`` would (same caches and LLM admission checks). A failing
+    question gets its status code and error in its slot; the others are
+    still answered.
+    
+    Args:
+        request: Up to ``QUERY_BATCH_MAX_QUESTIONS`` questions
+        http_request: Incoming HTTP request (carries the client key)
+        db: Database session
+    
+    Returns:
+        BatchQueryResponse with one result per question, in request order
+    """
+    if len(request.questions) > settings.query_batch_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.query_batch_max_questions} questions per batch"
+        )
+    
+    results = []
+    for question in request.questions:
+        try:
+            answer = await _answer_query(question, http_request, db)
+        except HTTPException as e:
+            await db.rollback()
+            results.append(BatchQueryResult(question=question, status_code=e.status_code, error=str(e.detail)))
+            continue
+        results.append(BatchQueryResult(status_code=200, **answer.model_dump()))
+    return BatchQueryResponse(results=results)
+
+
+async def _answer_query(
+    question: str,
+    http_request: Request,
+    db: AsyncSession,
+    response: Optional[Response] = None
+):
+    """
+    Resolve, execute and log a question
+    
+    Args:
+        question: Natural language question
+        http_request: Incoming HTTP request
+        db: Database session
+        response: Outgoing response for conditional requests (None: always execute)
+    
+    Returns:
+        QueryResponse, or a 304 response when the client's copy is current
+    """
+    tenant = _tenant_of(http_request)
     try:
-        # Generate SQL from natural language
-        sql_query = nlp2sql_service.generate_sql(request.question)
+        query = await _resolve_query(question, http_request)
+        
+        if response is not None:
+            etag = await _query_etag(query, db, tenant)
+            if etag is None:
+                response.headers["Cache-Control"] = "no-store"
+            else:
+                headers = {"ETag": etag, "Cache-Control": cache_control(settings.query_max_age_seconds)}
+                if etag_matches(http_request.headers.get("if-none-match"), etag):
+                    return Response(status_code=304, headers=headers)
+                response.headers.update(headers)
         
         # Execute the SQL query
-        result, execution_time_ms = sql_executor.execute_query(
-            db, sql_query, request.question
+        result, execution_time_ms = await tenant.executor.execute_query_async(
+            db, query.sql, question, params=query.params
         )
         
         return QueryResponse(
-            question=request.question,
-            generated_sql=sql_query,
+            question=question,
+            generated_sql=query.render(),
             result=result,
             execution_time_ms=execution_time_ms
         )
         
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
     except ValueError as e:
         print(f"Validation Error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -78,25 +488,325 @@ async def query_endpoint(
         raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
 
 
+async def _query_etag(query: SQLQuery, db: AsyncSession, tenant: Tenant) -> Optional[str]:
+    """
+    Entity tag of a query's result
+    
+    Results change only with the data version (bumped by bulk loads), or
+    with the query log version for SQL that reads the log tables.
+    
+    Args:
+        query: Resolved query
+        db: Database session
+        tenant: Tenant whose data the query reads
+    
+    Returns:
+        ETag, or None if the SQL reads the clock or random numbers
+    """
+    sql = query.render()
+    if not is_deterministic(sql):
+        return None
+    parts = ["query", tenant.tenant_id, sql, await tenant.data_version.current_async()]
+    if _LOG_TABLES.search(sql):
+        parts += await tenant.analytics.get_stats_version_async(db)
+    return make_etag(*parts)
+
+
+@app.post("/query/export")
+async def export_endpoint(
+    request: ExportRequest,
+    http_request: Request,
+    session_factory: sessionmaker = Depends(get_session_factory)
+):
+    """
+    Convert a question to SQL and stream the full result for bulk analysis
+    
+    Rows are fetched in ``EXPORT_CHUNK_SIZE`` batches and encoded as they
+    are read, so large extracts use bounded memory. Results bypass the
+    result cache.
+    
+    Args:
+        request: Question, format ("csv", "arrow" or "parquet") and compression
+        http_request: Incoming HTTP request (carries the client key)
+        session_factory: Session factory; the stream owns its session
+    
+    Returns:
+        Streaming response with the encoded result as an attachment
+    """
+    try:
+        result_exporter.check(request.format, request.compression)
+        query = await _resolve_query(request.question, http_request)
+        
+        executor = _tenant_of(http_request).executor
+        db = session_factory()
+        try:
+            columns, batches = await run_in_threadpool(
+                executor.stream_query,
+                db, query.sql, request.question, query.params, settings.export_chunk_size
+            )
+            # Fix the columnar schema before the 200 goes out
+            storage_classes = None
+            if request.format != "csv":
+                storage_classes = await run_in_threadpool(
+                    executor.storage_classes, db, query.sql, len(columns), query.params
+                )
+        except Exception:
+            db.close()
+            raise
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
+    
+    def body():
+        try:
+            yield from result_exporter.stream(
+                columns, batches, request.format, request.compression, storage_classes
+            )
+        finally:
+            db.close()
+    
+    filename = result_exporter.filename(request.format, request.compression)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if request.compression:
+        # Already compressed: keep the response compression middleware off it
+        headers["Cache-Control"] = "no-transform"
+    return StreamingResponse(body(), media_type=result_exporter.media_type(request.format), headers=headers)
+
+
+def _require_ingest_token(x_ingest_token: Optional[str] = Header(None)) -> None:
+    """
+    Allow only callers presenting the ingest token
+    
+    Raises:
+        HTTPException: 403 without a configured or matching token
+    """
+    if not settings.ingest_token or not hmac.compare_digest(x_ingest_token or "", settings.ingest_token):
+        raise HTTPException(status_code=403, detail="A valid X-Ingest-Token is required")
+
+
+if settings.ingest_enabled:
+    @app.post("/ingest/{table}", response_model=IngestResponse, dependencies=[Depends(_require_ingest_token)])
+    async def ingest_endpoint(
+        table: Literal["students", "courses", "enrollments"],
+        http_request: Request,
+        format: Literal["csv", "ndjson"] = "csv",
+        upsert: bool = False,
+        session_factory: sessionmaker = Depends(get_session_factory)
+    ):
+        """
+        Bulk load rows from a CSV (with header) or NDJSON request body
+        
+        The body is parsed as it arrives and inserted in transactional batches
+        of ``INGEST_BATCH_SIZE`` rows. Rows failing validation (types, required
+        fields, unknown student/course ids) are rejected and reported; the rest
+        are loaded. Cached query results are invalidated.
+        
+        Args:
+            table: Table to load
+            http_request: Incoming HTTP request (streams the body)
+            format: Body format
+            upsert: Update rows whose id already exists instead of rejecting them
+            session_factory: Session factory; the load runs on a worker thread
+        
+        Returns:
+            IngestResponse with row counts, first errors and rows/second
+        """
+        tenant = _tenant_of(http_request)
+        
+        def load():
+            records = read_records(iter_lines(_body_chunks(http_request.stream())), format)
+            db = session_factory()
+            try:
+                return tenant.ingest.ingest(db, table, records, upsert=upsert)
+            finally:
+                db.close()
+        
+        try:
+            return IngestResponse(**await run_in_threadpool(load))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
+
+
+def _body_chunks(stream: AsyncIterator[bytes]) -> Iterator[bytes]:
+    """Read an async request body stream from a worker thread"""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            return
+        if chunk:
+            yield chunk
+
+
+async def _resolve_query(question: str, http_request: Request) -> SQLQuery:
+    """
+    Get validated SQL for a question
+    
+    Questions answered from the cache or the templates skip the LLM
+    admission checks; the rest are subject to the per-client LLM rate limit
+    and the global cap on concurrent generations.
+    
+    Args:
+        question: Natural language question
+        http_request: Incoming HTTP request (carries the client key)
+    
+    Returns:
+        Query to execute
+    
+    Raises:
+        AdmissionRejected: If the LLM path refuses the request
+        ValueError: If the SQL is not a single read-only SELECT statement
+    """
+    # Template answers carry their values as bind parameters; a shared SQL
+    # cache (SQLite file, Redis) is read off the event loop
+    if nlp2sql_service.sql_cache.blocking:
+        query = await asyncio.to_thread(nlp2sql_service.lookup_query, question)
+    else:
+        query = nlp2sql_service.lookup_query(question)
+    if query is None:
+        # Generate SQL from natural language (blocking LLM call: run it off the loop)
+        async with admission.llm_slot(getattr(http_request.state, "client_key", "")):
+            query = SQLQuery(await run_in_threadpool(nlp2sql_service.generate_sql, question))
+    
+    # Never execute anything but a single SELECT (verdicts are memoized)
+    validate_sql(query.sql)
+    return query
+
+
 @app.get("/stats", response_model=StatsResponse)
-async def stats_endpoint(db: Session = Depends(get_db)):
+async def stats_endpoint(
+    http_request: Request,
+    response: Response,
+    window: Optional[Literal["hour", "day", "week"]] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get analytics statistics about queries
     
+    The ETag is derived from the query log's version counters; a matching
+    ``If-None-Match`` gets a 304 without computing the stats.
+    
     Args:
+        http_request: Incoming HTTP request
+        response: Outgoing response (carries the caching headers)
+        window: Restrict keyword trends to the last hour, day or week
         db: Database session
         
     Returns:
         StatsResponse with analytics data
     """
+    tenant = _tenant_of(http_request)
+    try:
+        etag = make_etag("stats", tenant.tenant_id, *await tenant.analytics.get_stats_version_async(db, window=window))
+        headers = {"ETag": etag, "Cache-Control": cache_control(settings.stats_max_age_seconds)}
+        if etag_matches(http_request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
+        stats = await tenant.analytics.get_stats_async(db, window=window)
+        response.headers.update(headers)
+        return StatsResponse(window=window, **stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/stats/timeseries", response_model=TimeseriesResponse)
+def timeseries_endpoint(
+    http_request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: Optional[Literal["minute", "hour"]] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get throughput and latency percentiles over a time range
+    
+    Served entirely from the minute/hour rollup buckets.
+    
+    Args:
+        http_request: Incoming HTTP request
+        start: Range start (default: 24 hours before end)
+        end: Range end (default: now)
+        granularity: Bucket size; picked from the range length when omitted
+        db: Database session
+    
+    Returns:
+        TimeseriesResponse with per-bucket throughput and p50/p95/p99
+    """
+    end = _as_naive_utc(end) if end else datetime.utcnow()
+    start = _as_naive_utc(start) if start else end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
     try:
-        stats = analytics_service.get_stats(db)
-        return StatsResponse(**stats)
+        timeseries = _tenant_of(http_request).timeseries
+        return TimeseriesResponse(**timeseries.get_timeseries(db, start, end, granularity))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _as_naive_utc(value: datetime) -> datetime:
+    """Normalize a timestamp to the naive UTC form stored in the database"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _require_profiling_token(x_profile_token: Optional[str] = Header(None)) -> None:
+    """
+    Allow only callers presenting the profiling token
+    
+    Raises:
+        HTTPException: 403 without a configured or matching token
+    """
+    if not settings.profiling_token or not hmac.compare_digest(x_profile_token or "", settings.profiling_token):
+        raise HTTPException(status_code=403, detail="A valid X-Profile-Token is required")
+
+
+if settings.profiling_enabled:
+    @app.get("/profiles", dependencies=[Depends(_require_profiling_token)])
+    def list_profiles():
+        """
+        List saved request profiles, newest first
+        
+        Returns:
+            Profile metadata: id, mode, request method/path/status, duration
+        """
+        return {"profiles": profile_store.list()}
+    
+    @app.get("/profiles/{profile_id}", dependencies=[Depends(_require_profiling_token)])
+    def download_profile(profile_id: str):
+        """
+        Download a saved profile
+        
+        Sampled profiles are collapsed stacks (text, one "stack count" per
+        line); cProfile ones are pstats files (``python -m pstats FILE``).
+        
+        Args:
+            profile_id: Id from the X-Profile-Id response header or the list
+        
+        Returns:
+            The profile file
+        """
+        found = profile_store.path(profile_id)
+        if found is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        path, mode = found
+        media_type = "text/plain" if mode == "sample" else "application/octet-stream"
+        return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+
 @app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+async def health_check(request: Request, response: Response):
+    """Health check endpoint; not ready (503) until cache warm-up finishes"""
+    cache_warmer = getattr(request.app.state, "cache_warmer", None)
+    if cache_warmer is not None and not cache_warmer.ready.is_set():
+        response.status_code = 503
+        return {"status": "warming_up"}
     return {"status": "healthy"}
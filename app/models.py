@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, create_engine
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
+from app.search import install_fts, drop_fts
+from app.aggregates import install_aggregates
 
 Base = declarative_base()
 
@@ -51,3 +53,65 @@ class QueryLog(Base):
     generated_sql = Column(String, nullable=False)
     execution_time = Column(Integer, nullable=False)  # milliseconds
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class QueryLogArchiveDay(Base):
+    """Per-day summary of query logs moved to the archive"""
+    __tablename__ = "query_log_archive_days"
+    
+    day = Column(String, primary_key=True)  # YYYY-MM-DD
+    query_count = Column(Integer, nullable=False, default=0)
+    total_execution_ms = Column(Integer, nullable=False, default=0)
+    slowest_question = Column(String)
+    slowest_sql = Column(String)
+    slowest_execution_time = Column(Integer)
+    slowest_created_at = Column(DateTime)
+    keywords = Column(String, nullable=False, default="{}")  # JSON keyword -> count
+    archive_path = Column(String)
+
+
+class QueryLogBucket(Base):
+    """Per-minute/per-hour rollup of query logs"""
+    __tablename__ = "query_log_buckets"
+    
+    granularity = Column(String, primary_key=True)  # "minute" or "hour"
+    bucket_start = Column(DateTime, primary_key=True)
+    query_count = Column(Integer, nullable=False, default=0)
+    total_execution_ms = Column(Integer, nullable=False, default=0)
+    max_execution_ms = Column(Integer, nullable=False, default=0)
+    histogram = Column(String, nullable=False)  # JSON counts per latency bucket
+
+
+class CourseEnrollmentRollup(Base):
+    """Materialized enrollment counts per course and year"""
+    __tablename__ = "course_enrollment_rollups"
+    
+    course_id = Column(Integer, primary_key=True)
+    year = Column(String, primary_key=True)
+    enrollment_count = Column(Integer, nullable=False, default=0)
+
+
+class CategoryGradeRollup(Base):
+    """Materialized enrollment counts per course category and student grade"""
+    __tablename__ = "category_grade_rollups"
+    
+    category = Column(String, primary_key=True)
+    grade = Column(Integer, primary_key=True)
+    enrollment_count = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Counter bumped by bulk loads; result cache keys include it"""
+    __tablename__ = "data_versions"
+    
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+# FTS5 shadow tables for name search (SQLite only)
+event.listen(Base.metadata, "after_create", install_fts)
+event.listen(Base.metadata, "before_drop", drop_fts)
+
+# Incremental maintenance of the enrollment rollups (SQLite only)
+event.listen(Base.metadata, "after_create", install_aggregates)
@@ -0,0 +1,315 @@
+"""
+Near-duplicate question index.
+
+:class:`NearDuplicateIndex` finds previously answered questions that differ
+from a new one only by filler words, word order or typos, so their SQL can
+be reused instead of calling the LLM again.
+
+A question becomes a set of shingles: character trigrams of its words with
+filler words dropped, so word order does not matter and a typo only changes
+a few shingles. Its MinHash signature (``num_perm`` 32-bit minimums of
+stable hash permutations) estimates the Jaccard similarity of two shingle
+sets. Signatures are split into ``bands``; questions sharing any band are
+candidates, and candidates are checked against the full signature.
+
+The band keys of the bulk of the index are kept in one sorted array
+(binary search); keys added since the last re-sort are scanned directly. The whole
+index is a few NumPy arrays and is saved with ``np.savez``, so loading it at
+startup is a couple of array reads.
+"""
+from typing import Callable, Iterable, List, Optional, Tuple
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+# Words that do not change what a question asks for
+FILLER_WORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "is", "are", "was", "were",
+    "do", "does", "did", "me", "please", "there", "all", "every", "our", "we", "have"
+}
+
+# Negation and comparison words: a reused question must have exactly the same
+# ones ("students not enrolled" must never reuse SQL for "students enrolled")
+REQUIRED_WORDS = {
+    "not", "no", "never", "without", "none", "nobody", "except", "excluding", "only",
+    "before", "after", "since", "until", "between", "above", "below", "over", "under",
+    "more", "less", "fewer", "than", "least", "most", "highest", "lowest", "top", "bottom",
+    "first", "last", "earliest", "latest", "oldest", "newest", "min", "max", "minimum", "maximum",
+}
+
+# Keys added since the last sort that are scanned linearly
+UNSORTED_TAIL = 1024
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(question: str) -> np.ndarray:
+    """
+    Stable 32-bit hashes of a question's shingles
+    
+    Args:
+        question: Natural language question
+    
+    Returns:
+        Unique shingle hashes (uint64 holding 32-bit values)
+    """
+    grams = set()
+    for word in _WORD.findall(question.lower()):
+        if word in FILLER_WORDS:
+            continue
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def required_words(question: str) -> frozenset:
+    """
+    Negation and comparison words of a question (``n't`` counts as "not")
+    
+    Args:
+        question: Natural language question
+    
+    Returns:
+        The question's words that are in :data:`REQUIRED_WORDS`
+    """
+    words = _WORD.findall(re.sub(r"n't\b", " not", question.lower()))
+    return frozenset(word for word in words if word in REQUIRED_WORDS)
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of answered questions and their SQL"""
+    
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        max_entries: int = 50000,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.max_entries = max_entries
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        # Multiply-shift permutations: high 32 bits of (a * x + b) mod 2^64, a odd
+        self._a = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)
+        # Combines the rows of a band into one key; distinct per band, so keys
+        # of all bands can share one sorted array
+        self._band_mix = rng.randint(1, 1 << 63, size=(bands, num_perm // bands), dtype=np.uint64) | np.uint64(1)
+        
+        self.questions: List[str] = []
+        self.sql: List[str] = []
+        self._keys = set()
+        # Row i belongs to questions[i]; rows past len(questions) are spare capacity
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._band_keys = np.zeros((0, bands), dtype=np.uint64)
+        self._sorted_count = 0
+        self._sorted_keys = np.zeros(0, dtype=np.uint64)
+        self._sorted_ids = np.zeros(0, dtype=np.int64)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.questions)
+    
+    def signature(self, question: str) -> np.ndarray:
+        """MinHash signature of a question (all-max for questions without shingles)"""
+        hashes = shingles(question)
+        if not len(hashes):
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        permuted = (np.outer(hashes, self._a) + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+    
+    def _band_keys_of(self, signatures: np.ndarray) -> np.ndarray:
+        """One 64-bit key per band (wrapping multiply-add of its rows)"""
+        rows = signatures.astype(np.uint64).reshape(len(signatures), self.bands, -1)
+        return (rows * self._band_mix).sum(axis=2, dtype=np.uint64)
+    
+    def add(self, question: str, sql: str) -> bool:
+        """
+        Index an answered question
+        
+        Args:
+            question: Natural language question
+            sql: SQL that answered it
+        
+        Returns:
+            True if added (False for repeats and once the index is full)
+        """
+        key = " ".join(_WORD.findall(question.lower()))
+        if not key:
+            return False
+        signature = self.signature(question)
+        with self._lock:
+            if key in self._keys or len(self.questions) >= self.max_entries:
+                return False
+            n = len(self.questions)
+            self._reserve(n + 1)
+            self._signatures[n] = signature
+            self._band_keys[n] = self._band_keys_of(signature[None])[0]
+            self._keys.add(key)
+            self.questions.append(question)
+            self.sql.append(sql)
+            if len(self.questions) - self._sorted_count > UNSORTED_TAIL:
+                self._sort()
+            return True
+    
+    def add_many(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """Index (question, sql) pairs; returns how many were new"""
+        return sum(self.add(question, sql) for question, sql in pairs)
+    
+    def _reserve(self, n: int) -> None:
+        """Grow the signature arrays geometrically to hold n rows (caller holds the lock)"""
+        capacity = len(self._signatures)
+        if n <= capacity:
+            return
+        capacity = max(16, capacity * 2, n)
+        for name in ("_signatures", "_band_keys"):
+            old = getattr(self, name)
+            grown = np.zeros((capacity, old.shape[1]), dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+    
+    def _sort(self) -> None:
+        """Re-sort the band keys of every question (caller holds the lock)"""
+        keys = self._band_keys[:len(self.questions)].ravel()
+        order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[order]
+        self._sorted_ids = order // self.bands
+        self._sorted_count = len(self.questions)
+    
+    def lookup(
+        self,
+        question: str,
+        accept: Optional[Callable[[str, str], bool]] = None
+    ) -> Optional[Tuple[str, str, float]]:
+        """
+        Most similar indexed question at or above the threshold
+        
+        Only questions with the same negation and comparison words (see
+        :func:`required_words`) qualify, however similar otherwise.
+        
+        Args:
+            question: Natural language question
+            accept: Optional extra check on each qualifying (indexed
+                question, SQL); rejected ones are skipped for the next best
+        
+        Returns:
+            (indexed question, its SQL, estimated Jaccard similarity), or None
+        """
+        signature = self.signature(question)
+        band_keys = self._band_keys_of(signature[None])[0]
+        # Consistent snapshot: rows below n never change; growth replaces the arrays
+        with self._lock:
+            n, sorted_count = len(self.questions), self._sorted_count
+            sorted_keys, sorted_ids = self._sorted_keys, self._sorted_ids
+            signatures, all_band_keys = self._signatures, self._band_keys
+        if n == 0:
+            return None
+        
+        lefts = np.searchsorted(sorted_keys, band_keys, side="left")
+        rights = np.searchsorted(sorted_keys, band_keys, side="right")
+        candidates = [sorted_ids[left:right] for left, right in zip(lefts.tolist(), rights.tolist()) if right > left]
+        tail = all_band_keys[sorted_count:n]
+        candidates.append(sorted_count + np.flatnonzero((tail == band_keys).any(axis=1)))
+        candidates = np.unique(np.concatenate(candidates))
+        if not len(candidates):
+            return None
+        
+        similarity = (signatures[candidates] == signature).mean(axis=1)
+        required = required_words(question)
+        for best in np.argsort(-similarity, kind="stable").tolist():
+            if similarity[best] < self.threshold:
+                break
+            doc = int(candidates[best])
+            if required_words(self.questions[doc]) != required:
+                continue
+            if accept is None or accept(self.questions[doc], self.sql[doc]):
+                return self.questions[doc], self.sql[doc], float(similarity[best])
+        return None
+    
+    def save(self, path: str, tag: str = "") -> None:
+        """
+        Write the index to an ``.npz`` file (atomically replaced)
+        
+        Each call writes its own temporary file, so workers saving at the same
+        time never interleave their writes; the last replace wins.
+        
+        Args:
+            path: Destination file
+            tag: Stored with the index; :meth:`load` ignores files with another tag
+                (e.g. the schema version, so SQL for an old schema is never reused)
+        """
+        with self._lock:
+            n = len(self.questions)
+            questions, sql = self._pack(self.questions[:n]), self._pack(self.sql[:n])
+            arrays = {
+                "params": np.array([self.num_perm, self.bands, self.seed], dtype=np.int64),
+                "tag": np.array(tag),
+                "signatures": self._signatures[:n],
+                "question_text": questions[0], "question_offsets": questions[1],
+                "sql_text": sql[0], "sql_offsets": sql[1],
+            }
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    
+    def load(self, path: str, tag: str = "") -> int:
+        """
+        Replace the index contents with a saved index
+        
+        Files written with other signature parameters or another tag are ignored.
+        
+        Args:
+            path: File written by :meth:`save`
+            tag: Tag the file must have been saved with
+        
+        Returns:
+            Number of questions loaded
+        """
+        with np.load(path) as data:
+            if data["params"].tolist() != [self.num_perm, self.bands, self.seed]:
+                return 0
+            if (str(data["tag"]) if "tag" in data.files else "") != tag:
+                return 0
+            questions = self._unpack(data["question_text"], data["question_offsets"])
+            sql = self._unpack(data["sql_text"], data["sql_offsets"])
+            signatures = data["signatures"]
+        
+        keep = min(len(questions), self.max_entries)
+        with self._lock:
+            self.questions, self.sql = questions[:keep], sql[:keep]
+            self._keys = {" ".join(_WORD.findall(q.lower())) for q in self.questions}
+            self._signatures = signatures[:keep].copy()
+            self._band_keys = self._band_keys_of(self._signatures)
+            self._sort()
+        return keep
+    
+    @staticmethod
+    def _pack(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Strings as one UTF-8 byte array plus end offsets"""
+        encoded = [text.encode() for text in texts]
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return blob, np.cumsum([len(e) for e in encoded], dtype=np.int64)
+    
+    @staticmethod
+    def _unpack(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+        """Inverse of :meth:`_pack`"""
+        data = blob.tobytes()
+        starts = [0] + offsets[:-1].tolist()
+        return [data[start:end].decode() for start, end in zip(starts, offsets.tolist())]
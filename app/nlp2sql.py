@@ -1,16 +1,263 @@
-import google.generativeai as genai
 from app.config import get_settings
-from typing import Optional
+from app.cache import CacheBackend, LRUCache
+from app.search import fts_phrase
+from app.sql_validation import validate_sql
+from app.intent import IntentClassifier
+from app.near_duplicates import FILLER_WORDS, NearDuplicateIndex
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+import re
+import threading
 
-settings = get_settings()
-genai.configure(api_key=settings.gemini_api_key)
+# Named bind parameters (":name") outside of string literals
+_BIND_PARAM = re.compile(r"'(?:[^']|'')*'|(?<![:\w]):(\w+)")
+
+
+class SQLQuery(NamedTuple):
+    """SQL text plus the bind parameters it is executed with"""
+    sql: str
+    params: Mapping[str, Any] = MappingProxyType({})
+    
+    def render(self) -> str:
+        """
+        Inline the parameters as SQL literals, for display and the query log
+        
+        Returns:
+            Equivalent SQL without bind parameters
+        """
+        if not self.params:
+            return self.sql
+        
+        def literal(match: "re.Match") -> str:
+            name = match.group(1)
+            if name is None or name not in self.params:
+                return match.group(0)
+            value = self.params[name]
+            if isinstance(value, str):
+                return "'" + value.replace("'", "''") + "'"
+            return str(value)
+        
+        return _BIND_PARAM.sub(literal, self.sql)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for cache lookups
+    
+    Args:
+        question: Natural language question
+    
+    Returns:
+        Lowercased question with collapsed whitespace and no trailing punctuation
+    """
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+
+# Numbers in questions and SQL, and SQL string literals
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_STRING_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+_LIMIT_NUMBER = re.compile(r"\b(?:LIMIT|OFFSET)\s+(\d+)", re.IGNORECASE)
+_STRFTIME_FORMAT = re.compile(r"(?:%[a-zA-Z][-/: ]?)+")
+_FTS_COLUMN = re.compile(r"\b\w+\s*:")
+
+
+def literals_in_question(sql: str, question: str) -> bool:
+    """
+    Check that SQL chosen for a question agrees with the question's literals
+    
+    Every word of every string literal and every number of the SQL (other
+    than LIMIT/OFFSET counts and strftime formats) must appear in the
+    question, and every number in the question must appear in the SQL.
+    
+    Args:
+        sql: SQL with literals inlined
+        question: Natural language question
+    
+    Returns:
+        True if the SQL can answer the question as asked
+    """
+    question_lower = question.lower()
+    question_numbers = set(_NUMBER.findall(question_lower))
+    
+    required = set()
+    for match in _STRING_LITERAL.finditer(sql):
+        value = match.group(1).replace("''", "'")
+        if _STRFTIME_FORMAT.fullmatch(value):
+            continue
+        words = re.findall(r"[a-z0-9]+", _FTS_COLUMN.sub(" ", value.lower()))
+        if any(word not in question_lower for word in words):
+            return False
+        required.update(word for word in words if word.isdigit())
+    
+    code = _STRING_LITERAL.sub(" ", sql)
+    optional = set(_LIMIT_NUMBER.findall(code))
+    numbers = set(_NUMBER.findall(code))
+    required |= numbers - optional
+    return required <= question_numbers and question_numbers <= required | optional
+
+
+def _stem(word: str) -> str:
+    """Crude singular of an English word (students -> student, classes -> class)"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def content_words(question: str) -> set:
+    """
+    Words of a question that say what it asks for
+    
+    Filler words and numbers (checked by :func:`literals_in_question`) are
+    dropped and plurals folded, so "How many students do we have?" and
+    "How many students are there?" have the same content words.
+    
+    Args:
+        question: Natural language question
+    
+    Returns:
+        Set of stemmed content words
+    """
+    return {
+        _stem(word) for word in re.findall(r"[a-z0-9]+", question.lower())
+        if word not in FILLER_WORDS and not word.isdigit()
+    }
+
+
+# Template answers; each takes the lowercased question
+_YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+_GRADE = re.compile(r"\bgrade (\d{1,2}|ten)\b")
+
+
+def _python_enrollment_count(question_lower: str) -> Optional[SQLQuery]:
+    """Students enrolled in Python courses, optionally in one year"""
+    if "python" not in question_lower:
+        return None
+    year = _YEAR.search(question_lower)
+    if year:
+        return SQLQuery(
+            "SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id WHERE c.id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH :match) AND strftime('%Y', e.enrolled_at) = :year",
+            {"match": fts_phrase("python", "name"), "year": year.group(0)}
+        )
+    return SQLQuery(
+        "SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id WHERE c.id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH :match)",
+        {"match": fts_phrase("python", "name")}
+    )
+
+
+def _student_count(question_lower: str) -> Optional[SQLQuery]:
+    """Number of students"""
+    return SQLQuery("SELECT COUNT(*) FROM students")
+
+
+def _student_list(question_lower: str) -> Optional[SQLQuery]:
+    """Students, optionally in one grade"""
+    grade = _GRADE.search(question_lower)
+    if grade:
+        value = 10 if grade.group(1) == "ten" else int(grade.group(1))
+        return SQLQuery("SELECT id, name, grade FROM students WHERE grade = :grade", {"grade": value})
+    return SQLQuery("SELECT id, name, grade FROM students")
+
+
+def _course_list(question_lower: str) -> Optional[SQLQuery]:
+    """Courses, optionally only programming courses"""
+    if "programming" in question_lower:
+        return SQLQuery("SELECT id, name, category FROM courses WHERE category = :category", {"category": "Programming"})
+    return SQLQuery("SELECT id, name, category FROM courses")
+
+
+def _enrollment_count(question_lower: str) -> Optional[SQLQuery]:
+    """Number of enrollments"""
+    return SQLQuery("SELECT COUNT(*) FROM enrollments")
+
+
+def _top_course(question_lower: str) -> Optional[SQLQuery]:
+    """Course with the most enrollments"""
+    return SQLQuery("SELECT c.name, COUNT(e.id) as enrollment_count FROM courses c JOIN enrollments e ON c.id = e.course_id GROUP BY c.id ORDER BY enrollment_count DESC LIMIT 1")
+
+
+# Classifier labels of template intents start with this prefix
+TEMPLATE_LABEL_PREFIX = "template:"
+
+# Template intents: example phrasings (classifier training) and SQL builder
+TEMPLATE_INTENTS: Dict[str, Tuple[List[str], Callable[[str], Optional[SQLQuery]]]] = {
+    "python_enrollment_count": ([
+        "How many students are enrolled in Python courses?",
+        "How many students enrolled in Python in 2024?",
+        "Count of learners in the Python class",
+        "Number of pupils taking Python",
+        "How many people signed up for Python programming?",
+    ], _python_enrollment_count),
+    "student_count": ([
+        "How many students are there?",
+        "Count all students",
+        "Total number of students",
+        "How many learners do we have?",
+        "Number of pupils in the school",
+    ], _student_count),
+    "student_list": ([
+        "List all students",
+        "Show me every student",
+        "Show all learners in grade 10",
+        "Which students are in grade 11?",
+        "Display the student roster",
+    ], _student_list),
+    "course_list": ([
+        "List all courses",
+        "Show me every course",
+        "What classes are offered?",
+        "Which programming courses are available?",
+        "Display the course catalog",
+    ], _course_list),
+    "enrollment_count": ([
+        "Total number of enrollments",
+        "How many enrollments are there?",
+        "Count all course registrations",
+        "Number of sign-ups across all courses",
+    ], _enrollment_count),
+    "top_course": ([
+        "Which course has the most enrollments?",
+        "Most popular course",
+        "Course with the highest number of registrations",
+    ], _top_course),
+}
 
 
 class NLP2SQLService:
     """Service for converting natural language to SQL queries using LLM"""
     
-    def __init__(self):
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+    def __init__(
+        self,
+        model_name: str = 'models/gemini-2.5-flash',
+        sql_cache: Optional[CacheBackend] = None,
+        intents: Optional[IntentClassifier] = None,
+        intent_threshold: float = 0.6,
+        intent_margin: float = 0.1,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        recorded_sql: Optional[Mapping[str, str]] = None
+    ):
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.sql_cache = sql_cache if sql_cache is not None else LRUCache(maxsize=4096)
+        # Local routing tier between the templates and the LLM (None disables it)
+        self.intents = intents
+        # Content words of the examples behind each label; a routed question may not add others
+        self._intent_words: Dict[str, set] = {}
+        self.intent_threshold = intent_threshold
+        self.intent_margin = intent_margin
+        # Answered questions, for reuse by near-duplicates (None disables it)
+        self.near_duplicates = near_duplicates
+        # Normalized question -> SQL answered instead of Gemini (traffic replay)
+        self.recorded_sql = recorded_sql
+        self._learn_intents(
+            (example, TEMPLATE_LABEL_PREFIX + name)
+            for name, (examples, _) in TEMPLATE_INTENTS.items()
+            for example in examples
+        )
         self.schema_info = """
 Database Schema:
 1. students table:
@@ -30,11 +277,47 @@ Database Schema:
    - course_id (INTEGER, FOREIGN KEY -> courses.id)
    - enrolled_at (DATETIME)
 
+4. courses_fts (FTS5 full-text index over courses, rowid = courses.id):
+   - name, category
+
+5. students_fts (FTS5 full-text index over students, rowid = students.id):
+   - name
+
 Relationships:
 - A student can have multiple enrollments
 - A course can have multiple enrollments
 - An enrollment belongs to one student and one course
+- courses_fts.rowid = courses.id, students_fts.rowid = students.id
 """
+
+    @property
+    def model(self):
+        """
+        Gemini model, created on first use
+        
+        ``google.generativeai`` is imported and configured here rather than at
+        import time, which keeps startup fast and lets the service run
+        template-only without an API key.
+        
+        Raises:
+            RuntimeError: If GEMINI_API_KEY is not configured
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    api_key = get_settings().gemini_api_key
+                    if not api_key:
+                        raise RuntimeError("GEMINI_API_KEY is not configured")
+                    
+                    import google.generativeai as genai
+                    genai.configure(api_key=api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+    
+    def warm_up(self) -> None:
+        """Create the Gemini client ahead of the first LLM-backed request"""
+        if self.recorded_sql is None:
+            self.model
     
     def generate_sql(self, question: str) -> str:
         """
@@ -44,36 +327,143 @@ Relationships:
             question: Natural language question
             
         Returns:
-            SQL query string
+            SQL query string (template parameters inlined)
         """
+        return self.generate_query(question).render()
+    
+    def generate_query(self, question: str) -> SQLQuery:
+        """
+        Generate a parameterized SQL query from a natural language question
+        
+        Template answers keep their values as bind parameters so every
+        variant shares one statement (and one prepared-statement cache entry).
+        
+        Args:
+            question: Natural language question
+        
+        Returns:
+            SQL query with its bind parameters
+        """
+        query = self.lookup_query(question)
+        if query is not None:
+            return query
+        return SQLQuery(self._generate_with_llm(question))
+    
+    def lookup_query(self, question: str) -> Optional[SQLQuery]:
+        """
+        Answer a question without the LLM
+        
+        Tried in order: the question-to-SQL cache, the templates, indexed
+        near-duplicates of answered questions, and the intent classifier.
+        
+        Args:
+            question: Natural language question
+        
+        Returns:
+            SQL query with its bind parameters, or None if the question needs the LLM
+        """
+        # Previously generated (or warmed) SQL for the same question
+        cached_sql = self.sql_cache.get(normalize_question(question))
+        if cached_sql is not None:
+            return SQLQuery(cached_sql)
+        
         # Demo/fallback mode for common questions
         question_lower = question.lower()
         
         # Pattern matching for common queries (fallback when API is unavailable)
         if "how many students" in question_lower and "enrolled" in question_lower:
-            if "python" in question_lower and "2024" in question_lower:
-                return "SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id WHERE c.name LIKE '%Python%' AND strftime('%Y', e.enrolled_at) = '2024'"
-            elif "python" in question_lower:
-                return "SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id WHERE c.name LIKE '%Python%'"
-            else:
-                return "SELECT COUNT(*) FROM students"
+            if "python" in question_lower:
+                return _python_enrollment_count(question_lower)
+            return _student_count(question_lower)
         
         if "list" in question_lower and "students" in question_lower:
-            if "grade 10" in question_lower or "grade ten" in question_lower:
-                return "SELECT id, name, grade FROM students WHERE grade = 10"
-            return "SELECT id, name, grade FROM students"
+            return _student_list(question_lower)
         
         if "list" in question_lower and "courses" in question_lower:
-            if "programming" in question_lower:
-                return "SELECT id, name, category FROM courses WHERE category = 'Programming'"
-            return "SELECT id, name, category FROM courses"
+            return _course_list(question_lower)
         
         if "total" in question_lower and "enrollments" in question_lower:
-            return "SELECT COUNT(*) FROM enrollments"
+            return _enrollment_count(question_lower)
         
         if "which course" in question_lower and "most enrollments" in question_lower:
-            return "SELECT c.name, COUNT(e.id) as enrollment_count FROM courses c JOIN enrollments e ON c.id = e.course_id GROUP BY c.id ORDER BY enrollment_count DESC LIMIT 1"
+            return _top_course(question_lower)
+        
+        # Answered questions differing only by filler words or word order; every
+        # content word must occur in the answered question, so "count" or "sum"
+        # never reuses the SQL for "names" or "average"
+        if self.near_duplicates is not None:
+            words = content_words(question)
+            match = self.near_duplicates.lookup(
+                question,
+                accept=lambda indexed, sql: words <= content_words(indexed) and literals_in_question(sql, question)
+            )
+            if match is not None:
+                return SQLQuery(match[1])
+        
+        # Paraphrases of templates and of previously answered questions
+        return self._classify(question)
+    
+    def _learn_intents(self, examples: Iterable[Tuple[str, str]]) -> None:
+        """Add (question, label) examples to the intent classifier and the label vocabularies"""
+        if self.intents is None:
+            return
+        for question, label in examples:
+            if self.intents.add(question, label):
+                self._intent_words.setdefault(label, set()).update(content_words(question))
+    
+    def _classify(self, question: str) -> Optional[SQLQuery]:
+        """
+        Route a question with the local intent classifier
+        
+        Only the best candidate is considered, and only at or above the
+        confidence threshold and clearly ahead of the runner-up. Every content
+        word of the question must occur in an example of that label, so "How
+        many courses do we have?" is not answered with the student count and
+        "students named Alice" not with the whole roster. A template must be
+        able to fill its parameters from the question, and the resulting SQL
+        must agree with the question's literals (see
+        :func:`literals_in_question`), so "grade 9" is never answered with SQL
+        logged for "grade 11".
+        
+        Args:
+            question: Natural language question
+        
+        Returns:
+            SQL query, or None if no candidate is confident and safe
+        """
+        if self.intents is None:
+            return None
+        candidates = self.intents.classify(question, top_k=2)
+        if not candidates or candidates[0][1] < self.intent_threshold:
+            return None
+        # Too close to call between two intents: let the LLM decide
+        if len(candidates) > 1 and candidates[0][1] - candidates[1][1] < self.intent_margin:
+            return None
+        
+        label = candidates[0][0]
+        if not content_words(question) <= self._intent_words.get(label, set()):
+            return None
+        if label.startswith(TEMPLATE_LABEL_PREFIX):
+            query = TEMPLATE_INTENTS[label[len(TEMPLATE_LABEL_PREFIX):]][1](question.lower())
+        else:
+            query = SQLQuery(label)
+        if query is None or not literals_in_question(query.render(), question):
+            return None
+        return query
+    
+    def _generate_with_llm(self, question: str) -> str:
+        """
+        Generate SQL for a question with Google Gemini
+        
+        With ``recorded_sql`` set, the SQL recorded for the question is
+        returned instead, so a replayed run is deterministic and offline.
+        
+        Args:
+            question: Natural language question
         
+        Returns:
+            Validated SQL query string
+        """
         # Try using Gemini API
         try:
             prompt = f"""You are an expert SQL query generator for an EdTech database.
@@ -88,18 +478,26 @@ IMPORTANT RULES:
 6. Use JOINs when needed to answer questions involving multiple tables
 7. Use WHERE clauses to filter data appropriately
 8. Consider date/time filtering when questions mention specific years or time periods
+9. For searches by course name/category or student name, use the full-text index instead of LIKE:
+   c.id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH 'name : "python"')
+   s.id IN (SELECT rowid FROM students_fts WHERE students_fts MATCH 'name : "alice"')
 
 Example:
 Question: "How many students enrolled in Python courses in 2024?"
-SQL: SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id WHERE c.name LIKE '%Python%' AND strftime('%Y', e.enrolled_at) = '2024'
+SQL: SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id WHERE c.id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH 'name : "python"') AND strftime('%Y', e.enrolled_at) = '2024'
 
 Now generate a SQL query for this question: {question}
 
 Return ONLY the SQL query, nothing else.
 """
             
-            response = self.model.generate_content(prompt)
-            sql_query = response.text.strip()
+            if self.recorded_sql is not None:
+                sql_query = self.recorded_sql.get(normalize_question(question))
+                if sql_query is None:
+                    raise LookupError("no SQL was recorded for this question")
+            else:
+                response = self.model.generate_content(prompt)
+                sql_query = response.text.strip()
             
             # Remove markdown code blocks if present
             if sql_query.startswith("```"):
@@ -112,12 +510,58 @@ Return ONLY the SQL query, nothing else.
             # Validate the query
             self._validate_query(sql_query)
             
+            self.sql_cache.set(normalize_question(question), sql_query)
+            self._learn_intents([(question, sql_query)])
+            if self.near_duplicates is not None:
+                self.near_duplicates.add(question, sql_query)
             return sql_query
             
         except Exception as e:
             # Fallback to simple pattern matching
             raise Exception(f"Failed to generate SQL: {str(e)}. Try asking: 'How many students are enrolled?' or 'List all students'")
     
+    def prime(self, question: str, sql: str) -> bool:
+        """
+        Pre-populate the question-to-SQL cache, e.g. from the query log
+        
+        Args:
+            question: Natural language question
+            sql: SQL previously generated for it
+        
+        Returns:
+            True if the SQL passed validation and was cached
+        """
+        return bool(self.prime_many([(question, sql)]))
+    
+    def prime_many(self, pairs: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Pre-populate the question-to-SQL cache with one bulk write
+        
+        Accepted pairs are also added to the intent classifier and the
+        near-duplicate index, so rewordings of logged questions can be
+        answered locally.
+        
+        Args:
+            pairs: (question, sql) pairs
+        
+        Returns:
+            The pairs whose SQL passed validation and was cached
+        """
+        accepted = []
+        for question, sql in pairs:
+            try:
+                self._validate_query(sql)
+            except ValueError:
+                continue
+            accepted.append((question, sql))
+        
+        if accepted:
+            self.sql_cache.set_many({normalize_question(q): sql for q, sql in accepted})
+            self._learn_intents(accepted)
+            if self.near_duplicates is not None:
+                self.near_duplicates.add_many(accepted)
+        return accepted
+    
     def _validate_query(self, sql: str) -> None:
         """
         Validate that the SQL query is safe and only contains SELECT
@@ -128,19 +572,4 @@ Return ONLY the SQL query, nothing else.
         Raises:
             ValueError: If query contains forbidden operations
         """
-        sql_upper = sql.upper().strip()
-        
-        # Check if it starts with SELECT
-        if not sql_upper.startswith("SELECT"):
-            raise ValueError("Only SELECT queries are allowed")
-        
-        # List of forbidden keywords
-        forbidden_keywords = [
-            "DELETE", "DROP", "UPDATE", "INSERT", "ALTER",
-            "CREATE", "TRUNCATE", "REPLACE", "EXEC", "EXECUTE"
-        ]
-        
-        # Check for forbidden keywords
-        for keyword in forbidden_keywords:
-            if keyword in sql_upper:
-                raise ValueError(f"Query contains forbidden keyword: {keyword}")
+        validate_sql(sql)
@@ -0,0 +1,310 @@
+"""
+On-demand request profiling.
+
+:class:`ProfilingMiddleware` profiles single requests: those carrying the
+profiling token (``X-Profile-Token`` header or ``profile_token`` query
+parameter) and, with a sample rate, a random fraction of all requests. It
+is only installed when profiling is enabled, so it costs nothing otherwise.
+
+Two profilers are available (``X-Profile-Mode`` / ``profile_mode``):
+
+- ``sample`` (default): a thread snapshots every thread's stack each
+  ``interval_ms`` and writes collapsed stacks (``flamegraph.pl`` /
+  speedscope input). Event-loop samples are kept only while this request's
+  code is running; worker threads (threadpool, aiosqlite) are kept while
+  busy, so blocking work done for the request shows up too.
+- ``cprofile``: deterministic ``cProfile`` of the event-loop thread, saved
+  as pstats. Other requests running on the loop meanwhile are included.
+
+Profiles go to a bounded ring of files in one directory
+(:class:`ProfileStore`), listed and downloaded through ``/profiles``.
+"""
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, parse_qsl, urlencode
+import asyncio
+import cProfile
+import hmac
+import json
+import linecache
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+PROFILE_MODES = ("sample", "cprofile")
+
+# File extension of each mode's output
+_EXTENSIONS = {"sample": "collapsed", "cprofile": "pstats"}
+
+# Innermost frames of threads parked waiting for work
+_IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select")}
+
+# Source lines blocking in C (e.g. SimpleQueue.get in aiosqlite's worker)
+_IDLE_CALL = re.compile(r"\.(?:get|wait|select|acquire)\(")
+
+_PROFILE_ID = re.compile(r"^\d{13}-[0-9a-f]{8}$")
+
+
+class ProfileStore:
+    """Bounded on-disk ring of saved profiles with JSON metadata"""
+    
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+    
+    def new_id(self) -> str:
+        """Time-ordered profile id"""
+        return f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+    
+    def save(self, profile_id: str, mode: str, write, metadata: Dict[str, Any]) -> None:
+        """
+        Save one profile and drop the oldest beyond ``max_profiles``
+        
+        Args:
+            profile_id: Id from :meth:`new_id`
+            mode: Profiler mode (decides the file extension)
+            write: Callable writing the profile to the path it is given
+            metadata: Request details stored next to the profile
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        write(os.path.join(self.directory, f"{profile_id}.{_EXTENSIONS[mode]}"))
+        metadata = dict(metadata, id=profile_id, mode=mode, file=f"{profile_id}.{_EXTENSIONS[mode]}")
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+        
+        for old_id in self._ids()[:-self.max_profiles or None]:
+            for name in os.listdir(self.directory):
+                if name.startswith(old_id + "."):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass  # removed by another worker
+    
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of the saved profiles, newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return profiles
+    
+    def path(self, profile_id: str) -> Optional[Tuple[str, str]]:
+        """
+        Location of a saved profile
+        
+        Args:
+            profile_id: Profile id
+        
+        Returns:
+            (file path, mode), or None if there is no such profile
+        """
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        for mode, extension in _EXTENSIONS.items():
+            path = os.path.join(self.directory, f"{profile_id}.{extension}")
+            if os.path.exists(path):
+                return path, mode
+        return None
+    
+    def _ids(self) -> List[str]:
+        """Saved profile ids, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory)
+                      if name.endswith(".json") and _PROFILE_ID.match(name[:-5]))
+
+
+@lru_cache(maxsize=4096)
+def _parked_at(filename: str, name: str, lineno: int) -> bool:
+    """Whether a thread whose innermost frame is here is waiting for work"""
+    if (os.path.basename(filename), name) in _IDLE_FRAMES:
+        return True
+    return _IDLE_CALL.search(linecache.getline(filename, lineno)) is not None
+
+
+def _frame_label(frame) -> str:
+    """Collapsed-stack label of a frame: function (file:line)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """Wall-clock sampler of thread stacks, aggregated as collapsed stacks"""
+    
+    def __init__(self, interval_ms: float = 1.0):
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self, anchor, loop_thread_id: int) -> None:
+        """
+        Start sampling
+        
+        Args:
+            anchor: Frame of the profiled request's outermost coroutine;
+                event-loop samples without it belong to other requests
+            loop_thread_id: Thread id of the event loop
+        """
+        self._thread = threading.Thread(
+            target=self._run, args=(anchor, loop_thread_id), name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self, anchor, loop_thread_id: int) -> None:
+        """Sampling loop (sampler thread)"""
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id != loop_thread_id and _parked_at(
+                    frame.f_code.co_filename, frame.f_code.co_name, frame.f_lineno
+                ):
+                    continue
+                stack = []
+                found = thread_id != loop_thread_id
+                while frame is not None:
+                    found = found or frame is anchor
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if not found:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+    
+    def write(self, path: str) -> None:
+        """Write collapsed stacks ("frame;frame;... count" per line)"""
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _redact_query(query_string: str) -> str:
+    """Query string without the profiling token, which must never be stored"""
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode([(key, value) for key, value in pairs if key != "profile_token"])
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that ask for it (and a random sample)"""
+    
+    # cProfile can only run one profiler per interpreter at a time
+    _cprofile_lock = threading.Lock()
+    
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval_ms: float = 1.0,
+        exempt_paths: Tuple[str, ...] = ("/profiles",)
+    ):
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        self.exempt_paths = exempt_paths
+    
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        
+        profile_id = self.store.new_id()
+        status = [None]
+        
+        async def tagging_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ])
+            await send(message)
+        
+        profiler = self._start(mode)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, tagging_send)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self._stop(profiler)
+            sampled = isinstance(profiler, StackSampler)
+            # Writing the profile and pruning the ring is file I/O: keep it off the event loop
+            kind = "sample" if sampled else "cprofile"
+            await asyncio.to_thread(self.store.save, profile_id, kind, self._writer(profiler), {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": _redact_query(scope.get("query_string", b"").decode("latin-1")),
+                "status": status[0],
+                "duration_ms": round(duration_ms, 1),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "samples": profiler.samples if sampled else None,
+            })
+    
+    def _requested_mode(self, scope) -> Optional[str]:
+        """Profiler mode for this request, or None to run it unprofiled"""
+        if scope["path"].startswith(self.exempt_paths):
+            return None
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        token = headers.get("x-profile-token") or query.get("profile_token", [None])[0]
+        mode = headers.get("x-profile-mode") or query.get("profile_mode", ["sample"])[0]
+        if mode not in PROFILE_MODES:
+            mode = "sample"
+        if self.token and token and hmac.compare_digest(token, self.token):
+            return mode
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+    
+    def _start(self, mode: str):
+        """Start the requested profiler (sampling if cProfile is busy)"""
+        if mode == "cprofile" and self._cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiling tool is active
+                self._cprofile_lock.release()
+            else:
+                return profiler
+        sampler = StackSampler(self.interval_ms)
+        # The caller's frame: the running __call__ coroutine of this request
+        sampler.start(sys._getframe(1), threading.get_ident())
+        return sampler
+    
+    def _stop(self, profiler) -> None:
+        """Stop a profiler started by :meth:`_start`"""
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+        else:
+            profiler.disable()
+            self._cprofile_lock.release()
+    
+    @staticmethod
+    def _writer(profiler):
+        """Callable saving the profiler's output to a path"""
+        return profiler.write if isinstance(profiler, StackSampler) else profiler.dump_stats
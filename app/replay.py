@@ -0,0 +1,405 @@
+"""
+Replay of recorded production traffic.
+
+A recording is exported from ``query_logs`` as JSON lines (question,
+timestamp, generated SQL and execution time, oldest first). It is then
+replayed against a running build with ``POST /query``: open loop, each
+question sent at its original offset from the first one, divided by
+``speed``. Long idle periods can be capped with ``max_gap_seconds``.
+
+The build under test answers questions that need the LLM with the SQL
+recorded for them (``LLM_REPLAY_FILE=<recording>``), so a run is
+deterministic and needs neither Gemini nor network access. Replaying the
+same recording against two builds and comparing the runs reports
+per-question latency regressions and questions whose status, SQL or result
+changed.
+
+Run from the command line::
+
+    python -m app.replay export recording.jsonl --since 2024-06-01
+    LLM_REPLAY_FILE=recording.jsonl uvicorn app.main:app --port 8001
+    python -m app.replay run recording.jsonl --url http://localhost:8001 --speed 10 --out candidate.jsonl
+    python -m app.replay compare baseline.jsonl candidate.jsonl
+"""
+from sqlalchemy.orm import Session
+from app.models import QueryLog
+from app.nlp2sql import normalize_question
+from typing import Any, Dict, IO, Iterable, List, Optional
+from datetime import datetime
+from collections import Counter, defaultdict
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import statistics
+import sys
+import time
+import httpx
+
+# SQL over the query log reads different rows on every run; its results are not compared
+_LOG_TABLES = re.compile(r"\bquery_log", re.IGNORECASE)
+
+
+def export_recording(
+    db: Session,
+    out: IO[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> int:
+    """
+    Write logged questions as a replayable recording
+    
+    Args:
+        db: Database session
+        out: Text stream the JSON lines are written to
+        since: Only questions logged at or after this time
+        until: Only questions logged before this time
+        limit: Maximum number of questions (the oldest in the window)
+    
+    Returns:
+        Number of questions written
+    """
+    query = db.query(QueryLog).order_by(QueryLog.created_at, QueryLog.id)
+    if since is not None:
+        query = query.filter(QueryLog.created_at >= since)
+    if until is not None:
+        query = query.filter(QueryLog.created_at < until)
+    if limit is not None:
+        query = query.limit(limit)
+    
+    count = 0
+    for log in query.yield_per(1000):
+        out.write(json.dumps({
+            "question": log.question,
+            "generated_sql": log.generated_sql,
+            "created_at": log.created_at.isoformat(),
+            "execution_time_ms": log.execution_time,
+        }) + "\n")
+        count += 1
+    return count
+
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Read a recording or a run file"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_recorded_sql(path: str) -> Dict[str, str]:
+    """
+    Map each recorded question to its SQL, for the server's LLM stub
+    
+    Args:
+        path: Recording written by :func:`export_recording`
+    
+    Returns:
+        Normalized question -> SQL logged for it (the latest, if several)
+    """
+    return {normalize_question(record["question"]): record["generated_sql"] for record in read_jsonl(path)}
+
+
+def schedule(records: List[Dict[str, Any]], speed: float = 1.0, max_gap_seconds: Optional[float] = None) -> List[float]:
+    """
+    Send offsets of recorded questions
+    
+    Args:
+        records: Recorded questions, oldest first
+        speed: Time compression (2.0 replays twice as fast; 0 sends everything at once)
+        max_gap_seconds: Cap on any recorded inter-arrival gap, applied before scaling
+    
+    Returns:
+        Seconds from the start of the replay at which each question is sent
+    """
+    offsets = []
+    elapsed = 0.0
+    previous = None
+    for record in records:
+        created_at = datetime.fromisoformat(record["created_at"])
+        if previous is not None:
+            gap = max(0.0, (created_at - previous).total_seconds())
+            elapsed += gap if max_gap_seconds is None else min(gap, max_gap_seconds)
+        previous = created_at
+        offsets.append(elapsed / speed if speed > 0 else 0.0)
+    return offsets
+
+
+def result_digest(result: Any) -> str:
+    """Order-sensitive fingerprint of a query result"""
+    return hashlib.sha1(json.dumps(result, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+async def replay(
+    records: List[Dict[str, Any]],
+    client: httpx.AsyncClient,
+    speed: float = 1.0,
+    max_gap_seconds: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Send recorded questions at their recorded timing
+    
+    The load is open loop: a question is sent on schedule whether or not
+    earlier ones have been answered, as in production. ``lag_ms`` is how
+    late the request was sent; a growing lag means the replaying machine,
+    not the server, is the bottleneck.
+    
+    Args:
+        records: Recorded questions, oldest first
+        client: HTTP client with the build's base URL (and any API key or tenant headers)
+        speed: Time compression (see :func:`schedule`)
+        max_gap_seconds: Cap on recorded inter-arrival gaps
+    
+    Returns:
+        One outcome per question, in recording order
+    """
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    
+    async def send(index: int, question: str, offset: float, lag_ms: float) -> None:
+        outcome = {"index": index, "question": question, "offset_s": round(offset, 3), "lag_ms": round(lag_ms, 2)}
+        sent = time.perf_counter()
+        try:
+            response = await client.post("/query", json={"question": question})
+        except httpx.HTTPError as e:
+            outcome.update(status_code=None, latency_ms=None, error=f"{type(e).__name__}: {e}")
+        else:
+            outcome.update(status_code=response.status_code, latency_ms=round((time.perf_counter() - sent) * 1000, 3))
+            body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+            if response.status_code == 200:
+                outcome.update(
+                    generated_sql=body.get("generated_sql"),
+                    server_ms=body.get("execution_time_ms"),
+                    digest=result_digest(body.get("result"))
+                )
+            else:
+                outcome["error"] = body.get("detail", response.text[:200])
+        outcomes[index] = outcome
+    
+    tasks = []
+    start = time.perf_counter()
+    for index, (record, offset) in enumerate(zip(records, schedule(records, speed, max_gap_seconds))):
+        delay = offset - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lag_ms = max(0.0, (time.perf_counter() - start - offset) * 1000)
+        tasks.append(asyncio.create_task(send(index, record["question"], offset, lag_ms)))
+    await asyncio.gather(*tasks)
+    return outcomes
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Status counts and latency percentiles of a run
+    
+    Args:
+        outcomes: Run returned by :func:`replay`
+    
+    Returns:
+        Summary with latencies of the answered (200) requests
+    """
+    latencies = [o["latency_ms"] for o in outcomes if o["status_code"] == 200]
+    return {
+        "requests": len(outcomes),
+        "statuses": dict(Counter(str(o["status_code"]) for o in outcomes)),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_lag_ms": max((o["lag_ms"] for o in outcomes), default=0.0),
+    }
+
+
+def compare(
+    baseline: List[Dict[str, Any]],
+    candidate: List[Dict[str, Any]],
+    tolerance: float = 0.2,
+    min_delta_ms: float = 1.0
+) -> Dict[str, Any]:
+    """
+    Compare two replays of the same recording
+    
+    A question regressed when its median latency over its occurrences grew
+    by more than ``tolerance`` (relative) and ``min_delta_ms`` (absolute),
+    so sub-millisecond jitter on cached answers is not reported. Outcomes
+    are paired by position: a question differs when its status, its SQL or
+    its result changed. Results of SQL over the query log are not compared.
+    
+    Args:
+        baseline: Run of the current build
+        candidate: Run of the build under test
+        tolerance: Allowed relative growth of a question's median latency
+        min_delta_ms: Allowed absolute growth of a question's median latency
+    
+    Returns:
+        Report with both summaries, regressions (worst first) and differences
+    
+    Raises:
+        ValueError: If the runs are not of the same recording
+    """
+    if [o["question"] for o in baseline] != [o["question"] for o in candidate]:
+        raise ValueError("Runs are not replays of the same recording")
+    
+    latencies = defaultdict(lambda: ([], []))
+    differences = []
+    for before, after in zip(baseline, candidate):
+        if before["status_code"] == after["status_code"] == 200:
+            latencies[before["question"]][0].append(before["latency_ms"])
+            latencies[before["question"]][1].append(after["latency_ms"])
+        
+        changed = [
+            field for field in ("status_code", "generated_sql", "digest")
+            if before.get(field) != after.get(field)
+        ]
+        if "digest" in changed and _LOG_TABLES.search(before.get("generated_sql") or ""):
+            changed.remove("digest")
+        if changed:
+            differences.append({
+                "index": before["index"],
+                "question": before["question"],
+                "changed": changed,
+                "baseline": {field: before.get(field) for field in ("status_code", "generated_sql", "digest", "error")},
+                "candidate": {field: after.get(field) for field in ("status_code", "generated_sql", "digest", "error")},
+            })
+    
+    regressions = []
+    improvements = 0
+    for question, (before, after) in latencies.items():
+        before_ms, after_ms = statistics.median(before), statistics.median(after)
+        delta = after_ms - before_ms
+        if delta > min_delta_ms and after_ms > before_ms * (1 + tolerance):
+            regressions.append({
+                "question": question,
+                "count": len(before),
+                "baseline_ms": round(before_ms, 3),
+                "candidate_ms": round(after_ms, 3),
+                "delta_ms": round(delta, 3),
+            })
+        elif -delta > min_delta_ms and before_ms > after_ms * (1 + tolerance):
+            improvements += 1
+    regressions.sort(key=lambda r: r["delta_ms"] * r["count"], reverse=True)
+    
+    return {
+        "baseline": summarize(baseline),
+        "candidate": summarize(candidate),
+        "questions": len(latencies),
+        "regressions": regressions,
+        "improvements": improvements,
+        "differences": differences,
+    }
+
+
+def format_report(report: Dict[str, Any], top: int = 20) -> str:
+    """Render a :func:`compare` report as text"""
+    lines = []
+    for name in ("baseline", "candidate"):
+        summary = report[name]
+        lines.append(
+            f"{name:>9}: {summary['requests']} requests {summary['statuses']}  p50 {summary['p50_ms']} ms  "
+            f"p95 {summary['p95_ms']} ms  p99 {summary['p99_ms']} ms  max lag {summary['max_lag_ms']} ms"
+        )
+    lines.append(
+        f"{report['questions']} distinct questions answered by both: {len(report['regressions'])} slower, "
+        f"{report['improvements']} faster"
+    )
+    if report["regressions"]:
+        lines.append(f"{'count':>6} {'baseline ms':>12} {'candidate ms':>13} {'delta ms':>9}  question")
+        for r in report["regressions"][:top]:
+            lines.append(
+                f"{r['count']:>6} {r['baseline_ms']:>12.3f} {r['candidate_ms']:>13.3f} {r['delta_ms']:>9.3f}  "
+                f"{r['question']}"
+            )
+    lines.append(f"{len(report['differences'])} answers differ")
+    for d in report["differences"][:top]:
+        lines.append(f"  #{d['index']} {d['question']}: {', '.join(d['changed'])}")
+        for name in ("baseline", "candidate"):
+            lines.append(f"    {name}: {json.dumps({k: v for k, v in d[name].items() if v is not None})}")
+    return "\n".join(lines)
+
+
+def _write_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> None:
+    """Write rows as JSON lines"""
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def main() -> None:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Export, replay and compare recorded query traffic")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    export = commands.add_parser("export", help="Write query_logs as a recording")
+    export.add_argument("recording")
+    export.add_argument("--since", type=datetime.fromisoformat, help="ISO timestamp (UTC)")
+    export.add_argument("--until", type=datetime.fromisoformat, help="ISO timestamp (UTC)")
+    export.add_argument("--limit", type=int)
+    
+    run = commands.add_parser("run", help="Replay a recording against a running build")
+    run.add_argument("recording")
+    run.add_argument("--url", default="http://localhost:8000")
+    run.add_argument("--out", required=True, help="Run file (JSON lines) for compare")
+    run.add_argument("--speed", type=float, default=1.0, help="Time compression (0: send everything at once)")
+    run.add_argument("--max-gap", type=float, help="Cap on recorded gaps between questions, in seconds")
+    run.add_argument("--limit", type=int, help="Replay only the first N questions")
+    run.add_argument("--api-key", help="X-API-Key sent with every question")
+    run.add_argument("--tenant", help="X-Tenant-ID sent with every question")
+    run.add_argument("--timeout", type=float, default=60.0)
+    
+    diff = commands.add_parser("compare", help="Report regressions between two runs")
+    diff.add_argument("baseline")
+    diff.add_argument("candidate")
+    diff.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative latency growth")
+    diff.add_argument("--min-delta-ms", type=float, default=1.0, help="Allowed absolute latency growth")
+    diff.add_argument("--top", type=int, default=20, help="Regressions and differences listed")
+    diff.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+    
+    if args.command == "export":
+        from app.database import SessionLocal, get_engine
+        
+        get_engine()
+        db = SessionLocal()
+        try:
+            with open(args.recording, "w", encoding="utf-8") as f:
+                count = export_recording(db, f, since=args.since, until=args.until, limit=args.limit)
+        finally:
+            db.close()
+        print(f"{count} questions written to {args.recording}")
+    
+    elif args.command == "run":
+        records = read_jsonl(args.recording)[:args.limit]
+        headers = {}
+        if args.api_key:
+            headers["X-API-Key"] = args.api_key
+        if args.tenant:
+            headers["X-Tenant-ID"] = args.tenant
+        
+        async def run_replay() -> List[Dict[str, Any]]:
+            # Open loop: no cap on connections, so queueing happens at the server
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+            client = httpx.AsyncClient(base_url=args.url, headers=headers, timeout=args.timeout, limits=limits)
+            async with client:
+                return await replay(records, client, speed=args.speed, max_gap_seconds=args.max_gap)
+        
+        outcomes = asyncio.run(run_replay())
+        _write_jsonl(args.out, outcomes)
+        print(json.dumps(summarize(outcomes)))
+    
+    else:
+        report = compare(
+            read_jsonl(args.baseline), read_jsonl(args.candidate),
+            tolerance=args.tolerance, min_delta_ms=args.min_delta_ms
+        )
+        print(json.dumps(report, indent=2) if args.json else format_report(report, top=args.top))
+        sys.exit(1 if report["regressions"] or report["differences"] else 0)
+
+
+if __name__ == "__main__":
+    main()
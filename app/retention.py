@@ -0,0 +1,311 @@
+"""
+Query log retention and archival.
+
+Rows of ``query_logs`` older than the retention age are:
+
+1. folded into ``query_log_archive_days`` (per-day count, total time,
+   slowest query and top keywords) so ``/stats`` keeps its all-time view,
+2. appended to a compressed per-day archive file
+   (``<archive_dir>/query_logs-YYYY-MM-DD.jsonl.gz``),
+3. deleted from the live table in small batches, one transaction each.
+
+Archival is at-least-once: a crash between writing a batch to the archive
+file and committing its deletion can repeat that batch in the file.
+
+Run from the command line::
+
+    python -m app.retention --older-than-days 30 --archive-dir ./archive
+"""
+from sqlalchemy.orm import Session
+from app.models import QueryLog, QueryLogArchiveDay, QueryLogBucket
+from app.analytics import extract_words
+from app.sketches import SpaceSaving
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+from collections import defaultdict
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+
+# Keywords kept per archived day
+ARCHIVE_KEYWORDS_PER_DAY = 100
+
+
+class RetentionService:
+    """Service for compacting and archiving old query logs"""
+    
+    def __init__(
+        self,
+        archive_dir: str = "./archive",
+        batch_size: int = 500,
+        pause_seconds: float = 0.05
+    ):
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+    
+    def run(
+        self,
+        db: Session,
+        older_than: timedelta,
+        minute_buckets_older_than: Optional[timedelta] = None,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Archive and delete query logs older than the retention age
+        
+        Args:
+            db: Database session
+            older_than: Retention age of raw query log rows
+            minute_buckets_older_than: Retention age of per-minute timeseries
+                buckets (hour buckets are kept)
+            now: Reference time (naive UTC, default: now)
+        
+        Returns:
+            Summary with archived row and batch counts
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - older_than
+        os.makedirs(self.archive_dir, exist_ok=True)
+        
+        archived = 0
+        batches = 0
+        while True:
+            rows = (
+                db.query(QueryLog)
+                .filter(QueryLog.created_at < cutoff)
+                .order_by(QueryLog.id)
+                .limit(self.batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            
+            self._archive_batch(db, rows)
+            archived += len(rows)
+            batches += 1
+            
+            # Yield between batches so live writers are not starved
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+        
+        pruned_buckets = 0
+        if minute_buckets_older_than is not None:
+            pruned_buckets = (
+                db.query(QueryLogBucket)
+                .filter(
+                    QueryLogBucket.granularity == "minute",
+                    QueryLogBucket.bucket_start < now - minute_buckets_older_than
+                )
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+        
+        return {
+            "archived_rows": archived,
+            "batches": batches,
+            "pruned_minute_buckets": pruned_buckets,
+            "cutoff": cutoff.isoformat()
+        }
+    
+    def _archive_batch(self, db: Session, rows: List[QueryLog]) -> None:
+        """
+        Archive one batch of rows and delete it in a single transaction
+        
+        Args:
+            db: Database session
+            rows: Query log rows to archive
+        """
+        by_day: Dict[str, List[QueryLog]] = defaultdict(list)
+        for row in rows:
+            by_day[row.created_at.strftime("%Y-%m-%d")].append(row)
+        
+        try:
+            for day, day_rows in by_day.items():
+                path = self._write_archive(day, day_rows)
+                self._fold_into_summary(db, day, day_rows, path)
+            
+            db.query(QueryLog).filter(
+                QueryLog.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    
+    def _write_archive(self, day: str, rows: List[QueryLog]) -> str:
+        """
+        Append rows to the day's gzip-compressed JSONL archive
+        
+        Args:
+            day: Day in YYYY-MM-DD format
+            rows: Query log rows of that day
+        
+        Returns:
+            Path of the archive file
+        """
+        path = os.path.join(self.archive_dir, f"query_logs-{day}.jsonl.gz")
+        # Appending writes a new gzip member; readers see one continuous stream
+        with gzip.open(path, "at", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(json.dumps({
+                    "id": row.id,
+                    "question": row.question,
+                    "generated_sql": row.generated_sql,
+                    "execution_time": row.execution_time,
+                    "created_at": row.created_at.isoformat()
+                }) + "\n")
+        return path
+    
+    def _fold_into_summary(self, db: Session, day: str, rows: List[QueryLog], path: str) -> None:
+        """
+        Merge rows into the per-day archive summary
+        
+        Args:
+            db: Database session
+            day: Day in YYYY-MM-DD format
+            rows: Query log rows of that day
+            path: Archive file the rows were written to
+        """
+        summary = db.get(QueryLogArchiveDay, day)
+        if summary is None:
+            summary = QueryLogArchiveDay(
+                day=day,
+                query_count=0,
+                total_execution_ms=0,
+                keywords="{}",
+                archive_path=path
+            )
+            db.add(summary)
+        
+        summary.query_count += len(rows)
+        summary.total_execution_ms += sum(row.execution_time for row in rows)
+        
+        slowest = max(rows, key=lambda row: row.execution_time)
+        if summary.slowest_execution_time is None or slowest.execution_time > summary.slowest_execution_time:
+            summary.slowest_question = slowest.question
+            summary.slowest_sql = slowest.generated_sql
+            summary.slowest_execution_time = slowest.execution_time
+            summary.slowest_created_at = slowest.created_at
+        
+        sketch = SpaceSaving(capacity=ARCHIVE_KEYWORDS_PER_DAY)
+        for word, count in json.loads(summary.keywords).items():
+            sketch.add(word, count)
+        for row in rows:
+            for word in extract_words(row.question):
+                sketch.add(word)
+        summary.keywords = json.dumps(dict(sketch.top(ARCHIVE_KEYWORDS_PER_DAY)))
+
+
+async def retention_loop(
+    service: RetentionService,
+    session_factory: Callable[[], Session],
+    older_than: timedelta,
+    minute_buckets_older_than: timedelta,
+    interval_seconds: float
+) -> None:
+    """
+    Run retention periodically in a worker thread until cancelled
+    
+    Args:
+        service: Retention service
+        session_factory: Callable returning a new database session
+        older_than: Retention age of raw query log rows
+        minute_buckets_older_than: Retention age of per-minute buckets
+        interval_seconds: Delay between runs
+    """
+    def run_once() -> Dict[str, Any]:
+        db = session_factory()
+        try:
+            return service.run(db, older_than, minute_buckets_older_than)
+        finally:
+            db.close()
+    
+    while True:
+        try:
+            summary = await asyncio.to_thread(run_once)
+            if summary["archived_rows"]:
+                print(f"Query log retention: {summary}")
+        except Exception as e:
+            print(f"Query log retention failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def tenant_retention_loop(
+    tenants: Any,
+    archive_dir: str,
+    batch_size: int,
+    older_than: timedelta,
+    minute_buckets_older_than: timedelta,
+    interval_seconds: float
+) -> None:
+    """
+    Run retention over every tenant database periodically until cancelled
+    
+    Each run covers the known and currently open tenants (opening them as
+    needed), and each tenant archives to ``<archive_dir>/<tenant id>``. A
+    failing tenant is reported and skipped.
+    
+    Args:
+        tenants: Tenant registry (:class:`app.tenancy.TenantRegistry`)
+        archive_dir: Parent directory of the per-tenant archives
+        batch_size: Rows deleted per transaction
+        older_than: Retention age of raw query log rows
+        minute_buckets_older_than: Retention age of per-minute buckets
+        interval_seconds: Delay between runs
+    """
+    def run_once() -> None:
+        for tenant_id in tenants.tenant_ids():
+            service = RetentionService(archive_dir=os.path.join(archive_dir, tenant_id), batch_size=batch_size)
+            try:
+                db = tenants.get(tenant_id).session_factory()
+                try:
+                    summary = service.run(db, older_than, minute_buckets_older_than)
+                finally:
+                    db.close()
+                if summary["archived_rows"]:
+                    print(f"Query log retention ({tenant_id}): {summary}")
+            except Exception as e:
+                print(f"Query log retention failed for tenant {tenant_id}: {e}")
+    
+    while True:
+        try:
+            await asyncio.to_thread(run_once)
+            await tenants.close_evicted()
+        except Exception as e:
+            print(f"Tenant query log retention failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def main() -> None:
+    """Command-line entry point"""
+    from app.config import get_settings
+    from app.database import SessionLocal, get_engine
+    
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Archive and compact old query logs")
+    parser.add_argument("--older-than-days", type=int, default=settings.log_retention_days)
+    parser.add_argument("--archive-dir", default=settings.log_archive_dir)
+    parser.add_argument("--batch-size", type=int, default=settings.log_retention_batch_size)
+    parser.add_argument("--minute-buckets-days", type=int, default=settings.minute_bucket_retention_days)
+    args = parser.parse_args()
+    
+    service = RetentionService(archive_dir=args.archive_dir, batch_size=args.batch_size)
+    get_engine()
+    db = SessionLocal()
+    try:
+        summary = service.run(
+            db,
+            older_than=timedelta(days=args.older_than_days),
+            minute_buckets_older_than=timedelta(days=args.minute_buckets_days)
+        )
+        print(json.dumps(summary))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
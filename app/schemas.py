@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Any, List, Dict, Optional
+from typing import Any, List, Dict, Literal, Optional
 
 
 class QueryRequest(BaseModel):
@@ -7,6 +7,13 @@ class QueryRequest(BaseModel):
     question: str
 
 
+class ExportRequest(BaseModel):
+    """Request model for bulk result export"""
+    question: str
+    format: Literal["csv", "arrow", "parquet"] = "csv"
+    compression: Optional[str] = None  # csv: gzip; arrow: lz4, zstd; parquet: snappy, gzip, zstd
+
+
 class QueryResponse(BaseModel):
     """Response model for query execution"""
     question: str
@@ -15,8 +22,64 @@ class QueryResponse(BaseModel):
     execution_time_ms: int
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for answering several questions in one call"""
+    questions: List[str]
+
+
+class BatchQueryResult(BaseModel):
+    """One answer of a batch: the query response fields, or an error"""
+    question: str
+    status_code: int
+    generated_sql: Optional[str] = None
+    result: Any = None
+    execution_time_ms: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for a batch of questions, in request order"""
+    results: List[BatchQueryResult]
+
+
+class IngestResponse(BaseModel):
+    """Response model for a bulk load"""
+    table: str
+    rows: int
+    inserted: int
+    updated: int
+    rejected: int
+    errors: List[Dict[str, Any]]
+    seconds: float
+    rows_per_second: float
+    data_version: Optional[int] = None
+
+
 class StatsResponse(BaseModel):
     """Response model for analytics stats"""
     total_queries: int
     most_common_keywords: List[Dict[str, Any]]
     slowest_query: Optional[Dict[str, Any]]
+    window: Optional[str] = None
+
+
+class TimeseriesBucket(BaseModel):
+    """Throughput of a single rollup bucket"""
+    bucket_start: str
+    query_count: int
+    queries_per_second: float
+    avg_execution_ms: float
+
+
+class TimeseriesResponse(BaseModel):
+    """Response model for time-bucketed query stats"""
+    start: str
+    end: str
+    granularity: str
+    total_queries: int
+    avg_execution_ms: Optional[float]
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+    max_execution_ms: Optional[int]
+    buckets: List[TimeseriesBucket]
@@ -0,0 +1,110 @@
+"""
+Full-text search support backed by SQLite FTS5.
+
+``courses_fts`` and ``students_fts`` are external-content FTS5 tables that
+shadow ``courses.name``/``courses.category`` and ``students.name``. Triggers
+keep them in sync with the base tables, so name lookups can use an indexed,
+case-insensitive ``MATCH`` instead of a full-scan ``LIKE '%...%'``.
+"""
+from typing import List, Optional
+
+
+FTS_TABLES = ("courses_fts", "students_fts")
+
+FTS_DDL: List[str] = [
+    # Courses: name + category
+    """CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+        name, category,
+        content='courses', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS courses_fts_ai AFTER INSERT ON courses BEGIN
+        INSERT INTO courses_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS courses_fts_ad AFTER DELETE ON courses BEGIN
+        INSERT INTO courses_fts(courses_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS courses_fts_au AFTER UPDATE OF name, category ON courses BEGIN
+        INSERT INTO courses_fts(courses_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO courses_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+    # Students: name
+    """CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        name,
+        content='students', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF name ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO students_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+
+def install_fts(target, connection, **kw) -> None:
+    """
+    Create the FTS5 shadow tables and sync triggers (metadata ``after_create`` hook)
+
+    Tables that did not exist before are rebuilt from their content table so
+    rows loaded before the index existed are searchable too.
+
+    Args:
+        target: MetaData being created
+        connection: Connection used for DDL
+    """
+    if connection.dialect.name != "sqlite":
+        return
+
+    existing = {
+        row[0] for row in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('courses_fts', 'students_fts')"
+        )
+    }
+
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+
+    for table in FTS_TABLES:
+        if table not in existing:
+            connection.exec_driver_sql(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+def drop_fts(target, connection, **kw) -> None:
+    """
+    Drop the FTS5 shadow tables (metadata ``before_drop`` hook)
+
+    The sync triggers are dropped by SQLite together with their base tables.
+
+    Args:
+        target: MetaData being dropped
+        connection: Connection used for DDL
+    """
+    if connection.dialect.name != "sqlite":
+        return
+
+    for table in FTS_TABLES:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+
+
+def fts_phrase(text: str, column: Optional[str] = None) -> str:
+    """
+    Build an FTS5 MATCH expression for a user-supplied term
+
+    The term is quoted as an FTS5 string so operators or punctuation in the
+    input cannot change the meaning of the expression.
+
+    Args:
+        text: Term or phrase to search for
+        column: Optional FTS column to restrict the match to
+
+    Returns:
+        MATCH expression string
+    """
+    phrase = '"' + text.replace('"', '""') + '"'
+    return f"{column} : {phrase}" if column else phrase
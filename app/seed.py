@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from app.models import Base, Student, Course, Enrollment
 from app.database import engine, SessionLocal
+from app.cache import DataVersionTracker
 
 
 def init_db():
@@ -89,11 +90,15 @@ def seed_data():
         db.add_all(enrollments)
         db.commit()
         
+        # Invalidate cached results and ETags issued before the seed
+        DataVersionTracker(SessionLocal).bump(db)
+        db.commit()
+        
         print("Database seeded successfully!")
         print(f"Created {len(students)} students")
         print(f"Created {len(courses)} courses")
         print(f"Created {len(enrollments)} enrollments")
-        
+    
     except Exception as e:
         print(f"Error seeding database: {e}")
         db.rollback()
@@ -0,0 +1,124 @@
+"""
+Production server entry point.
+
+Runs the API under uvicorn with several worker processes so CPU-bound work
+(JSON encoding, result processing) uses every core, while blocking database
+and Gemini calls run on each worker's threadpool (sized by
+``THREADPOOL_SIZE`` in the application lifespan).
+
+Workers elect one of them with :class:`MaintenanceLock` to run the
+background maintenance loops (log retention, shared-cache warm-up), so those
+never run concurrently on one host.
+
+Usage::
+
+    python -m app.server --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import asyncio
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every worker counts as elected
+    fcntl = None
+
+
+def available_cpus() -> int:
+    """Number of CPUs this process may run on (honours affinity masks)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers(cpus: int = 0) -> int:
+    """
+    Size the worker pool from the available CPUs
+    
+    One worker per CPU, capped at 8: every worker keeps its own caches,
+    engine and log writer, and all of them share the SQLite write lock.
+    
+    Args:
+        cpus: CPU count (default: detected)
+    
+    Returns:
+        Number of worker processes
+    """
+    return max(1, min(cpus or available_cpus(), 8))
+
+
+class MaintenanceLock:
+    """
+    Host-wide lock held by the one worker that runs maintenance loops
+    
+    An exclusive, non-blocking ``flock`` on a file. The kernel releases it
+    when its holder exits, even on a crash, so a waiting worker takes over.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+    
+    @property
+    def held(self) -> bool:
+        """Whether this process holds the lock"""
+        return self._file is not None
+    
+    def acquire(self) -> bool:
+        """
+        Take the lock if no other process holds it
+        
+        Returns:
+            True if this process now holds the lock
+        """
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+    
+    async def wait(self, poll_seconds: float = 5.0) -> None:
+        """Poll until this process holds the lock"""
+        while not self.acquire():
+            await asyncio.sleep(poll_seconds)
+    
+    def release(self) -> None:
+        """Release the lock if held"""
+        if self._file is not None and self._file is not True:
+            self._file.close()
+        self._file = None
+
+
+def main() -> None:
+    """Command-line entry point"""
+    import uvicorn
+    from app.config import get_settings
+    
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.web_workers or default_workers())
+    args = parser.parse_args()
+    
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=settings.graceful_shutdown_seconds,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Streaming heavy-hitter sketches for keyword analytics.
+
+:class:`SpaceSaving` tracks the approximate top-k items of a stream with a
+fixed number of counters. :class:`SlidingWindowTopK` keeps a ring of
+Space-Saving sketches per time window (hour/day/week) so the top keywords of
+a recent window can be answered by merging a handful of fixed-size buckets.
+"""
+import heapq
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch with a fixed number of counters"""
+    
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+    
+    def add(self, item: str, count: int = 1) -> None:
+        """
+        Count an occurrence of an item
+        
+        When the sketch is full the item with the smallest counter is evicted
+        and the new item inherits its count (the Space-Saving over-estimate).
+        
+        Args:
+            item: Item to count
+            count: Number of occurrences
+        """
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+        else:
+            floor, evicted = self._pop_min()
+            del self.counts[evicted]
+            self.counts[item] = floor + count
+        heapq.heappush(self._heap, (self.counts[item], item))
+        self._compact()
+    
+    def merge(self, other: "SpaceSaving") -> None:
+        """
+        Merge another sketch into this one
+        
+        Args:
+            other: Sketch to merge
+        """
+        for item, count in other.counts.items():
+            self.add(item, count)
+    
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """
+        Get the k items with the highest counts
+        
+        Args:
+            k: Number of items to return
+        
+        Returns:
+            List of (item, count) tuples, highest count first
+        """
+        return heapq.nlargest(k, self.counts.items(), key=lambda kv: (kv[1], kv[0]))
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+    
+    def _pop_min(self) -> Tuple[int, str]:
+        """Pop the current minimum, skipping stale heap entries"""
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return count, item
+    
+    def _compact(self) -> None:
+        """Rebuild the heap when stale entries dominate it"""
+        if len(self._heap) > 4 * max(self.capacity, 16):
+            self._heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+
+class SlidingWindowTopK:
+    """Approximate top-k over sliding time windows using bucketed sketches"""
+    
+    # window -> (bucket width in seconds, number of buckets)
+    WINDOWS: Dict[str, Tuple[int, int]] = {
+        "hour": (5 * 60, 12),
+        "day": (60 * 60, 24),
+        "week": (24 * 60 * 60, 7),
+    }
+    
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._rings: Dict[str, List[Optional[Tuple[int, SpaceSaving]]]] = {
+            window: [None] * buckets for window, (_, buckets) in self.WINDOWS.items()
+        }
+    
+    def add(self, items: Iterable[str], timestamp: Optional[float] = None) -> None:
+        """
+        Count items observed at a point in time
+        
+        Args:
+            items: Items to count
+            timestamp: Unix timestamp of the observation (default: now)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        items = list(items)
+        if not items:
+            return
+        
+        with self._lock:
+            for window, (width, buckets) in self.WINDOWS.items():
+                index = int(timestamp // width)
+                ring = self._rings[window]
+                slot = ring[index % buckets]
+                if slot is None or slot[0] != index:
+                    if slot is not None and slot[0] > index:
+                        continue  # older than anything the ring still covers
+                    slot = (index, SpaceSaving(self.capacity))
+                    ring[index % buckets] = slot
+                for item in items:
+                    slot[1].add(item)
+    
+    def top(self, window: str, k: int = 10, now: Optional[float] = None) -> List[Tuple[str, int]]:
+        """
+        Get the top-k items of a window
+        
+        Args:
+            window: Window name ("hour", "day" or "week")
+            k: Number of items to return
+            now: Unix timestamp the window ends at (default: now)
+        
+        Returns:
+            List of (item, count) tuples, highest count first
+        """
+        if window not in self.WINDOWS:
+            raise ValueError(f"Unknown window: {window}")
+        
+        now = time.time() if now is None else now
+        width, buckets = self.WINDOWS[window]
+        current = int(now // width)
+        merged = SpaceSaving(self.capacity * 2)
+        
+        with self._lock:
+            for slot in self._rings[window]:
+                if slot is not None and current - buckets < slot[0] <= current:
+                    merged.merge(slot[1])
+        
+        return merged.top(k)
@@ -1,14 +1,59 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 from app.models import QueryLog
-from typing import Any, List, Union
+from app.aggregates import AggregateRewriter
+from app.timeseries import TimeseriesService
+from app.cache import CacheBackend, DataVersionTracker, cache_key
+from app.log_writer import LogEntry, QueryLogWriter
+from app.nlp2sql import SQLQuery
+from typing import Any, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+from datetime import datetime
+from functools import lru_cache
+import asyncio
 import time
 
+# Sentinel for result cache misses (None, 0 and [] are valid results)
+_MISS = object()
+
+
+@lru_cache(maxsize=1024)
+def _statement(sql: str) -> TextClause:
+    """
+    Build (once per distinct SQL text) the ``text()`` construct for a query
+    
+    Parameterized template queries share one SQL text per shape, so this
+    cache, SQLAlchemy's compiled cache and SQLite's prepared-statement cache
+    all hit regardless of the parameter values.
+    """
+    return text(sql)
+
 
 class SQLExecutor:
     """Service for executing SQL queries safely"""
     
-    def execute_query(self, db: Session, sql: str, question: str) -> tuple[Any, int]:
+    def __init__(
+        self,
+        rewriter: Optional[AggregateRewriter] = None,
+        timeseries: Optional[TimeseriesService] = None,
+        result_cache: Optional[CacheBackend] = None,
+        log_writer: Optional[QueryLogWriter] = None,
+        data_version: Optional[DataVersionTracker] = None
+    ):
+        self.rewriter = rewriter or AggregateRewriter()
+        self.timeseries = timeseries or TimeseriesService()
+        self.result_cache = result_cache
+        self.log_writer = log_writer
+        self.data_version = data_version
+    
+    def execute_query(
+        self,
+        db: Session,
+        sql: str,
+        question: str,
+        params: Optional[Mapping[str, Any]] = None
+    ) -> tuple[Any, int]:
         """
         Execute SQL query and log the execution
         
@@ -16,6 +61,7 @@ class SQLExecutor:
             db: Database session
             sql: SQL query to execute
             question: Original question
+            params: Bind parameters referenced by the SQL
             
         Returns:
             Tuple of (result, execution_time_ms)
@@ -23,20 +69,15 @@ class SQLExecutor:
         start_time = time.time()
         
         try:
-            # Execute the query
-            result = db.execute(text(sql))
-            
-            # Fetch results
-            rows = result.fetchall()
+            processed_result = self._cached_result(sql, params)
+            if processed_result is _MISS:
+                processed_result = self._run(db, sql, params)
             
             # Calculate execution time
             execution_time_ms = int((time.time() - start_time) * 1000)
             
-            # Process results
-            processed_result = self._process_results(rows)
-            
             # Log the query
-            self._log_query(db, question, sql, execution_time_ms)
+            self._log_query(db, question, SQLQuery(sql, params or {}).render(), execution_time_ms)
             
             return processed_result, execution_time_ms
             
@@ -44,6 +85,238 @@ class SQLExecutor:
             execution_time_ms = int((time.time() - start_time) * 1000)
             raise Exception(f"Query execution failed: {str(e)}")
     
+    async def execute_query_async(
+        self,
+        db: AsyncSession,
+        sql: str,
+        question: str,
+        params: Optional[Mapping[str, Any]] = None
+    ) -> tuple[Any, int]:
+        """
+        Async version of :meth:`execute_query`
+        
+        Args:
+            db: Async database session
+            sql: SQL query to execute
+            question: Original question
+            params: Bind parameters referenced by the SQL
+        
+        Returns:
+            Tuple of (result, execution_time_ms)
+        """
+        start_time = time.time()
+        
+        try:
+            # Read the data version off the event loop; the key reuses it
+            version = await self.data_version.current_async() if self.data_version is not None else None
+            # Shared result caches (SQLite file, Redis) are read and written off the event loop
+            blocking = self.result_cache is not None and self.result_cache.blocking
+            if blocking:
+                processed_result = await asyncio.to_thread(self._cached_result, sql, params, version)
+            else:
+                processed_result = self._cached_result(sql, params, version)
+            if processed_result is _MISS:
+                result = await db.execute(_statement(self._rewrite(db, sql)), dict(params or {}))
+                rows = result.fetchall()
+                if blocking:
+                    processed_result = await asyncio.to_thread(self._store_result, sql, params, rows, version)
+                else:
+                    processed_result = self._store_result(sql, params, rows, version)
+            
+            execution_time_ms = int((time.time() - start_time) * 1000)
+            await self._log_query_async(db, question, SQLQuery(sql, params or {}).render(), execution_time_ms)
+            
+            return processed_result, execution_time_ms
+        
+        except Exception as e:
+            raise Exception(f"Query execution failed: {str(e)}")
+    
+    def stream_query(
+        self,
+        db: Session,
+        sql: str,
+        question: str,
+        params: Optional[Mapping[str, Any]] = None,
+        chunk_size: int = 10000
+    ) -> Tuple[List[str], Iterator[Sequence[Any]]]:
+        """
+        Execute a query for bulk export, fetching rows in batches
+        
+        The statement runs immediately, so errors surface before any batch
+        is consumed. Results bypass the result cache, and the query is
+        logged once the last batch has been read.
+        
+        Args:
+            db: Database session (kept open until the batches are exhausted)
+            sql: SQL query to execute
+            question: Original question
+            params: Bind parameters referenced by the SQL
+            chunk_size: Rows per ``fetchmany`` batch
+        
+        Returns:
+            Tuple of (column names, iterator of row batches)
+        """
+        start_time = time.time()
+        try:
+            result = db.execute(
+                _statement(self._rewrite(db, sql)),
+                dict(params or {}),
+                execution_options={"yield_per": chunk_size}
+            )
+        except Exception as e:
+            raise Exception(f"Query execution failed: {str(e)}")
+        
+        def batches() -> Iterator[Sequence[Any]]:
+            while True:
+                rows = result.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            execution_time_ms = int((time.time() - start_time) * 1000)
+            self._log_query(db, question, SQLQuery(sql, params or {}).render(), execution_time_ms)
+        
+        return list(result.keys()), batches()
+    
+    def storage_classes(
+        self,
+        db: Session,
+        sql: str,
+        column_count: int,
+        params: Optional[Mapping[str, Any]] = None
+    ) -> Optional[List[Set[str]]]:
+        """
+        SQLite storage classes each result column holds, for typing exports
+        
+        SQLite columns can mix integers, reals and text, so a columnar
+        export cannot take its schema from the first batch alone. One
+        ``typeof`` aggregation over the whole result (columns bound by
+        position, so duplicate names are fine) gives the types up front.
+        Other databases enforce column types and return None.
+        
+        Args:
+            db: Database session
+            sql: SQL query being exported
+            column_count: Number of result columns
+            params: Bind parameters referenced by the SQL
+        
+        Returns:
+            One set of storage classes per column, or None off SQLite
+        """
+        if db.get_bind().dialect.name != "sqlite":
+            return None
+        names = [f"c{i}" for i in range(column_count)]
+        inner = self._rewrite(db, sql).strip().rstrip(";")
+        aggregates = ", ".join(f"group_concat(DISTINCT typeof({name}))" for name in names)
+        row = db.execute(
+            text(f"WITH q({', '.join(names)}) AS ({inner}) SELECT {aggregates} FROM q"),
+            dict(params or {})
+        ).one()
+        return [set(classes.split(",")) if classes else set() for classes in row]
+    
+    def warm_result(self, db: Session, sql: str) -> bool:
+        """
+        Execute a query only to populate the result cache (not logged)
+        
+        Args:
+            db: Database session
+            sql: SQL query to execute
+        
+        Returns:
+            True if a result was cached
+        """
+        if self.result_cache is None:
+            return False
+        self._run(db, sql)
+        return True
+    
+    def _run(
+        self,
+        db: Session,
+        sql: str,
+        params: Optional[Mapping[str, Any]] = None
+    ) -> Union[int, float, str, List[dict]]:
+        """
+        Execute a query and store its processed result in the result cache
+        
+        Args:
+            db: Database session
+            sql: SQL query to execute
+            params: Bind parameters referenced by the SQL
+        
+        Returns:
+            Processed results
+        """
+        # Execute the query, served from the rollups when possible
+        result = db.execute(_statement(self._rewrite(db, sql)), dict(params or {}))
+        return self._store_result(sql, params, result.fetchall())
+    
+    def _store_result(
+        self,
+        sql: str,
+        params: Optional[Mapping[str, Any]],
+        rows: List,
+        version: Optional[int] = None
+    ) -> Union[int, float, str, List[dict]]:
+        """
+        Process fetched rows and store them in the result cache
+        
+        Args:
+            sql: SQL query the rows belong to
+            params: Bind parameters the query ran with
+            rows: Raw query results
+            version: Data version already read, or None to read it here
+        
+        Returns:
+            Processed results
+        """
+        processed_result = self._process_results(rows)
+        if self.result_cache is not None:
+            self.result_cache.set(self._result_key(sql, params, version), processed_result)
+        return processed_result
+    
+    def _cached_result(
+        self,
+        sql: str,
+        params: Optional[Mapping[str, Any]] = None,
+        version: Optional[int] = None
+    ) -> Any:
+        """Look up a query in the result cache, returning _MISS when absent"""
+        if self.result_cache is None:
+            return _MISS
+        return self.result_cache.get(self._result_key(sql, params, version), _MISS)
+    
+    def _result_key(
+        self,
+        sql: str,
+        params: Optional[Mapping[str, Any]],
+        version: Optional[int] = None
+    ) -> str:
+        """Result cache key of a query, its parameter values and the data version"""
+        parts: List[Any] = [sql]
+        if params:
+            parts.append(sorted(params.items()))
+        if self.data_version is not None:
+            parts.append(self.data_version.current() if version is None else version)
+        return cache_key(*parts)
+    
+    def _rewrite(self, db: Union[Session, AsyncSession], sql: str) -> str:
+        """
+        Route enrollment aggregations to the materialized rollups
+        
+        Rollups are trigger-maintained on SQLite only, so other databases
+        always run the original query.
+        
+        Args:
+            db: Database session (sync or async)
+            sql: SQL query to execute
+        
+        Returns:
+            SQL to run against the database
+        """
+        if db.get_bind().dialect.name != "sqlite":
+            return sql
+        return self.rewriter.rewrite(sql)
+    
     def _process_results(self, rows: List) -> Union[int, float, str, List[dict]]:
         """
         Process query results into appropriate format
@@ -74,20 +347,64 @@ class SQLExecutor:
         """
         Log query execution for analytics
         
+        With a log writer attached the row is queued and written in a
+        background batch instead of committed here.
+        
         Args:
             db: Database session
             question: Original question
             sql: Generated SQL
             execution_time_ms: Execution time in milliseconds
         """
+        created_at = datetime.utcnow()
+        if self.log_writer is not None:
+            self.log_writer.submit(LogEntry(question, sql, execution_time_ms, created_at))
+            return
+        
         try:
             query_log = QueryLog(
                 question=question,
                 generated_sql=sql,
-                execution_time=execution_time_ms
+                execution_time=execution_time_ms,
+                created_at=created_at
             )
             db.add(query_log)
+            self.timeseries.record(db, execution_time_ms, created_at)
             db.commit()
         except Exception as e:
             print(f"Failed to log query: {e}")
             db.rollback()
+    
+    async def _log_query_async(
+        self,
+        db: AsyncSession,
+        question: str,
+        sql: str,
+        execution_time_ms: int
+    ) -> None:
+        """
+        Async version of :meth:`_log_query`
+        
+        Args:
+            db: Async database session
+            question: Original question
+            sql: Generated SQL
+            execution_time_ms: Execution time in milliseconds
+        """
+        created_at = datetime.utcnow()
+        if self.log_writer is not None:
+            self.log_writer.submit(LogEntry(question, sql, execution_time_ms, created_at))
+            return
+        
+        try:
+            db.add(QueryLog(
+                question=question,
+                generated_sql=sql,
+                execution_time=execution_time_ms,
+                created_at=created_at
+            ))
+            await self.timeseries.record_async(db, execution_time_ms, created_at)
+            await db.commit()
+        except Exception as e:
+            print(f"Failed to log query: {e}")
+            await db.rollback()
@@ -0,0 +1,350 @@
+"""
+Tenant-aware database routing.
+
+Each tenant (school) gets its own database, so its queries only scan its
+own rows, its query log and analytics are its own, and writes of different
+tenants never wait on the same SQLite lock. The database URL comes from a
+template such as ``sqlite:///./tenants/{tenant}.db``; with ``{shard}`` in
+the template, tenants are also spread over ``shards`` locations (disks or
+servers) by a stable hash of their id. Tenants never share tables: the
+schema has no tenant column, so separate databases are what keeps them
+apart.
+
+:class:`TenantRegistry` opens a tenant's engines, creates its tables and
+builds its services on first use, and keeps at most ``max_open`` tenants
+open, closing the least recently used. Only known tenants (configured, or
+whose SQLite database already exists) are opened, so clients cannot create
+databases by naming new tenants. :class:`TenantMiddleware` resolves
+the tenant of each request from its API key (``TENANT_API_KEYS``) or the
+``X-Tenant-ID`` header and stores it in ``request.state.tenant``, where the
+session dependencies and endpoints pick it up.
+"""
+from collections import OrderedDict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import os
+import re
+import threading
+import zlib
+
+# Tenant ids end up in file names and URLs
+_TENANT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+# Paths served without a tenant (probes, docs, profiles)
+EXEMPT_PATHS = ("/health", "/docs", "/redoc", "/openapi.json", "/profiles")
+
+
+class Tenant:
+    """A tenant's session factories and the services bound to its database"""
+    
+    def __init__(
+        self,
+        tenant_id: Optional[str],
+        session_factory: sessionmaker,
+        async_session_factory: async_sessionmaker,
+        executor: Any,
+        analytics: Any,
+        timeseries: Any,
+        data_version: Any,
+        ingest: Any,
+        engines: Tuple[Any, ...] = ()
+    ):
+        self.tenant_id = tenant_id
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.executor = executor
+        self.analytics = analytics
+        self.timeseries = timeseries
+        self.data_version = data_version
+        self.ingest = ingest
+        self.engines = engines
+    
+    async def aclose(self) -> None:
+        """Close the pooled connections of engines owned by this tenant"""
+        for engine in self.engines:
+            if isinstance(engine, AsyncEngine):
+                await engine.dispose()
+            else:
+                engine.dispose()
+
+
+def shard_of(tenant_id: str, shards: int) -> int:
+    """
+    Shard number of a tenant
+    
+    Args:
+        tenant_id: Tenant id
+        shards: Number of shards
+    
+    Returns:
+        Stable shard number in ``[0, shards)`` (the same in every process)
+    """
+    return zlib.crc32(tenant_id.encode()) % max(1, shards)
+
+
+def tenant_database_url(url_template: str, tenant_id: str, shards: int = 1) -> str:
+    """
+    Database URL of a tenant
+    
+    Args:
+        url_template: URL with ``{tenant}`` and optionally ``{shard}``
+        tenant_id: Tenant id
+        shards: Number of shards
+    
+    Returns:
+        The URL template filled with the tenant id and its shard
+    
+    Raises:
+        ValueError: If the tenant id is not 1-64 letters, digits, "_" or "-"
+    """
+    if not _TENANT_ID.match(tenant_id):
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    return url_template.format(tenant=tenant_id, shard=shard_of(tenant_id, shards))
+
+
+def resolve_tenant_id(
+    headers: Dict[str, str],
+    api_keys: Dict[str, str],
+    header: Optional[str] = "x-tenant-id"
+) -> Optional[str]:
+    """
+    Tenant of a request
+    
+    An API key mapped to a tenant wins over the header. Clients are only
+    kept out of other tenants' data when the header is ignored (``header``
+    None, the default setting once ``TENANT_API_KEYS`` is set): otherwise
+    a client can leave out its key and name any tenant.
+    
+    Args:
+        headers: Request headers (lower-case names)
+        api_keys: API key -> tenant id
+        header: Lower-case name of the tenant header, or None to ignore it
+    
+    Returns:
+        Tenant id, or None if the request names no tenant
+    """
+    api_key = headers.get("x-api-key")
+    if api_key and api_key in api_keys:
+        return api_keys[api_key]
+    if header:
+        return headers.get(header) or None
+    return None
+
+
+class TenantRegistry:
+    """
+    Lazily opened per-tenant databases, at most ``max_open`` at a time
+    
+    Only tenants in ``known_tenants`` (None: any) or whose SQLite database
+    already exists are opened. Opening a tenant creates its engines (sync
+    and async, with their own small pools), creates missing tables, and
+    builds its executor,
+    analytics, timeseries, data version and ingest services. Evicted
+    tenants' engines are disposed by :meth:`close_evicted`; requests still
+    holding one finish normally (their connections close when returned).
+    """
+    
+    def __init__(
+        self,
+        url_template: str,
+        build_services: Callable[[str, sessionmaker], Dict[str, Any]],
+        shards: int = 1,
+        max_open: int = 32,
+        pool_size: int = 5,
+        max_overflow: int = 5,
+        pool_timeout: int = 30,
+        configure_sqlite: Optional[Callable] = None,
+        known_tenants: Optional[Iterable[str]] = None
+    ):
+        if "{tenant}" not in url_template:
+            raise ValueError("Tenant database URL template must contain {tenant}")
+        self.url_template = url_template
+        self.build_services = build_services
+        self.shards = shards
+        self.max_open = max_open
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.configure_sqlite = configure_sqlite
+        self.known_tenants = None if known_tenants is None else frozenset(known_tenants)
+        self._open: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._evicted: List[Tenant] = []
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._open)
+    
+    def __contains__(self, tenant_id: str) -> bool:
+        return tenant_id in self._open
+    
+    def tenant_ids(self) -> List[str]:
+        """Ids of the known tenants and of every tenant currently open"""
+        with self._lock:
+            return sorted(set(self.known_tenants or ()) | set(self._open))
+    
+    def database_url(self, tenant_id: str) -> str:
+        """Database URL of a tenant (see :func:`tenant_database_url`)"""
+        return tenant_database_url(self.url_template, tenant_id, self.shards)
+    
+    def lookup(self, tenant_id: str) -> Optional[Tenant]:
+        """
+        Get a tenant if it is already open (no I/O, safe on the event loop)
+        
+        Args:
+            tenant_id: Tenant id
+        
+        Returns:
+            The open tenant, or None
+        """
+        with self._lock:
+            tenant = self._open.get(tenant_id)
+            if tenant is not None:
+                self._open.move_to_end(tenant_id)
+            return tenant
+    
+    def get(self, tenant_id: str) -> Tenant:
+        """
+        Get a tenant, opening it (and creating its tables) if needed
+        
+        Blocking: call it from a worker thread unless :meth:`lookup` found
+        the tenant open.
+        
+        Args:
+            tenant_id: Tenant id
+        
+        Returns:
+            The open tenant
+        
+        Raises:
+            ValueError: If the tenant id is invalid
+            LookupError: If the tenant is unknown and has no database
+        """
+        tenant = self.lookup(tenant_id)
+        if tenant is not None:
+            return tenant
+        
+        # Opened outside the lock; a concurrent open of the same tenant loses the race
+        opened = self._open_tenant(tenant_id)
+        with self._lock:
+            tenant = self._open.get(tenant_id)
+            if tenant is not None:
+                self._evicted.append(opened)
+                return tenant
+            self._open[tenant_id] = opened
+            while len(self._open) > self.max_open:
+                _, evicted = self._open.popitem(last=False)
+                self._evicted.append(evicted)
+        return opened
+    
+    async def close_evicted(self) -> None:
+        """Dispose the engines of tenants evicted since the last call"""
+        with self._lock:
+            evicted, self._evicted = self._evicted, []
+        for tenant in evicted:
+            await tenant.aclose()
+    
+    async def close(self) -> None:
+        """Close every open tenant (at shutdown)"""
+        with self._lock:
+            self._evicted.extend(self._open.values())
+            self._open.clear()
+        await self.close_evicted()
+    
+    def _open_tenant(self, tenant_id: str) -> Tenant:
+        """Create a tenant's engines, tables and services"""
+        from app.database import async_database_url
+        from app.models import Base
+        
+        url = self.database_url(tenant_id)
+        parsed = make_url(url)
+        sqlite = parsed.get_backend_name() == "sqlite"
+        file_based = sqlite and parsed.database not in (None, "", ":memory:")
+        if self.known_tenants is not None and tenant_id not in self.known_tenants:
+            if not (file_based and os.path.exists(parsed.database)):
+                raise LookupError(f"Unknown tenant: {tenant_id}")
+        if file_based:
+            os.makedirs(os.path.dirname(os.path.abspath(parsed.database)), exist_ok=True)
+        
+        engine = create_engine(url, connect_args={"check_same_thread": False} if sqlite else {})
+        async_engine = create_async_engine(
+            async_database_url(url),
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_pre_ping=True
+        )
+        if sqlite and self.configure_sqlite is not None:
+            event.listen(engine, "connect", self.configure_sqlite)
+            event.listen(async_engine.sync_engine, "connect", self.configure_sqlite)
+        
+        try:
+            Base.metadata.create_all(bind=engine)
+        except Exception:
+            engine.dispose()
+            raise
+        
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        return Tenant(
+            tenant_id,
+            session_factory,
+            async_session_factory,
+            engines=(engine, async_engine),
+            **self.build_services(tenant_id, session_factory)
+        )
+
+
+class TenantMiddleware:
+    """ASGI middleware selecting the tenant of each request"""
+    
+    def __init__(
+        self,
+        app,
+        registry: TenantRegistry,
+        api_keys: Optional[Dict[str, str]] = None,
+        header: Optional[str] = "X-Tenant-ID",
+        exempt_paths: Tuple[str, ...] = EXEMPT_PATHS
+    ):
+        self.app = app
+        self.registry = registry
+        self.api_keys = api_keys or {}
+        self.header = header.lower() if header else None
+        self.exempt_paths = exempt_paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+        
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        tenant_id = resolve_tenant_id(headers, self.api_keys, self.header)
+        if tenant_id is None:
+            await self._send_error(send, 400, "A tenant is required (X-Tenant-ID header or a tenant API key)")
+            return
+        
+        tenant = self.registry.lookup(tenant_id)
+        if tenant is None:
+            try:
+                tenant = await asyncio.to_thread(self.registry.get, tenant_id)
+            except ValueError as e:
+                await self._send_error(send, 400, str(e))
+                return
+            except LookupError as e:
+                await self._send_error(send, 404, str(e))
+                return
+            await self.registry.close_evicted()
+        
+        scope.setdefault("state", {})["tenant"] = tenant
+        await self.app(scope, receive, send)
+    
+    async def _send_error(self, send, status: int, detail: str) -> None:
+        """Send a JSON error response"""
+        body = json.dumps({"detail": detail}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
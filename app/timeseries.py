@@ -0,0 +1,248 @@
+"""
+Time-bucketed query log rollups.
+
+Every logged query increments a per-minute and a per-hour bucket holding the
+query count, total/max execution time and a fixed-bucket latency histogram.
+Throughput and latency percentiles for any range are answered by merging
+buckets, without reading raw ``query_logs`` rows.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Integer, Text, cast, func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import QueryLogBucket
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime, timedelta
+import bisect
+import json
+
+# Upper edges (ms) of the latency histogram; one extra overflow bucket follows
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+}
+
+# Ranges up to this long are answered from minute buckets, longer ones from hours
+MINUTE_RANGE_LIMIT = timedelta(hours=6)
+
+
+def floor_time(value: datetime, granularity: str) -> datetime:
+    """
+    Truncate a timestamp to the start of its bucket
+    
+    Args:
+        value: Timestamp
+        granularity: "minute" or "hour"
+    
+    Returns:
+        Bucket start
+    """
+    value = value.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        value = value.replace(minute=0)
+    return value
+
+
+def histogram_index(execution_time_ms: int) -> int:
+    """Index of the histogram bucket an execution time falls into"""
+    return bisect.bisect_left(LATENCY_BUCKETS_MS, execution_time_ms)
+
+
+def percentile(histogram: List[int], q: float, max_ms: int = 0) -> Optional[float]:
+    """
+    Estimate a percentile from a latency histogram
+    
+    The value is interpolated linearly inside the bucket that holds the
+    requested rank; the overflow bucket is bounded by the observed maximum.
+    
+    Args:
+        histogram: Counts per latency bucket
+        q: Percentile as a fraction (e.g. 0.95)
+        max_ms: Largest observed execution time
+    
+    Returns:
+        Estimated execution time in milliseconds, or None without data
+    """
+    total = sum(histogram)
+    if total == 0:
+        return None
+    
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        if count and cumulative + count >= rank:
+            lower = LATENCY_BUCKETS_MS[index - 1] if index > 0 else 0
+            upper = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else max_ms
+            if max_ms:
+                upper = min(upper, max_ms)
+            upper = max(upper, lower)
+            return round(lower + (upper - lower) * (rank - cumulative) / count, 2)
+        cumulative += count
+    return float(max_ms)
+
+
+class TimeseriesService:
+    """
+    Service for time-bucketed query rollups
+    
+    ``minute_retention`` is the age after which retention prunes minute
+    buckets; ranges starting before it are answered from hour buckets.
+    """
+    
+    def __init__(self, minute_retention: Optional[timedelta] = None):
+        self.minute_retention = minute_retention
+    
+    def record(self, db: Session, execution_time_ms: int, created_at: datetime) -> None:
+        """
+        Add a logged query to its minute and hour buckets
+        
+        The upserts join the caller's transaction; they are committed
+        together with the query log row.
+        
+        Args:
+            db: Database session
+            execution_time_ms: Execution time in milliseconds
+            created_at: Log timestamp (naive UTC)
+        """
+        for statement in self._upserts(db.get_bind().dialect.name, execution_time_ms, created_at):
+            db.execute(statement)
+    
+    async def record_async(self, db: AsyncSession, execution_time_ms: int, created_at: datetime) -> None:
+        """
+        Async version of :meth:`record`
+        
+        Args:
+            db: Async database session
+            execution_time_ms: Execution time in milliseconds
+            created_at: Log timestamp (naive UTC)
+        """
+        for statement in self._upserts(db.get_bind().dialect.name, execution_time_ms, created_at):
+            await db.execute(statement)
+    
+    def _upserts(self, dialect: str, execution_time_ms: int, created_at: datetime) -> Iterator:
+        """
+        Build the bucket upsert statement for each granularity
+        
+        Args:
+            dialect: Database dialect name ("sqlite" or "postgresql")
+            execution_time_ms: Execution time in milliseconds
+            created_at: Log timestamp (naive UTC)
+        
+        Returns:
+            Iterator of INSERT ... ON CONFLICT DO UPDATE statements; none
+            on other dialects, which keep the query log without buckets
+        """
+        index = histogram_index(execution_time_ms)
+        empty = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        empty[index] = 1
+        
+        if dialect == "sqlite":
+            insert = sqlite.insert
+            path = f"$[{index}]"
+            max_execution_ms = func.max(QueryLogBucket.max_execution_ms, execution_time_ms)
+            histogram = func.json_set(
+                QueryLogBucket.histogram, path,
+                func.json_extract(QueryLogBucket.histogram, path) + 1
+            )
+        elif dialect == "postgresql":
+            insert = postgresql.insert
+            counts = cast(QueryLogBucket.histogram, postgresql.JSONB)
+            max_execution_ms = func.greatest(QueryLogBucket.max_execution_ms, execution_time_ms)
+            histogram = cast(func.jsonb_set(
+                counts, postgresql.array([str(index)]),
+                func.to_jsonb(cast(counts.op("->>")(index), Integer) + 1)
+            ), Text)
+        else:
+            # Never fail (and roll back) the query log write over its rollup
+            return
+        
+        for granularity in GRANULARITIES:
+            statement = insert(QueryLogBucket).values(
+                granularity=granularity,
+                bucket_start=floor_time(created_at, granularity),
+                query_count=1,
+                total_execution_ms=execution_time_ms,
+                max_execution_ms=execution_time_ms,
+                histogram=json.dumps(empty)
+            )
+            yield statement.on_conflict_do_update(
+                index_elements=["granularity", "bucket_start"],
+                set_={
+                    "query_count": QueryLogBucket.query_count + 1,
+                    "total_execution_ms": QueryLogBucket.total_execution_ms + execution_time_ms,
+                    "max_execution_ms": max_execution_ms,
+                    "histogram": histogram,
+                }
+            )
+    
+    def get_timeseries(
+        self,
+        db: Session,
+        start: datetime,
+        end: datetime,
+        granularity: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get throughput and latency percentiles for a time range
+        
+        Args:
+            db: Database session
+            start: Range start (naive UTC, inclusive)
+            end: Range end (naive UTC, exclusive)
+            granularity: "minute" or "hour"; chosen from the range length
+                (and whether its minute buckets are still kept) when omitted
+        
+        Returns:
+            Dictionary with per-bucket throughput and overall percentiles
+        """
+        if granularity is None:
+            pruned = self.minute_retention is not None and start < datetime.utcnow() - self.minute_retention
+            granularity = "minute" if end - start <= MINUTE_RANGE_LIMIT and not pruned else "hour"
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        
+        rows = (
+            db.query(QueryLogBucket)
+            .filter(
+                QueryLogBucket.granularity == granularity,
+                QueryLogBucket.bucket_start >= floor_time(start, granularity),
+                QueryLogBucket.bucket_start < end
+            )
+            .order_by(QueryLogBucket.bucket_start)
+            .all()
+        )
+        
+        merged = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        total_queries = 0
+        total_ms = 0
+        max_ms = 0
+        buckets = []
+        step_seconds = GRANULARITIES[granularity].total_seconds()
+        
+        for row in rows:
+            for index, count in enumerate(json.loads(row.histogram)):
+                merged[index] += count
+            total_queries += row.query_count
+            total_ms += row.total_execution_ms
+            max_ms = max(max_ms, row.max_execution_ms)
+            buckets.append({
+                "bucket_start": row.bucket_start.isoformat(),
+                "query_count": row.query_count,
+                "queries_per_second": round(row.query_count / step_seconds, 4),
+                "avg_execution_ms": round(row.total_execution_ms / row.query_count, 2)
+            })
+        
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "granularity": granularity,
+            "total_queries": total_queries,
+            "avg_execution_ms": round(total_ms / total_queries, 2) if total_queries else None,
+            "p50_ms": percentile(merged, 0.50, max_ms),
+            "p95_ms": percentile(merged, 0.95, max_ms),
+            "p99_ms": percentile(merged, 0.99, max_ms),
+            "max_execution_ms": max_ms if total_queries else None,
+            "buckets": buckets
+        }
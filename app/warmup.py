@@ -0,0 +1,125 @@
+"""
+Cache warming from query log history.
+
+After a deploy or restart every cache is cold and popular questions would
+all go back to Gemini at once. :class:`CacheWarmer` replays the most
+frequent logged questions into the question-to-SQL cache (using the SQL that
+was logged for them, not the LLM) and optionally into the result cache.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, desc
+from app.models import QueryLog
+from app.nlp2sql import NLP2SQLService
+from app.sql_executor import SQLExecutor
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import threading
+import time
+
+
+class CacheWarmer:
+    """Pre-populates caches with the most frequent logged questions"""
+    
+    def __init__(
+        self,
+        nlp2sql: NLP2SQLService,
+        executor: SQLExecutor,
+        top_n: int = 100,
+        rate_per_second: float = 5.0,
+        warm_results: bool = False
+    ):
+        self.nlp2sql = nlp2sql
+        self.executor = executor
+        self.top_n = top_n
+        self.rate_per_second = rate_per_second
+        self.warm_results = warm_results
+        self.ready = threading.Event()
+        self.last_run: Optional[Dict[str, Any]] = None
+    
+    def warm(self, db: Session) -> Dict[str, Any]:
+        """
+        Warm the caches from the top-N most frequent logged questions
+        
+        Questions are primed in one bulk write; result warming executes at
+        most ``rate_per_second`` queries per second so a warm-up running next
+        to live traffic does not starve it.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Summary with the number of questions primed
+        """
+        start = time.time()
+        latest_ids = (
+            db.query(func.max(QueryLog.id).label("id"), func.count(QueryLog.id).label("hits"))
+            .group_by(QueryLog.question)
+            .order_by(desc("hits"))
+            .limit(self.top_n)
+            .subquery()
+        )
+        rows = (
+            db.query(QueryLog.question, QueryLog.generated_sql)
+            .join(latest_ids, QueryLog.id == latest_ids.c.id)
+            .order_by(desc(latest_ids.c.hits))
+            .all()
+        )
+        
+        # Question -> SQL entries are cheap: write them in one bulk call
+        primed = self.nlp2sql.prime_many(rows)
+        
+        # Results cost a query each: pace them to leave room for live traffic
+        interval = 1.0 / self.rate_per_second if self.rate_per_second > 0 else 0
+        results = 0
+        if self.warm_results:
+            for question, sql in primed:
+                try:
+                    results += self.executor.warm_result(db, sql)
+                except Exception as e:
+                    print(f"Cache warm-up skipped result for {question!r}: {e}")
+                if interval:
+                    time.sleep(interval)
+        
+        self.last_run = {
+            "candidates": len(rows),
+            "primed_questions": len(primed),
+            "primed_results": results,
+            "duration_ms": int((time.time() - start) * 1000)
+        }
+        return self.last_run
+
+
+async def warmup_loop(
+    warmer: CacheWarmer,
+    session_factory: Callable[[], Session],
+    interval_seconds: float
+) -> None:
+    """
+    Warm the caches at startup and then on a schedule until cancelled
+    
+    ``warmer.ready`` is set once the first run finishes, successful or not.
+    
+    Args:
+        warmer: Cache warmer
+        session_factory: Callable returning a new database session
+        interval_seconds: Delay between runs; 0 runs only once
+    """
+    def run_once() -> Dict[str, Any]:
+        db = session_factory()
+        try:
+            return warmer.warm(db)
+        finally:
+            db.close()
+    
+    while True:
+        try:
+            summary = await asyncio.to_thread(run_once)
+            print(f"Cache warm-up: {summary}")
+        except Exception as e:
+            print(f"Cache warm-up failed: {e}")
+        finally:
+            warmer.ready.set()
+        
+        if interval_seconds <= 0:
+            return
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,117 @@
+"""
+Load test: admission control under an LLM burst
+
+Drives the real application in-process (httpx ASGI transport) against a
+scratch seeded database, with Gemini replaced by a stub that blocks for
+``--llm-ms``. A few noisy clients fire a burst of questions that need the
+LLM while a quiet client keeps sending template questions. The run is
+repeated with admission control disabled and enabled, and reports status
+counts and p50/p99 latency of the requests that were served.
+
+Usage:
+    python -m benchmarks.admission_load --burst 400 --llm-ms 200
+    python -m benchmarks.admission_load --burst 400 --llm-burst 1000   # SLO shedding only
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(app, burst: int, noisy_clients: int, fast_requests: int) -> dict:
+    """Fire one burst plus steady fast-path traffic; return per-class results"""
+    import httpx
+
+    results = {"llm": [], "fast": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+        async def send(kind: str, question: str, api_key: str) -> None:
+            start = time.perf_counter()
+            response = await client.post("/query", json={"question": question}, headers={"X-API-Key": api_key})
+            results[kind].append((response.status_code, (time.perf_counter() - start) * 1000))
+
+        async def steady() -> None:
+            for i in range(fast_requests):
+                await send("fast", "List all courses", "quiet")
+                await asyncio.sleep(0.01)
+
+        burst_tasks = [
+            send("llm", f"Unusual question {i}", f"noisy-{i % noisy_clients}")
+            for i in range(burst)
+        ]
+        await asyncio.gather(steady(), *burst_tasks)
+    return results
+
+
+def report(label: str, results: dict) -> None:
+    """Print status counts and latency of served requests"""
+    for kind, rows in results.items():
+        statuses = Counter(status for status, _ in rows)
+        served = [ms for status, ms in rows if status == 200]
+        print(f"{label:<18} {kind:<5} served {statuses.get(200, 0):4d}  429 {statuses.get(429, 0):4d}  "
+              f"503 {statuses.get(503, 0):4d}  p50 {percentile(served, 0.5):8.1f} ms  "
+              f"p99 {percentile(served, 0.99):8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=400)
+    parser.add_argument("--noisy-clients", type=int, default=4)
+    parser.add_argument("--fast-requests", type=int, default=100)
+    parser.add_argument("--llm-ms", type=int, default=200)
+    parser.add_argument("--llm-burst", type=int, default=None,
+                        help="per-client LLM burst (default: LLM_RATE_LIMIT_BURST); raise it to exercise SLO shedding")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["CACHE_WARMUP_ENABLED"] = "false"
+        # Only known API keys get their own rate-limit buckets
+        keys = ["quiet"] + [f"noisy-{i}" for i in range(args.noisy_clients)]
+        os.environ["ADMISSION_API_KEYS"] = json.dumps(keys)
+        subprocess.run([sys.executable, "-m", "app.seed"], check=True, stdout=subprocess.DEVNULL)
+
+        from app import main as api
+        from app.config import get_settings
+        from app.nlp2sql import NLP2SQLService
+
+        def slow_llm(self, question: str) -> str:
+            time.sleep(args.llm_ms / 1000)
+            return "SELECT COUNT(*) FROM students"
+
+        NLP2SQLService._generate_with_llm = slow_llm
+        settings = get_settings()
+
+        for enabled in (False, True):
+            # Reset the controller the middleware holds, with fresh buckets and gates
+            api.admission.__init__(
+                enabled=enabled,
+                rate_per_second=settings.rate_limit_per_second,
+                burst=settings.rate_limit_burst,
+                llm_rate_per_second=settings.llm_rate_limit_per_second,
+                llm_burst=args.llm_burst or settings.llm_rate_limit_burst,
+                max_in_flight=settings.max_in_flight_requests,
+                llm_max_concurrency=settings.llm_max_concurrency,
+                slo_seconds=settings.request_slo_seconds,
+                llm_slo_seconds=settings.llm_slo_seconds,
+            )
+            results = asyncio.run(run(api.app, args.burst, args.noisy_clients, args.fast_requests))
+            report("admission " + ("on" if enabled else "off"), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark: blocking vs threadpool vs async data access for /query and /stats
+
+Runs the executor and analytics service the way each endpoint layout calls
+them, with the same number of concurrent requests on one event loop:
+
+- blocking:   sync session called directly inside ``async def`` (the
+  original layout; every query stalls the loop)
+- threadpool: sync session on the anyio worker threadpool
+- async:      ``AsyncSession`` on aiosqlite (``execute_query_async`` /
+  ``get_stats_async``)
+
+Besides throughput it reports the longest event-loop stall seen by a 10 ms
+ticker, i.e. how long every other request on the worker would have waited.
+Raise the SQLite busy timeout so 50 concurrent log writers queue instead of
+failing with "database is locked".
+
+Usage:
+    SQLITE_BUSY_TIMEOUT_MS=60000 python -m benchmarks.async_db --concurrency 50 --requests 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import anyio.to_thread
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.analytics import AnalyticsService
+from app.database import _configure_sqlite
+from app.models import Base
+from app.sql_executor import SQLExecutor
+
+QUERIES = [
+    "SELECT COUNT(*) FROM students",
+    "SELECT id, name, grade FROM students WHERE grade = 10",
+    "SELECT c.name, COUNT(e.id) AS n FROM courses c JOIN enrollments e ON e.course_id = c.id "
+    "GROUP BY c.id ORDER BY n DESC LIMIT 5",
+]
+
+
+def build_database(path: str, n_students: int, n_logs: int) -> None:
+    """Create the schema and load students, enrollments and query logs"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+        conn.execute(
+            text("INSERT INTO students (id, name, grade) VALUES (:id, :name, :grade)"),
+            [{"id": i, "name": f"Student {i}", "grade": 9 + i % 4} for i in range(1, n_students + 1)],
+        )
+        conn.execute(
+            text("INSERT INTO courses (id, name, category) VALUES (:id, :name, 'Programming')"),
+            [{"id": i, "name": f"Course {i}"} for i in range(1, 51)],
+        )
+        conn.execute(
+            text("INSERT INTO enrollments (student_id, course_id, enrolled_at) VALUES (:s, :c, '2024-01-01')"),
+            [{"s": rng.randint(1, n_students), "c": rng.randint(1, 50)} for _ in range(n_students * 3)],
+        )
+        conn.execute(
+            text("INSERT INTO query_logs (question, generated_sql, execution_time, created_at) "
+                 "VALUES (:q, 'SELECT 1', :t, CURRENT_TIMESTAMP)"),
+            [{"q": f"How many python students in grade {i % 4}", "t": rng.randint(1, 200)} for i in range(n_logs)],
+        )
+    engine.dispose()
+
+
+async def run_mode(mode: str, path: str, concurrency: int, total: int, kind: str) -> tuple:
+    """Run ``total`` requests of one kind in one mode; returns (requests/second, max loop lag ms)"""
+    executor = SQLExecutor()
+    analytics = AnalyticsService()
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                           pool_size=concurrency, max_overflow=0)
+    SessionLocal = sessionmaker(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=concurrency, max_overflow=0)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+    event.listen(engine, "connect", _configure_sqlite)
+    event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 40
+
+    def sync_request(i: int) -> None:
+        db = SessionLocal()
+        try:
+            if kind == "query":
+                executor.execute_query(db, QUERIES[i % len(QUERIES)], "benchmark")
+            else:
+                analytics.get_stats(db)
+        finally:
+            db.close()
+
+    async def request(i: int) -> None:
+        if mode == "blocking":
+            sync_request(i)
+        elif mode == "threadpool":
+            await anyio.to_thread.run_sync(sync_request, i)
+        else:
+            async with AsyncSessionLocal() as db:
+                if kind == "query":
+                    await executor.execute_query_async(db, QUERIES[i % len(QUERIES)], "benchmark")
+                else:
+                    await analytics.get_stats_async(db)
+
+    # Event loop responsiveness: how late a 10 ms ticker wakes up under load
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            expected = loop.time() + 0.01
+            await asyncio.sleep(0.01)
+            lags.append((loop.time() - expected) * 1000)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i: int) -> None:
+        async with semaphore:
+            await request(i)
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+
+    engine.dispose()
+    await async_engine.dispose()
+    return total / elapsed, max(lags, default=0.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--logs", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, args.students, args.logs)
+        for kind, total in (("query", args.requests), ("stats", max(1, args.requests // 10))):
+            for mode in ("blocking", "threadpool", "async"):
+                rps, lag = asyncio.run(run_mode(mode, path, args.concurrency, total, kind))
+                print(f"/{kind:<6} {mode:<11} {rps:9.1f} req/s   max event loop stall {lag:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
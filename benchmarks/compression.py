@@ -0,0 +1,80 @@
+"""
+Benchmark: response compression CPU time vs bytes saved
+
+Encodes ``/query``-style JSON results (lists of row dicts) of several sizes
+with gzip and zstd at several levels, as :class:`CompressionMiddleware`
+would, and reports the compression ratio, CPU time per response and
+throughput. A last column estimates the time to send the body over a
+``--mbps`` link, so the CPU cost can be set against the transfer saved.
+
+zstd rows need the optional ``zstandard`` package.
+
+Usage:
+    python -m benchmarks.compression --mbps 100
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+
+from app.compression import _Compressor, zstandard
+
+SIZES = (10, 100, 1000, 10000)  # rows per result
+LEVELS = [("gzip", level) for level in (1, 4, 6, 9)] + [("zstd", level) for level in (1, 3, 6)]
+
+
+def rows(rng: random.Random, count: int) -> bytes:
+    """A JSON query response of ``count`` student/enrollment rows"""
+    categories = ["Programming", "Mathematics", "Science", "Arts", "Languages"]
+    result = [
+        {
+            "id": rng.randint(1, 10 ** 6),
+            "name": f"{rng.choice(['Alice', 'Bob', 'Chen', 'Dana', 'Eve'])} {rng.choice(['Lee', 'Smith', 'Patel'])}",
+            "grade": rng.randint(9, 12),
+            "category": rng.choice(categories),
+            "enrolled_at": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00",
+            "score": round(rng.uniform(50, 100), 2),
+        }
+        for _ in range(count)
+    ]
+    return json.dumps({"question": "q", "generated_sql": "SELECT ...", "result": result}).encode()
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """Compress a whole body as the middleware does"""
+    compressor = _Compressor(encoding, gzip_level=level, zstd_level=level)
+    return compressor.compress(body, flush=False) + compressor.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mbps", type=float, default=100.0, help="Link speed for the transfer estimate")
+    parser.add_argument("--seconds", type=float, default=0.3, help="Time spent per measurement")
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    print(f"{'rows':>6} {'codec':>7} {'bytes':>9} {'ratio':>6} {'cpu ms':>8} {'MB/s':>7} {'send ms':>8}")
+    for count in SIZES:
+        body = rows(rng, count)
+        send_ms = len(body) * 8 / (args.mbps * 1e6) * 1000
+        print(f"{count:>6} {'none':>7} {len(body):>9} {1:>6.1f} {0:>8.3f} {'':>7} {send_ms:>8.2f}")
+        for encoding, level in LEVELS:
+            if encoding == "zstd" and zstandard is None:
+                continue
+            out = compress(body, encoding, level)
+            if encoding == "gzip":
+                assert zlib.decompress(out, 31) == body
+            runs, start = 0, time.process_time()
+            while time.process_time() - start < args.seconds:
+                compress(body, encoding, level)
+                runs += 1
+            cpu_ms = (time.process_time() - start) / runs * 1000
+            print(
+                f"{count:>6} {encoding + str(level):>7} {len(out):>9} {len(body) / len(out):>6.1f} "
+                f"{cpu_ms:>8.3f} {len(body) / cpu_ms / 1000:>7.0f} {len(out) * 8 / (args.mbps * 1e6) * 1000:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: JSON /query results vs streamed bulk export
+
+Loads ``--rows`` enrollments into a scratch database and pulls them all
+back the way ``/query`` does (fetchall, list of dicts, JSON) and through
+the ``/query/export`` encoders (fetchmany batches, CSV / Arrow / Parquet).
+Reports wall time, output size and peak Python memory (tracemalloc).
+Arrow and Parquet are skipped when pyarrow is not installed.
+
+Usage:
+    python -m benchmarks.export --rows 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.export import ResultExporter
+from app.models import Base
+from app.sql_executor import SQLExecutor
+
+SQL = "SELECT id, student_id, course_id, enrolled_at FROM enrollments"
+
+
+def build_database(path: str, rows: int) -> None:
+    """Create the schema and load enrollments"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for start in range(0, rows, 100000):
+            conn.execute(
+                text("INSERT INTO enrollments (student_id, course_id, enrolled_at) "
+                     "VALUES (:s, :c, '2024-01-01 09:30:00')"),
+                [{"s": i % 5000 + 1, "c": i % 50 + 1} for i in range(start, min(rows, start + 100000))],
+            )
+    engine.dispose()
+
+
+def measure(fn) -> tuple:
+    """Run fn; return (seconds, output bytes, peak traced MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+        formats = [("csv", None), ("csv", "gzip"), ("arrow", None), ("arrow", "zstd"), ("parquet", "snappy")]
+    except ImportError:
+        formats = [("csv", None), ("csv", "gzip")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, args.rows)
+        SessionLocal = sessionmaker(bind=create_engine(f"sqlite:///{path}"))
+        executor = SQLExecutor()
+        exporter = ResultExporter()
+        # Keep the query log out of the measurement
+        executor._log_query = lambda *a, **k: None
+
+        def json_path() -> int:
+            with SessionLocal() as db:
+                result, _ = executor.execute_query(db, SQL, "benchmark")
+                return len(json.dumps({"result": result}, default=str))
+
+        def export_path(fmt, compression) -> int:
+            with SessionLocal() as db:
+                columns, batches = executor.stream_query(db, SQL, "benchmark", chunk_size=args.chunk_size)
+                return sum(len(chunk) for chunk in exporter.stream(columns, batches, fmt, compression))
+
+        print(f"{args.rows} rows")
+        results = [("json (/query)", measure(json_path))]
+        for fmt, compression in formats:
+            label = f"{fmt}" + (f" + {compression}" if compression else "")
+            results.append((label, measure(lambda: export_path(fmt, compression))))
+        for label, (seconds, size, peak) in results:
+            print(f"{label:<18} {seconds:7.2f} s  {size / 2**20:8.1f} MB out  peak memory {peak:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
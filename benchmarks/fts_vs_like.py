@@ -0,0 +1,107 @@
+"""
+Benchmark: FTS5 MATCH vs LIKE '%...%' for course name search
+
+Builds a scratch SQLite catalog with the application schema, loads a scaled
+course catalog and compares the fast-path "students enrolled in <term>
+courses" query in its LIKE and FTS5 forms.
+
+Usage:
+    python -m benchmarks.fts_vs_like --courses 200000 --enrollments 500000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.models import Base
+from app.search import fts_phrase
+
+WORDS = [
+    "Python", "Java", "Data", "Science", "Web", "Development", "Machine",
+    "Learning", "Database", "Systems", "Cloud", "Security", "Design",
+    "Networks", "Statistics", "Algebra", "History", "Physics", "Art", "Music",
+]
+CATEGORIES = ["Programming", "Data Science", "AI/ML", "Database", "Humanities", "Science"]
+
+LIKE_SQL = (
+    "SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id "
+    "WHERE c.name LIKE :pattern"
+)
+FTS_SQL = (
+    "SELECT COUNT(DISTINCT e.student_id) FROM enrollments e JOIN courses c ON e.course_id = c.id "
+    "WHERE c.id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH :match)"
+)
+
+
+def build_catalog(engine, n_courses: int, n_students: int, n_enrollments: int) -> None:
+    """Create the schema and load a random catalog"""
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO students (id, name, grade) VALUES (:id, :name, :grade)"),
+            [{"id": i, "name": f"Student {i}", "grade": 9 + i % 4} for i in range(1, n_students + 1)],
+        )
+        conn.execute(
+            text("INSERT INTO courses (id, name, category) VALUES (:id, :name, :category)"),
+            [
+                {
+                    "id": i,
+                    "name": " ".join(rng.sample(WORDS, 3)) + f" {i}",
+                    "category": rng.choice(CATEGORIES),
+                }
+                for i in range(1, n_courses + 1)
+            ],
+        )
+        conn.execute(
+            text("INSERT INTO enrollments (student_id, course_id, enrolled_at) VALUES (:s, :c, '2024-01-01')"),
+            [
+                {"s": rng.randint(1, n_students), "c": rng.randint(1, n_courses)}
+                for _ in range(n_enrollments)
+            ],
+        )
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_enrollments_course_id ON enrollments (course_id)"))
+
+
+def time_query(engine, sql: str, params: dict, repeat: int) -> tuple:
+    """Return (best_ms, result) over ``repeat`` runs"""
+    best = float("inf")
+    result = None
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = conn.execute(text(sql), params).scalar()
+            best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=100_000)
+    parser.add_argument("--students", type=int, default=20_000)
+    parser.add_argument("--enrollments", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--term", default="python")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        start = time.perf_counter()
+        build_catalog(engine, args.courses, args.students, args.enrollments)
+        print(f"Loaded {args.courses} courses / {args.enrollments} enrollments "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        like_ms, like_result = time_query(engine, LIKE_SQL, {"pattern": f"%{args.term}%"}, args.repeat)
+        fts_ms, fts_result = time_query(engine, FTS_SQL, {"match": fts_phrase(args.term, "name")}, args.repeat)
+
+        print(f"LIKE  : {like_ms:8.2f} ms  (result={like_result})")
+        print(f"MATCH : {fts_ms:8.2f} ms  (result={fts_result})")
+        print(f"Speedup: {like_ms / fts_ms:.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: ORM row-by-row loading vs batched executemany ingestion
+
+Loads ``--rows`` enrollments into a scratch database (WAL, rollup and FTS
+triggers installed) twice: once the way ``app/seed.py`` does (one ORM
+object per row, one commit) and once through :class:`IngestService`.
+While each load runs, a reader thread issues a small query every 10 ms;
+its worst latency shows how long the load held readers up.
+
+Usage:
+    python -m benchmarks.ingest --rows 50000 --batch-size 1000
+"""
+import argparse
+import io
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import _configure_sqlite
+from app.ingest import IngestService, read_records
+from app.models import Base, Enrollment
+
+
+def fresh_database(path: str):
+    """Schema plus 5000 students and 50 courses; returns a session factory"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _configure_sqlite)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO students (id, name, grade) VALUES (:id, :name, :grade)"),
+                     [{"id": i, "name": f"Student {i}", "grade": 9 + i % 4} for i in range(1, 5001)])
+        conn.execute(text("INSERT INTO courses (id, name, category) VALUES (:id, :name, 'Programming')"),
+                     [{"id": i, "name": f"Course {i}"} for i in range(1, 51)])
+    return sessionmaker(bind=engine)
+
+
+def with_reader(SessionLocal, load) -> tuple:
+    """Run load while a reader polls; returns (load seconds, worst read ms)"""
+    done = threading.Event()
+    worst = [0.0]
+
+    def reader() -> None:
+        with SessionLocal() as db:
+            while not done.is_set():
+                start = time.perf_counter()
+                db.execute(text("SELECT COUNT(*) FROM courses")).scalar()
+                db.rollback()
+                worst[0] = max(worst[0], (time.perf_counter() - start) * 1000)
+                time.sleep(0.01)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    done.set()
+    thread.join()
+    return elapsed, worst[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    csv_text = "student_id,course_id,enrolled_at\n" + "".join(
+        f"{i % 5000 + 1},{i % 50 + 1},2024-{i % 12 + 1:02d}-15\n" for i in range(args.rows)
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        SessionLocal = fresh_database(os.path.join(tmp, "orm.db"))
+
+        def orm_load() -> None:
+            with SessionLocal() as db:
+                for _, record in read_records(io.StringIO(csv_text), "csv"):
+                    db.add(Enrollment(
+                        student_id=int(record["student_id"]),
+                        course_id=int(record["course_id"]),
+                        enrolled_at=datetime.fromisoformat(record["enrolled_at"])
+                    ))
+                db.commit()
+
+        seconds, worst = with_reader(SessionLocal, orm_load)
+        print(f"ORM add + commit   {args.rows / seconds:10.0f} rows/s   worst reader wait {worst:8.1f} ms")
+
+        SessionLocal = fresh_database(os.path.join(tmp, "ingest.db"))
+        service = IngestService(batch_size=args.batch_size)
+        report = {}
+
+        def batched_load() -> None:
+            with SessionLocal() as db:
+                report.update(service.ingest(db, "enrollments", read_records(io.StringIO(csv_text), "csv")))
+
+        seconds, worst = with_reader(SessionLocal, batched_load)
+        print(f"IngestService      {report['rows_per_second']:10.0f} rows/s   worst reader wait {worst:8.1f} ms"
+              f"   ({report['inserted']} inserted, batches of {args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: local intent routing latency
+
+Fills an :class:`IntentClassifier` with ``--examples`` synthetic logged
+questions (plus the template phrasings), added in small increments the
+way ``_generate_with_llm`` does, then times routing of paraphrased
+questions one at a time and as one ``classify_many`` batch.
+
+Usage:
+    python -m benchmarks.intent_routing --examples 5000 --queries 1000
+"""
+import argparse
+import random
+import time
+
+from app.intent import IntentClassifier
+from app.nlp2sql import NLP2SQLService
+
+SUBJECTS = ["students", "learners", "courses", "classes", "enrollments", "registrations"]
+FILTERS = ["in grade {n}", "in {year}", "in the {topic} category", "named {topic}", "taking {topic}"]
+TOPICS = ["python", "sql", "statistics", "databases", "design", "algebra", "biology", "history"]
+VERBS = ["How many", "List", "Show", "Average grade of", "Count", "Which"]
+
+
+def question(rng: random.Random) -> str:
+    """A random question in the shape of typical logged questions"""
+    condition = rng.choice(FILTERS).format(
+        n=rng.randint(9, 12), year=rng.randint(2019, 2025), topic=rng.choice(TOPICS)
+    )
+    return f"{rng.choice(VERBS)} {rng.choice(SUBJECTS)} {condition} {rng.choice(TOPICS)}{rng.randint(0, 999)}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    classifier = IntentClassifier(max_examples=args.examples + 100)
+    service = NLP2SQLService(intents=classifier)
+    start = time.perf_counter()
+    for i in range(args.examples):
+        classifier.add(question(rng), f"SELECT {i}")
+        if i % 50 == 0:
+            classifier.classify("warm up")
+    classifier.classify("warm up")
+    build = time.perf_counter() - start
+    print(f"{len(classifier)} examples indexed in {build:.2f} s ({len(classifier._segments)} segments)")
+
+    queries = [question(rng) for _ in range(args.queries)]
+    start = time.perf_counter()
+    for q in queries:
+        classifier.classify(q)
+    single = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    classifier.classify_many(queries)
+    batched = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    routed = sum(service.lookup_query(q) is not None for q in queries)
+    lookup = (time.perf_counter() - start) / len(queries)
+
+    print(f"classify             {single * 1e6:8.0f} us/question")
+    print(f"classify_many        {batched * 1e6:8.0f} us/question")
+    print(f"lookup_query         {lookup * 1e6:8.0f} us/question  ({routed}/{len(queries)} routed locally)")
+
+
+if __name__ == "__main__":
+    main()
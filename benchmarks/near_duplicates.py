@@ -0,0 +1,86 @@
+"""
+Benchmark: near-duplicate lookup, index size and load time
+
+Indexes ``--questions`` synthetic logged questions, then times lookups of
+reworded copies (filler words dropped, words shuffled, one typo) and of
+new questions over the same vocabulary, and saves and reloads the index.
+
+Usage:
+    python -m benchmarks.near_duplicates --questions 20000
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from app.near_duplicates import NearDuplicateIndex
+
+
+def vocabulary(rng: random.Random, size: int = 5000) -> list:
+    """Random pseudo-words, so generated questions are mostly distinct"""
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def question(rng: random.Random, words: list) -> str:
+    """A question of 5-9 vocabulary words with some filler words"""
+    body = rng.sample(words, rng.randint(5, 9))
+    return f"How many {body[0]} in the {' '.join(body[1:])} of {rng.choice(words)}?"
+
+
+def reword(text: str, rng: random.Random) -> str:
+    """Drop filler words, shuffle word order and swap two letters of one word"""
+    words = [w for w in text.rstrip("?").split() if w.lower() not in ("the", "in", "of")]
+    rng.shuffle(words)
+    i = max(range(len(words)), key=lambda j: len(words[j]))
+    word = words[i]
+    if len(word) > 4:
+        k = rng.randrange(1, len(word) - 2)
+        words[i] = word[:k] + word[k + 1] + word[k] + word[k + 2:]
+    return " ".join(words)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    words = vocabulary(rng)
+    questions = [question(rng, words) for _ in range(args.questions)]
+    index = NearDuplicateIndex(threshold=args.threshold, max_entries=args.questions)
+    start = time.perf_counter()
+    index.add_many((q, f"SELECT {i}") for i, q in enumerate(questions))
+    print(f"{len(index)} questions indexed in {time.perf_counter() - start:.2f} s")
+
+    picks = rng.sample(range(len(index)), min(args.lookups, len(index)))
+    reworded = [reword(index.questions[i], rng) for i in picks]
+    start = time.perf_counter()
+    found = [index.lookup(q) for q in reworded]
+    hit_us = (time.perf_counter() - start) / len(reworded) * 1e6
+    correct = sum(match is not None and match[1] == f"SELECT {i}" for match, i in zip(found, picks))
+
+    unrelated = [question(rng, words) for _ in picks]
+    start = time.perf_counter()
+    false_hits = sum(index.lookup(q) is not None for q in unrelated)
+    miss_us = (time.perf_counter() - start) / len(unrelated) * 1e6
+
+    print(f"reworded lookups   {hit_us:8.0f} us  ({correct}/{len(picks)} found their original)")
+    print(f"new questions      {miss_us:8.0f} us  ({false_hits} false matches)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "near_duplicates.npz")
+        index.save(path)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        NearDuplicateIndex(max_entries=args.questions).load(path)
+        load = time.perf_counter() - start
+    print(f"saved index        {size / 2**20:8.1f} MB  ({size / len(index):.0f} bytes/question), "
+          f"loaded in {load * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: single-process uvicorn vs the multi-worker server mode
+
+Seeds a scratch SQLite database, starts the API once as a single
+``uvicorn app.main:app`` process and once through ``python -m app.server``
+with several workers, and drives both with the same concurrent mix of
+template ``/query`` requests (no Gemini calls) and ``/stats`` reads.
+
+Usage:
+    python -m benchmarks.server_throughput --workers 4 --concurrency 32 --requests 2000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+QUESTIONS = [
+    "How many students are enrolled?",
+    "List all students in grade 10",
+    "List all courses",
+    "What is the total number of enrollments?",
+    "How many students enrolled in Python courses?",
+]
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    """Poll /health until the server answers 200"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def drive(base_url: str, total: int, concurrency: int) -> dict:
+    """Send ``total`` requests with ``concurrency`` client threads"""
+    latencies = []
+    errors = 0
+
+    def one(i: int) -> None:
+        nonlocal errors
+        with httpx.Client(base_url=base_url, timeout=30.0) as client:
+            for j in range(i, total, concurrency):
+                start = time.perf_counter()
+                if j % 5 == 4:
+                    response = client.get("/stats")
+                else:
+                    response = client.post("/query", json={"question": QUESTIONS[j % len(QUESTIONS)]})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "errors": errors,
+    }
+
+
+def run_layout(name: str, command: list, env: dict, port: int, args) -> dict:
+    """Seed a fresh database, start one server layout, benchmark it and stop it"""
+    # /stats cost grows with query_logs, so every layout starts from the same state
+    subprocess.run([sys.executable, "-m", "app.seed"], env=env, check=True, stdout=subprocess.DEVNULL)
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url)
+        drive(base_url, min(200, args.requests), args.concurrency)  # warm up
+        result = drive(base_url, args.requests, args.concurrency)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    print(f"{name:<22} {result['rps']:8.1f} req/s  p50 {result['p50']:7.1f} ms  "
+          f"p95 {result['p95']:7.1f} ms  errors {result['errors']}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, CACHE_WARMUP_ENABLED="false")
+
+        port = free_port()
+        single = run_layout(
+            "single process",
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            dict(env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'single.db')}"), port, args,
+        )
+        port = free_port()
+        multi = run_layout(
+            f"server, {args.workers} workers",
+            [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(args.workers)],
+            dict(env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'server.db')}", QUERY_LOG_BATCHING="true"),
+            port, args,
+        )
+        print(f"Throughput gain: {multi['rps'] / single['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
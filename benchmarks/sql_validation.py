@@ -0,0 +1,88 @@
+"""
+Benchmark: single-pass SQL lexer vs the previous substring validator
+
+Builds long generated-style SELECT queries (many joined columns, CASE
+branches and string literals) and times the previous upper-case + ten
+substring scans check, the lexer on first sight (substring pre-check), the
+full token scan that suspicious SQL takes, and the memoized verdict for SQL
+seen before.
+
+Usage:
+    python -m benchmarks.sql_validation --columns 200 --repeat 2000
+"""
+import argparse
+import time
+
+from app.sql_validation import check_sql, validate_sql
+
+LEGACY_FORBIDDEN = [
+    "DELETE", "DROP", "UPDATE", "INSERT", "ALTER",
+    "CREATE", "TRUNCATE", "REPLACE", "EXEC", "EXECUTE",
+]
+
+
+def legacy_validate(sql: str) -> None:
+    """The validator this module replaced"""
+    sql_upper = sql.upper().strip()
+    if not sql_upper.startswith("SELECT"):
+        raise ValueError("Only SELECT queries are allowed")
+    for keyword in LEGACY_FORBIDDEN:
+        if keyword in sql_upper:
+            raise ValueError(f"Query contains forbidden keyword: {keyword}")
+
+
+def build_query(columns: int, seed: int) -> str:
+    """A long SELECT that both validators accept"""
+    parts = [
+        f"CASE WHEN s.grade = {i % 12} THEN 'Grade {i} student' ELSE c.category END AS col_{seed}_{i}"
+        for i in range(columns)
+    ]
+    return (
+        "SELECT " + ", ".join(parts) +
+        " FROM students s JOIN enrollments e ON e.student_id = s.id JOIN courses c ON c.id = e.course_id"
+        " WHERE c.name LIKE '%Python%' AND strftime('%Y', e.enrolled_at) = '2024' ORDER BY s.name"
+    )
+
+
+def time_per_call(fn, queries) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for sql in queries:
+        fn(sql)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--columns", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    queries = [build_query(args.columns, seed) for seed in range(args.repeat)]
+    print(f"Query length: {len(queries[0])} characters")
+
+    legacy = time_per_call(legacy_validate, queries)
+    lexer = time_per_call(check_sql, queries)
+    # A trailing ";" defeats the substring pre-check and forces the token scan
+    full_scan = time_per_call(check_sql, [sql + ";" for sql in queries])
+    for sql in queries:
+        validate_sql(sql)
+    memoized = time_per_call(validate_sql, queries[-1000:])
+
+    print(f"substring scans : {legacy:10.1f} us/query")
+    print(f"lexer (cold)    : {lexer:10.1f} us/query")
+    print(f"full token scan : {full_scan:10.1f} us/query")
+    print(f"memoized verdict: {memoized:10.1f} us/query")
+
+    false_rejects = ["SELECT updated_at FROM students", "SELECT * FROM courses WHERE name = 'Create Art'"]
+    for sql in false_rejects:
+        try:
+            legacy_validate(sql)
+            legacy_verdict = "accepted"
+        except ValueError as e:
+            legacy_verdict = f"rejected ({e})"
+        print(f"{sql!r}: substring {legacy_verdict}, lexer {check_sql(sql) or 'accepted'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: one shared database vs a database per tenant
+
+- scans: a per-school analytics query over a shared database holding every
+  school's rows vs over one school's own database
+- writes: concurrent writer processes (one per school) logging queries,
+  each commit its own transaction, into the shared file vs their own files
+- registry: cost of opening a tenant and of looking up an open one
+
+Usage:
+    python -m benchmarks.tenancy --tenants 20 --students 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import _configure_sqlite
+from app.models import Base, Course, Enrollment, QueryLog, Student
+from app.tenancy import TenantRegistry
+
+SCAN = text(
+    "SELECT c.category, COUNT(*), AVG(s.grade) FROM enrollments e "
+    "JOIN students s ON s.id = e.student_id JOIN courses c ON c.id = e.course_id "
+    "WHERE s.grade >= 10 GROUP BY c.category"
+)
+
+
+def open_engine(path: str):
+    """Engine on a SQLite file configured like the app's"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _configure_sqlite)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def load_school(engine, rng: random.Random, students: int, offset: int = 0) -> None:
+    """Insert one school's students, courses and enrollments"""
+    with engine.begin() as conn:
+        conn.execute(insert(Course), [
+            {"id": offset + i + 1, "name": f"Course {i}", "category": rng.choice(["Math", "Science", "Arts"])}
+            for i in range(50)
+        ])
+        conn.execute(insert(Student), [
+            {"id": offset + i + 1, "name": f"Student {i}", "grade": rng.randint(9, 12),
+             "created_at": datetime(2024, 1, 1)}
+            for i in range(students)
+        ])
+        conn.execute(insert(Enrollment), [
+            {"student_id": offset + rng.randrange(students) + 1, "course_id": offset + rng.randrange(50) + 1,
+             "enrolled_at": datetime(2024, 2, 1)}
+            for _ in range(students * 3)
+        ])
+
+
+def time_scan(engine, repeat: int = 20) -> float:
+    """Milliseconds per run of the analytics query"""
+    with engine.connect() as conn:
+        conn.execute(SCAN).fetchall()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(SCAN).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def write_logs(path: str, writes: int) -> float:
+    """Log queries one commit at a time (worker process); returns seconds taken"""
+    engine = open_engine(path)
+    session = sessionmaker(bind=engine)()
+    start = time.perf_counter()
+    for i in range(writes):
+        session.add(QueryLog(question=f"q{i}", generated_sql="SELECT 1", execution_time=1))
+        session.commit()
+    elapsed = time.perf_counter() - start
+    session.close()
+    engine.dispose()
+    return elapsed
+
+
+def time_writes(paths: list, writes: int) -> float:
+    """Logged queries per second with one writer process per path"""
+    with ProcessPoolExecutor(len(paths)) as pool:
+        elapsed = list(pool.map(write_logs, paths, [writes] * len(paths)))
+    return len(paths) * writes / max(elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(5)
+    os.environ.setdefault("SQLITE_BUSY_TIMEOUT_MS", "60000")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shared_path = os.path.join(tmp, "shared.db")
+        tenant_paths = [os.path.join(tmp, f"tenant{i}.db") for i in range(args.tenants)]
+        shared = open_engine(shared_path)
+        tenants = [open_engine(path) for path in tenant_paths]
+        for i, engine in enumerate(tenants):
+            load_school(shared, rng, args.students, offset=i * args.students * 10)
+            load_school(engine, rng, args.students)
+
+        shared_ms, tenant_ms = time_scan(shared), time_scan(tenants[0])
+        print(f"scan, shared database   {shared_ms:8.2f} ms  ({args.tenants} schools' rows)")
+        print(f"scan, tenant database   {tenant_ms:8.2f} ms  ({shared_ms / tenant_ms:.1f}x faster)")
+
+        shared_rate = time_writes([shared_path] * args.tenants, args.writes)
+        tenant_rate = time_writes(tenant_paths, args.writes)
+        print(f"writes, shared database {shared_rate:8.0f} logs/s  ({args.tenants} writer processes)")
+        print(f"writes, tenant database {tenant_rate:8.0f} logs/s  ({tenant_rate / shared_rate:.1f}x)")
+
+        for engine in [shared] + tenants:
+            engine.dispose()
+
+        registry = TenantRegistry(
+            f"sqlite:///{tmp}/registry/{{tenant}}.db",
+            lambda tenant_id, session_factory: dict.fromkeys(
+                ("executor", "analytics", "timeseries", "data_version", "ingest")
+            ),
+            max_open=args.tenants,
+            configure_sqlite=_configure_sqlite
+        )
+        start = time.perf_counter()
+        for i in range(args.tenants):
+            registry.get(f"school-{i}")
+        open_ms = (time.perf_counter() - start) / args.tenants * 1000
+        start = time.perf_counter()
+        for i in range(10000):
+            registry.lookup(f"school-{i % args.tenants}")
+        lookup_us = (time.perf_counter() - start) / 10000 * 1e6
+        print(f"registry: open {open_ms:.1f} ms (new database, tables created), lookup {lookup_us:.2f} us")
+        for tenant in registry._open.values():
+            for engine in tenant.engines:
+                getattr(engine, "sync_engine", engine).dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Python client for the EdTech NLP-to-SQL API.
+
+    from edtech_client import EdTechClient
+
+    with EdTechClient("http://localhost:8000", cache=True) as client:
+        answer = client.query("How many students are enrolled?")
+        answers = client.query_many(["List all courses", "Show me students in grade 10"])
+"""
+from edtech_client.cache import ResponseCache
+from edtech_client.client import APIError, AsyncEdTechClient, EdTechClient
+
+__all__ = ["APIError", "AsyncEdTechClient", "EdTechClient", "ResponseCache"]
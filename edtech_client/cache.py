@@ -0,0 +1,113 @@
+"""
+Client-side cache of conditional GET responses.
+
+Responses carrying an ``ETag`` are kept with their validator and freshness
+lifetime (``Cache-Control: max-age``). While fresh, they are served without
+a request; once stale, the request carries ``If-None-Match`` and a 304
+reuses the stored body. ``no-store`` responses are never kept.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import re
+import threading
+import time
+
+_MAX_AGE = re.compile(r"\bmax-age=(\d+)")
+
+
+class CachedResponse:
+    """A stored response body and its validator"""
+    
+    def __init__(self, etag: str, body: Any, expires_at: float):
+        self.etag = etag
+        self.body = body
+        self.expires_at = expires_at
+    
+    def fresh(self, now: Optional[float] = None) -> bool:
+        """Whether the body may be reused without revalidating"""
+        return (time.monotonic() if now is None else now) < self.expires_at
+
+
+class ResponseCache:
+    """LRU cache of ETag-validated response bodies, safe across threads"""
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: Tuple) -> Optional[CachedResponse]:
+        """
+        Look up a stored response
+        
+        Args:
+            key: Request identity, from :meth:`key`
+        
+        Returns:
+            The stored response (possibly stale), or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def store(self, key: Tuple, headers: Dict[str, str], body: Any) -> None:
+        """
+        Keep a 200 response if it is cacheable
+        
+        Args:
+            key: Request identity, from :meth:`key`
+            headers: Response headers (case-insensitive mapping)
+            body: Decoded response body
+        """
+        etag = headers.get("etag")
+        cache_control = headers.get("cache-control", "").lower()
+        if not etag or "no-store" in cache_control:
+            with self._lock:
+                self._entries.pop(key, None)
+            return
+        max_age = _MAX_AGE.search(cache_control)
+        lifetime = int(max_age.group(1)) if max_age and "no-cache" not in cache_control else 0
+        with self._lock:
+            self._entries[key] = CachedResponse(etag, body, time.monotonic() + lifetime)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def refresh(self, key: Tuple, headers: Dict[str, str]) -> Optional[Any]:
+        """
+        Revalidate a stored response after a 304
+        
+        Args:
+            key: Request identity, from :meth:`key`
+            headers: Headers of the 304 response (may renew max-age)
+        
+        Returns:
+            The stored body, or None if it was evicted meanwhile
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        renewed = {"etag": headers.get("etag") or entry.etag, "cache-control": headers.get("cache-control", "")}
+        self.store(key, renewed, entry.body)
+        return entry.body
+    
+    @staticmethod
+    def key(path: str, params: Optional[Dict[str, Any]], scope: Tuple = ()) -> Tuple:
+        """
+        Identity of a GET request
+        
+        Args:
+            path: Request path
+            params: Query parameters
+            scope: Request headers that select a different representation
+                (e.g. the tenant)
+        
+        Returns:
+            Hashable cache key
+        """
+        return (path, tuple(sorted((params or {}).items())), scope)
@@ -0,0 +1,470 @@
+"""
+HTTP clients for the EdTech NLP-to-SQL API.
+
+:class:`EdTechClient` (blocking) and :class:`AsyncEdTechClient` (asyncio)
+share one behaviour:
+
+- one pooled ``httpx`` client per instance: keep-alive connections and
+  timeouts on every call;
+- 429 and 503 responses (and dropped connections) are retried with
+  exponential backoff and jitter, waiting at least ``Retry-After``;
+- :meth:`query_many` sends ``/query/batch`` requests when the server offers
+  that endpoint, else one request per question (concurrently, up to
+  ``max_concurrency``, in the async client);
+- :meth:`iter_export` streams ``/query/export`` without buffering it;
+- with ``cache=True``, ``/query`` and ``/stats`` go through conditional
+  GETs: fresh responses are reused locally and stale ones revalidated
+  with their ETag, so unchanged results come back as empty 304s.
+"""
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple, Union
+import asyncio
+import random
+import time
+
+import httpx
+
+from edtech_client.cache import ResponseCache
+
+# Statuses worth retrying: rate limited, or shedding load
+RETRY_STATUSES = (429, 503)
+
+# Methods safe to resend after a failure, even if the server may have acted
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Transport errors raised before the request reached the server
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class APIError(Exception):
+    """Raised for an error response of the API"""
+    
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _ClientBase:
+    """Settings and request logic shared by the blocking and async clients"""
+    
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        api_key: Optional[str] = None,
+        tenant: Optional[str] = None,
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 30.0,
+        cache: Union[bool, ResponseCache] = False,
+        batch_size: int = 100
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.batch_size = batch_size
+        self.cache = ResponseCache() if cache is True else (cache or None)
+        self.headers = {}
+        if api_key:
+            self.headers["X-API-Key"] = api_key
+        if tenant:
+            self.headers["X-Tenant-ID"] = tenant
+        # Cached bodies depend on who asks (the API key may select the tenant)
+        self._cache_scope = (api_key, tenant)
+        self._paths: Optional[Set[str]] = None
+    
+    def _retry_delay(self, response: Optional[httpx.Response], attempt: int) -> float:
+        """Seconds to wait before retry number ``attempt + 1``"""
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt) * random.uniform(0.5, 1.0)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff_seconds))
+        return delay
+    
+    def _should_retry(self, response: httpx.Response, attempt: int) -> bool:
+        """Whether a response is a retryable refusal and attempts remain"""
+        return response.status_code in RETRY_STATUSES and attempt < self.retries
+    
+    def _should_retry_error(self, method: str, error: httpx.TransportError, attempt: int) -> bool:
+        """
+        Whether a transport error is retryable and attempts remain
+        
+        A POST that failed after connecting (e.g. a read timeout) may
+        already have run and been logged, so only connection failures are
+        retried for it; idempotent methods retry any transport error.
+        """
+        if attempt >= self.retries:
+            return False
+        return method in IDEMPOTENT_METHODS or isinstance(error, UNSENT_ERRORS)
+    
+    @staticmethod
+    def _decode(response: httpx.Response) -> Any:
+        """
+        Decode a JSON response
+        
+        Raises:
+            APIError: For 4xx/5xx responses, with the server's ``detail``
+        """
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise APIError(response.status_code, detail)
+        return response.json()
+    
+    def _conditional(self, path: str, params: Dict[str, Any]) -> Tuple[Tuple, Any, Dict[str, str]]:
+        """
+        Plan a cached GET
+        
+        Returns:
+            (cache key, fresh body or None, extra request headers)
+        """
+        key = ResponseCache.key(path, params, self._cache_scope)
+        entry = self.cache.get(key)
+        if entry is not None and entry.fresh():
+            return key, entry.body, {}
+        return key, None, {"If-None-Match": entry.etag} if entry is not None else {}
+    
+    def _cached_result(self, key: Tuple, response: httpx.Response) -> Any:
+        """Body of a conditional GET response (a 304 reuses the stored one)"""
+        if response.status_code == 304:
+            body = self.cache.refresh(key, response.headers)
+            if body is not None:
+                return body
+            raise APIError(304, "Not modified, but the cached response was evicted")
+        body = self._decode(response)
+        self.cache.store(key, response.headers, body)
+        return body
+    
+    def _chunks(self, questions: List[str]) -> List[List[str]]:
+        """Questions split into batches of at most ``batch_size``"""
+        return [questions[i:i + self.batch_size] for i in range(0, len(questions), self.batch_size)]
+    
+    @staticmethod
+    def _failed(question: str, error: APIError) -> Dict[str, Any]:
+        """Batch-style result slot of a failed question"""
+        return {"question": question, "status_code": error.status_code, "error": str(error.detail)}
+    
+    @staticmethod
+    def _answered(answer: Dict[str, Any]) -> Dict[str, Any]:
+        """Batch-style result slot of an answered question"""
+        return dict(answer, status_code=200, error=None)
+    
+    @staticmethod
+    def _paths_of(response: httpx.Response) -> Set[str]:
+        """Endpoint paths listed in an OpenAPI document (none if unavailable)"""
+        if response.status_code != 200:
+            return set()
+        return set(response.json().get("paths", {}))
+
+
+class EdTechClient(_ClientBase):
+    """
+    Blocking client with a keep-alive connection pool
+    
+    Thread-safe: share one instance between threads. Use it as a context
+    manager, or call :meth:`close`, to release its connections.
+    """
+    
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        max_connections: int = 10,
+        transport: Optional[httpx.BaseTransport] = None,
+        **options
+    ):
+        """
+        Args:
+            base_url: API root URL
+            max_connections: Size of the connection pool
+            transport: Custom httpx transport (e.g. for tests)
+            options: ``api_key``, ``tenant``, ``timeout``, ``retries``,
+                ``backoff_seconds``, ``max_backoff_seconds``, ``cache``
+                (True or a :class:`ResponseCache`) and ``batch_size``
+        """
+        super().__init__(base_url, **options)
+        self._http = httpx.Client(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+    
+    def __enter__(self) -> "EdTechClient":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Close pooled connections"""
+        self._http.close()
+    
+    def query(self, question: str) -> Dict[str, Any]:
+        """
+        Answer a question
+        
+        Args:
+            question: Natural language question
+        
+        Returns:
+            ``question``, ``generated_sql``, ``result`` and ``execution_time_ms``
+        
+        Raises:
+            APIError: If the server refuses or fails the question
+        """
+        if self.cache is not None:
+            return self._get_cached("/query", {"question": question})
+        return self._decode(self._send("POST", "/query", json={"question": question}))
+    
+    def query_many(self, questions: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer several questions, in as few round trips as the server allows
+        
+        Args:
+            questions: Natural language questions
+        
+        Returns:
+            One result per question, in order: the :meth:`query` fields plus
+            ``status_code`` and ``error`` (failed questions do not raise)
+        """
+        if self.offers("/query/batch"):
+            results = []
+            for chunk in self._chunks(questions):
+                results += self._decode(self._send("POST", "/query/batch", json={"questions": chunk}))["results"]
+            return results
+        
+        results = []
+        for question in questions:
+            try:
+                results.append(self._answered(self.query(question)))
+            except APIError as e:
+                results.append(self._failed(question, e))
+        return results
+    
+    def iter_export(
+        self,
+        question: str,
+        format: str = "csv",
+        compression: Optional[str] = None,
+        chunk_size: int = 1 << 16
+    ) -> Iterator[bytes]:
+        """
+        Stream the full result of a question as an export file
+        
+        Args:
+            question: Natural language question
+            format: "csv", "arrow" or "parquet"
+            compression: Codec (see ``POST /query/export``)
+            chunk_size: Bytes per yielded chunk
+        
+        Returns:
+            Iterator of file chunks, read from the network as consumed
+        """
+        body = {"question": question, "format": format, "compression": compression}
+        response = self._send("POST", "/query/export", json=body, stream=True)
+        try:
+            if response.status_code >= 400:
+                response.read()
+                self._decode(response)
+            yield from response.iter_bytes(chunk_size)
+        finally:
+            response.close()
+    
+    def export_to(self, path: str, question: str, format: str = "csv", compression: Optional[str] = None) -> int:
+        """
+        Save the full result of a question to a file
+        
+        Returns:
+            Bytes written
+        """
+        written = 0
+        with open(path, "wb") as f:
+            for chunk in self.iter_export(question, format, compression):
+                f.write(chunk)
+                written += len(chunk)
+        return written
+    
+    def stats(self, window: Optional[str] = None) -> Dict[str, Any]:
+        """Query analytics (``window``: "hour", "day" or "week")"""
+        params = {"window": window} if window else {}
+        if self.cache is not None:
+            return self._get_cached("/stats", params)
+        return self._decode(self._send("GET", "/stats", params=params))
+    
+    def timeseries(self, **params) -> Dict[str, Any]:
+        """Throughput and latency percentiles (``start``, ``end``, ``granularity``)"""
+        return self._decode(self._send("GET", "/stats/timeseries", params=params))
+    
+    def health(self) -> Dict[str, str]:
+        """Check API health"""
+        return self._decode(self._send("GET", "/health"))
+    
+    def offers(self, path: str) -> bool:
+        """Whether the server has an endpoint (from its OpenAPI document, read once)"""
+        if self._paths is None:
+            self._paths = self._paths_of(self._send("GET", "/openapi.json"))
+        return path in self._paths
+    
+    def _get_cached(self, path: str, params: Dict[str, Any]) -> Any:
+        """GET through the response cache"""
+        key, body, headers = self._conditional(path, params)
+        if body is not None:
+            return body
+        return self._cached_result(key, self._send("GET", path, params=params, headers=headers))
+    
+    def _send(self, method: str, path: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """Send a request, retrying refusals and failed connections"""
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = self._http.send(self._http.build_request(method, path, **kwargs), stream=stream)
+            except httpx.TransportError as e:
+                if not self._should_retry_error(method, e, attempt):
+                    raise
+            else:
+                if not self._should_retry(response, attempt):
+                    return response
+                response.close()
+            time.sleep(self._retry_delay(response, attempt))
+        raise AssertionError("unreachable")
+
+
+class AsyncEdTechClient(_ClientBase):
+    """
+    Asyncio client with a keep-alive pool and bounded concurrency
+    
+    At most ``max_concurrency`` requests are in flight at once, however many
+    coroutines share the client, so a large :meth:`query_many` cannot
+    overwhelm the server.
+    """
+    
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        max_concurrency: int = 10,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        **options
+    ):
+        """
+        Args:
+            base_url: API root URL
+            max_concurrency: Requests in flight at once (and pool size)
+            transport: Custom httpx transport (e.g. ``httpx.ASGITransport``)
+            options: As for :class:`EdTechClient`
+        """
+        super().__init__(base_url, **options)
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def __aenter__(self) -> "AsyncEdTechClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def close(self) -> None:
+        """Close pooled connections"""
+        await self._http.aclose()
+    
+    async def query(self, question: str) -> Dict[str, Any]:
+        """Answer a question (see :meth:`EdTechClient.query`)"""
+        if self.cache is not None:
+            return await self._get_cached("/query", {"question": question})
+        return self._decode(await self._send("POST", "/query", json={"question": question}))
+    
+    async def query_many(self, questions: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer several questions concurrently (see :meth:`EdTechClient.query_many`)
+        
+        Batches, or single questions when the server has no batch endpoint,
+        run concurrently up to ``max_concurrency``.
+        """
+        if await self.offers("/query/batch"):
+            async def batch(chunk):
+                return self._decode(await self._send("POST", "/query/batch", json={"questions": chunk}))["results"]
+            
+            return [result for results in await asyncio.gather(*map(batch, self._chunks(questions)))
+                    for result in results]
+        
+        async def one(question):
+            try:
+                return self._answered(await self.query(question))
+            except APIError as e:
+                return self._failed(question, e)
+        
+        return list(await asyncio.gather(*map(one, questions)))
+    
+    async def iter_export(
+        self,
+        question: str,
+        format: str = "csv",
+        compression: Optional[str] = None,
+        chunk_size: int = 1 << 16
+    ) -> AsyncIterator[bytes]:
+        """Stream an export (see :meth:`EdTechClient.iter_export`)"""
+        body = {"question": question, "format": format, "compression": compression}
+        response = await self._send("POST", "/query/export", json=body, stream=True)
+        try:
+            if response.status_code >= 400:
+                await response.aread()
+                self._decode(response)
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+    
+    async def stats(self, window: Optional[str] = None) -> Dict[str, Any]:
+        """Query analytics (see :meth:`EdTechClient.stats`)"""
+        params = {"window": window} if window else {}
+        if self.cache is not None:
+            return await self._get_cached("/stats", params)
+        return self._decode(await self._send("GET", "/stats", params=params))
+    
+    async def timeseries(self, **params) -> Dict[str, Any]:
+        """Throughput and latency percentiles (``start``, ``end``, ``granularity``)"""
+        return self._decode(await self._send("GET", "/stats/timeseries", params=params))
+    
+    async def health(self) -> Dict[str, str]:
+        """Check API health"""
+        return self._decode(await self._send("GET", "/health"))
+    
+    async def offers(self, path: str) -> bool:
+        """Whether the server has an endpoint (from its OpenAPI document, read once)"""
+        if self._paths is None:
+            self._paths = self._paths_of(await self._send("GET", "/openapi.json"))
+        return path in self._paths
+    
+    async def _get_cached(self, path: str, params: Dict[str, Any]) -> Any:
+        """GET through the response cache"""
+        key, body, headers = self._conditional(path, params)
+        if body is not None:
+            return body
+        return self._cached_result(key, await self._send("GET", path, params=params, headers=headers))
+    
+    async def _send(self, method: str, path: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """Send a request within the concurrency limit, retrying refusals"""
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                async with self._semaphore:
+                    response = await self._http.send(self._http.build_request(method, path, **kwargs), stream=stream)
+            except httpx.TransportError as e:
+                if not self._should_retry_error(method, e, attempt):
+                    raise
+            else:
+                if not self._should_retry(response, attempt):
+                    return response
+                await response.aclose()
+            await asyncio.sleep(self._retry_delay(response, attempt))
+        raise AssertionError("unreachable")
@@ -1,58 +1,23 @@
 """
 Example script demonstrating how to use the EdTech NLP-to-SQL API
 """
-import requests
 import json
-from typing import Dict, Any
 
-
-class EdTechAPIClient:
-    """Client for interacting with the EdTech NLP-to-SQL API"""
-    
-    def __init__(self, base_url: str = "http://localhost:8000"):
-        self.base_url = base_url
-    
-    def query(self, question: str) -> Dict[str, Any]:
-        """
-        Send a natural language query to the API
-        
-        Args:
-            question: Natural language question
-            
-        Returns:
-            Response containing SQL, result, and execution time
-        """
-        response = requests.post(
-            f"{self.base_url}/query",
-            json={"question": question}
-        )
-        response.raise_for_status()
-        return response.json()
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """Get analytics statistics"""
-        response = requests.get(f"{self.base_url}/stats")
-        response.raise_for_status()
-        return response.json()
-    
-    def health_check(self) -> Dict[str, str]:
-        """Check API health"""
-        response = requests.get(f"{self.base_url}/health")
-        response.raise_for_status()
-        return response.json()
+from edtech_client import APIError, EdTechClient
 
 
 def main():
     """Main function demonstrating API usage"""
     
-    # Initialize client
-    client = EdTechAPIClient()
+    # Initialize client: pooled keep-alive connections, retries on 429/503,
+    # ETag-validated caching of repeated questions
+    client = EdTechClient("http://localhost:8000", cache=True)
     
     # Check health
     print("=" * 60)
     print("Health Check")
     print("=" * 60)
-    health = client.health_check()
+    health = client.health()
     print(f"Status: {health['status']}")
     print()
     
@@ -69,23 +34,22 @@ def main():
     print("Example Queries")
     print("=" * 60)
     
-    for i, question in enumerate(questions, 1):
-        print(f"\n[Query {i}] {question}")
+    # One round trip per batch when the server offers /query/batch
+    answers = client.query_many(questions)
+    
+    for i, result in enumerate(answers, 1):
+        print(f"\n[Query {i}] {result['question']}")
         print("-" * 60)
         
-        try:
-            result = client.query(question)
-            
-            print(f"Generated SQL:")
-            print(f"  {result['generated_sql']}")
-            print(f"\nResult:")
-            print(f"  {json.dumps(result['result'], indent=2)}")
-            print(f"\nExecution Time: {result['execution_time_ms']} ms")
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error: {e}")
-        except Exception as e:
-            print(f"Unexpected error: {e}")
+        if result["error"]:
+            print(f"Error ({result['status_code']}): {result['error']}")
+            continue
+        
+        print(f"Generated SQL:")
+        print(f"  {result['generated_sql']}")
+        print(f"\nResult:")
+        print(f"  {json.dumps(result['result'], indent=2)}")
+        print(f"\nExecution Time: {result['execution_time_ms']} ms")
     
     # Get statistics
     print("\n" + "=" * 60)
@@ -93,7 +57,7 @@ def main():
     print("=" * 60)
     
     try:
-        stats = client.get_stats()
+        stats = client.stats()
         
         print(f"\nTotal Queries: {stats['total_queries']}")
         
@@ -107,10 +71,11 @@ def main():
             print(f"  SQL: {stats['slowest_query']['generated_sql']}")
             print(f"  Execution Time: {stats['slowest_query']['execution_time_ms']} ms")
         
-    except requests.exceptions.RequestException as e:
+    except APIError as e:
         print(f"Error getting stats: {e}")
     
     print("\n" + "=" * 60)
+    client.close()
 
 
 if __name__ == "__main__":
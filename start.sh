@@ -3,5 +3,5 @@
 # Initialize and seed database on first run
 python -m app.seed
 
-# Start the application
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+# Start the application (one worker per CPU unless WEB_WORKERS is set)
+exec python -m app.server --host 0.0.0.0 --port 8000
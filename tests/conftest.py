@@ -1,9 +1,22 @@
+import os
 import pytest
+
+# Keep startup cache warm-up away from the real database during tests
+os.environ.setdefault("CACHE_WARMUP_ENABLED", "false")
+# ...and the near-duplicate index off disk
+os.environ.setdefault("NEAR_DUPLICATE_INDEX_PATH", "")
+# ...and /ingest registered, behind a known token
+os.environ.setdefault("INGEST_ENABLED", "true")
+os.environ.setdefault("INGEST_TOKEN", "test-ingest-token")
+INGEST_HEADERS = {"X-Ingest-Token": "test-ingest-token"}
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from app.models import Base
-from app.database import get_db
-from app.main import app
+from app.database import get_db, get_async_db, get_session_factory
+from app.main import app, data_version
 from fastapi.testclient import TestClient
 
 # Create test database
@@ -11,6 +24,10 @@ TEST_DATABASE_URL = "sqlite:///./test_edtech.db"
 test_engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
 TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
+# Async engine on the same file; NullPool because each TestClient runs its own event loop
+test_async_engine = create_async_engine("sqlite+aiosqlite:///./test_edtech.db", poolclass=NullPool)
+TestAsyncSessionLocal = async_sessionmaker(test_async_engine, autoflush=False, expire_on_commit=False)
+
 
 @pytest.fixture(scope="function")
 def test_db():
@@ -25,7 +42,14 @@ def test_db():
 
 
 @pytest.fixture(scope="function")
-def client(test_db):
+async def async_db(test_db):
+    """Async session on the test database"""
+    async with TestAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(scope="function")
+def client(test_db, monkeypatch):
     """Create test client with test database"""
     def override_get_db():
         try:
@@ -33,7 +57,16 @@ def client(test_db):
         finally:
             pass
     
+    async def override_get_async_db():
+        async with TestAsyncSessionLocal() as db:
+            yield db
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_session_factory] = lambda: TestSessionLocal
+    # Data version (ETags, result cache keys) read from the test database, uncached
+    monkeypatch.setattr(data_version, "session_factory", TestSessionLocal)
+    monkeypatch.setattr(data_version, "ttl_seconds", 0)
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
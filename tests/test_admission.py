@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.admission import (
+    AdmissionController, AdmissionMiddleware, AdmissionRejected, ConcurrencyGate, RateLimiter, TokenBucket
+)
+
+
+def make_app(controller, api_keys=("noisy", "quiet")):
+    """Minimal app behind the admission middleware"""
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller, api_keys=api_keys)
+    
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+    
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+    
+    return app
+
+
+class TestTokenBucket:
+    """Test cases for token buckets"""
+    
+    def test_burst_then_refill(self):
+        """Test that a bucket allows its burst and then refills at its rate"""
+        bucket = TokenBucket(rate=2, burst=3)
+        now = bucket.updated
+        
+        assert [bucket.take(now) for _ in range(3)] == [0, 0, 0]
+        assert bucket.take(now) == pytest.approx(0.5)
+        assert bucket.take(now + 0.5) == 0
+    
+    def test_zero_rate_has_finite_retry_after(self):
+        """Test that a bucket that never refills still yields a valid Retry-After"""
+        bucket = TokenBucket(rate=0, burst=1)
+        bucket.take()
+        wait = bucket.take()
+        assert wait == float("inf")
+        assert AdmissionRejected(429, wait, "Rate limit exceeded").headers == {"Retry-After": "3600"}
+    
+    def test_rate_limiter_is_per_client_and_bounded(self):
+        """Test that clients have separate buckets and old ones are forgotten"""
+        limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+        
+        assert limiter.check("a", 0) == 0
+        assert limiter.check("a", 0) > 0
+        assert limiter.check("b", 0) == 0
+        limiter.check("c", 0)
+        assert len(limiter._buckets) == 2
+
+
+class TestConcurrencyGate:
+    """Test cases for SLO-based load shedding"""
+    
+    async def test_sheds_when_wait_exceeds_slo(self):
+        """Test that arrivals are refused once the estimated wait exceeds the SLO"""
+        gate = ConcurrencyGate(limit=2, slo_seconds=1.0, initial_service_seconds=1.0)
+        release = asyncio.Event()
+        
+        async def hold():
+            async with gate.slot():
+                await release.wait()
+        
+        holders = [asyncio.create_task(hold()) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert gate.in_flight == 2 and gate.waiting == 1
+        
+        # Two requests ahead of the next arrival: 2 * 1.0s / 2 slots = 1.0s, within the SLO
+        gate.admit("test")
+        gate.waiting += 1
+        with pytest.raises(AdmissionRejected) as rejected:
+            gate.admit("test")
+        gate.waiting -= 1
+        
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers == {"Retry-After": "2"}
+        release.set()
+        await asyncio.gather(*holders)
+        assert gate.in_flight == 0
+
+
+class TestAdmissionMiddleware:
+    """Test cases for the admission middleware"""
+    
+    def test_rate_limit_per_api_key(self):
+        """Test that a client over its rate gets 429 with Retry-After"""
+        client = TestClient(make_app(AdmissionController(rate_per_second=0.5, burst=2)))
+        
+        statuses = [client.get("/ping", headers={"X-API-Key": "noisy"}).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        
+        response = client.get("/ping", headers={"X-API-Key": "noisy"})
+        assert response.headers["Retry-After"] == "2"
+        assert client.get("/ping", headers={"X-API-Key": "quiet"}).status_code == 200
+        assert client.get("/health", headers={"X-API-Key": "noisy"}).status_code == 200
+    
+    def test_unknown_api_keys_share_the_ip_bucket(self):
+        """Test that rotating made-up keys does not get a fresh burst"""
+        client = TestClient(make_app(AdmissionController(rate_per_second=0.5, burst=2)))
+        
+        statuses = [client.get("/ping", headers={"X-API-Key": f"random-{i}"}).status_code for i in range(3)]
+        assert statuses == [200, 200, 429]
+        assert client.get("/ping", headers={"X-API-Key": "quiet"}).status_code == 200
+    
+    def test_disabled_controller_admits_everything(self):
+        """Test that a disabled controller never rejects"""
+        client = TestClient(make_app(AdmissionController(enabled=False, rate_per_second=0.1, burst=1)))
+        assert all(client.get("/ping").status_code == 200 for _ in range(5))
+
+
+class TestQueryAdmission:
+    """Test cases for LLM-path admission on /query"""
+    
+    def test_llm_rate_limit_spares_template_questions(self, client, monkeypatch):
+        """Test that only questions needing the LLM count against the LLM limit"""
+        from app import main
+        from app.nlp2sql import NLP2SQLService
+        
+        monkeypatch.setattr(main.admission, "llm_requests", RateLimiter(rate=0.01, burst=1))
+        monkeypatch.setattr(NLP2SQLService, "_generate_with_llm", lambda self, question: "SELECT 1")
+        
+        assert client.post("/query", json={"question": "Something new"}).status_code == 200
+        response = client.post("/query", json={"question": "Something else new"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 1
+        
+        # Template questions never reach the LLM gate
+        assert client.post("/query", json={"question": "List all courses"}).status_code == 200
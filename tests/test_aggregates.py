@@ -0,0 +1,136 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import text
+from app.models import Student, Course, Enrollment, CourseEnrollmentRollup, CategoryGradeRollup
+from app.aggregates import AggregateRewriter, refresh_aggregates
+from app.sql_executor import SQLExecutor
+
+
+TOP_COURSE_SQL = (
+    "SELECT c.name, COUNT(e.id) as enrollment_count FROM courses c "
+    "JOIN enrollments e ON c.id = e.course_id GROUP BY c.id "
+    "ORDER BY enrollment_count DESC LIMIT 1"
+)
+
+
+@pytest.fixture
+def catalog(test_db):
+    """Two courses, three students, four enrollments"""
+    test_db.add_all([
+        Student(id=1, name="Alice", grade=10),
+        Student(id=2, name="Bob", grade=11),
+        Student(id=3, name="Cara", grade=10),
+        Course(id=1, name="Python Programming", category="Programming"),
+        Course(id=2, name="Data Science", category="Data Science"),
+    ])
+    test_db.flush()
+    test_db.add_all([
+        Enrollment(student_id=1, course_id=1, enrolled_at=datetime(2024, 1, 5)),
+        Enrollment(student_id=2, course_id=1, enrolled_at=datetime(2024, 2, 5)),
+        Enrollment(student_id=3, course_id=1, enrolled_at=datetime(2023, 3, 5)),
+        Enrollment(student_id=1, course_id=2, enrolled_at=datetime(2024, 4, 5)),
+    ])
+    test_db.commit()
+    return test_db
+
+
+def rollup_counts(db):
+    return {
+        (r.course_id, r.year): r.enrollment_count
+        for r in db.query(CourseEnrollmentRollup).all()
+    }
+
+
+class TestAggregates:
+    """Test cases for materialized enrollment rollups"""
+    
+    def test_triggers_maintain_counts_on_insert(self, catalog):
+        """Test that inserts are counted per course/year and category/grade"""
+        assert rollup_counts(catalog) == {(1, "2024"): 2, (1, "2023"): 1, (2, "2024"): 1}
+        
+        programming_grade_10 = catalog.query(CategoryGradeRollup).filter_by(
+            category="Programming", grade=10
+        ).one()
+        assert programming_grade_10.enrollment_count == 2
+    
+    def test_triggers_follow_updates_and_deletes(self, catalog):
+        """Test that moved and removed enrollments adjust the rollups"""
+        enrollment = catalog.query(Enrollment).filter_by(student_id=3).one()
+        enrollment.course_id = 2
+        catalog.commit()
+        assert rollup_counts(catalog)[(1, "2023")] == 0
+        assert rollup_counts(catalog)[(2, "2023")] == 1
+        
+        catalog.delete(enrollment)
+        catalog.commit()
+        assert rollup_counts(catalog)[(2, "2023")] == 0
+    
+    def test_category_change_moves_counts(self, catalog):
+        """Test that recategorising a course moves its enrollments"""
+        course = catalog.get(Course, 2)
+        course.category = "Programming"
+        catalog.commit()
+        
+        counts = {
+            (r.category, r.grade): r.enrollment_count
+            for r in catalog.query(CategoryGradeRollup).all()
+        }
+        assert counts[("Data Science", 10)] == 0
+        assert counts[("Programming", 10)] == 3
+    
+    def test_refresh_matches_incremental(self, catalog):
+        """Test that a full refresh yields the same rollups"""
+        before = rollup_counts(catalog)
+        refresh_aggregates(catalog)
+        catalog.commit()
+        assert rollup_counts(catalog) == before
+    
+    def test_rewrite_top_course(self):
+        """Test that the most-enrollments pattern is rewritten"""
+        rewritten = AggregateRewriter().rewrite(TOP_COURSE_SQL)
+        assert "course_enrollment_rollups" in rewritten
+        assert "LIMIT 1" in rewritten
+    
+    def test_rewrite_leaves_other_queries(self):
+        """Test that unrelated queries are passed through unchanged"""
+        sql = "SELECT id, name, grade FROM students WHERE grade = 10"
+        assert AggregateRewriter().rewrite(sql) == sql
+    
+    @pytest.mark.parametrize("sql", [
+        TOP_COURSE_SQL,
+        "SELECT COUNT(*) FROM enrollments",
+        "SELECT COUNT(*) FROM enrollments WHERE strftime('%Y', enrolled_at) = '2024'",
+        "SELECT c.category, COUNT(*) AS total FROM enrollments e JOIN courses c "
+        "ON e.course_id = c.id GROUP BY c.category ORDER BY total DESC",
+    ])
+    def test_rewritten_results_match(self, catalog, sql):
+        """Test that rollup answers equal the raw aggregation"""
+        rewritten = AggregateRewriter().rewrite(sql)
+        assert rewritten != sql
+        
+        raw = [tuple(r) for r in catalog.execute(text(sql)).fetchall()]
+        rolled = [tuple(r) for r in catalog.execute(text(rewritten)).fetchall()]
+        assert rolled == raw
+    
+    def test_group_by_name_merges_same_named_courses(self, catalog):
+        """Test that GROUP BY c.name keeps counting same-named courses together"""
+        catalog.add_all([Course(id=3, name="Python", category="Programming"),
+                         Course(id=4, name="Python", category="Programming")])
+        catalog.flush()
+        catalog.add_all([Enrollment(student_id=2, course_id=3, enrolled_at=datetime(2024, 1, 1)),
+                         Enrollment(student_id=3, course_id=4, enrolled_at=datetime(2024, 1, 1))])
+        catalog.commit()
+        sql = (
+            "SELECT c.name, COUNT(e.id) as enrollment_count FROM courses c "
+            "JOIN enrollments e ON c.id = e.course_id GROUP BY c.name ORDER BY enrollment_count ASC"
+        )
+        rewritten = AggregateRewriter().rewrite(sql)
+        assert "GROUP BY c.name" in rewritten
+        raw = [tuple(r) for r in catalog.execute(text(sql)).fetchall()]
+        assert [tuple(r) for r in catalog.execute(text(rewritten)).fetchall()] == raw
+        assert ("Python", 2) in raw
+    
+    def test_executor_uses_rollups(self, catalog):
+        """Test that the executor answers from the rollups"""
+        result, _ = SQLExecutor().execute_query(catalog, TOP_COURSE_SQL, "Which course has most enrollments?")
+        assert result == [{"name": "Python Programming", "enrollment_count": 3}]
@@ -103,3 +103,73 @@ class TestAnalytics:
         
         assert stats["slowest_query"]["question"] == "Slow query"
         assert stats["slowest_query"]["execution_time_ms"] == 500
+    
+    def test_windowed_keywords(self, test_db):
+        """Test keyword trends restricted to a recent window"""
+        from datetime import timedelta
+        
+        now = datetime.utcnow()
+        test_db.add_all([
+            QueryLog(
+                question="List python courses",
+                generated_sql="SELECT 1",
+                execution_time=10,
+                created_at=now - timedelta(days=2)
+            ),
+            QueryLog(
+                question="List grade students",
+                generated_sql="SELECT 1",
+                execution_time=10,
+                created_at=now - timedelta(minutes=5)
+            )
+        ])
+        test_db.commit()
+        
+        service = AnalyticsService()
+        hour = [k["keyword"] for k in service.get_stats(test_db, window="hour")["most_common_keywords"]]
+        week = [k["keyword"] for k in service.get_stats(test_db, window="week")["most_common_keywords"]]
+        
+        assert "students" in hour and "python" not in hour
+        assert "python" in week
+        
+        # Questions logged since, by any worker, are caught up from the log
+        test_db.add(QueryLog(question="Top enrolled courses", generated_sql="SELECT 1", execution_time=10, created_at=now))
+        test_db.commit()
+        hour = service.get_stats(test_db, window="hour")["most_common_keywords"]
+        assert {"keyword": "enrolled", "count": 1} in hour
+        assert {"keyword": "students", "count": 1} in hour
+    
+    def test_windowed_keywords_skip_old_history(self, test_db):
+        """Test that a first window with no recent rows does not replay older history later"""
+        from datetime import timedelta
+        
+        now = datetime.utcnow()
+        test_db.add(QueryLog(question="List python courses", generated_sql="SELECT 1", execution_time=10,
+                             created_at=now - timedelta(days=30)))
+        test_db.commit()
+        
+        service = AnalyticsService()
+        fed = []
+        add = service.trends.add
+        service.trends.add = lambda words, timestamp=None: fed.append(words) or add(words, timestamp)
+        assert service.get_stats(test_db, window="week")["most_common_keywords"] == []
+        test_db.add(QueryLog(question="List grade students", generated_sql="SELECT 1", execution_time=10, created_at=now))
+        test_db.commit()
+        week = [k["keyword"] for k in service.get_stats(test_db, window="week")["most_common_keywords"]]
+        assert "students" in week
+        assert fed == [["list", "grade", "students"]]
+    
+    async def test_get_stats_async_matches_sync(self, test_db, async_db):
+        """Test that the async stats path returns the same data"""
+        test_db.add_all([
+            QueryLog(question="How many python students?", generated_sql="SELECT 1", execution_time=30),
+            QueryLog(question="List python courses", generated_sql="SELECT 2", execution_time=90)
+        ])
+        test_db.commit()
+        
+        service = AnalyticsService()
+        stats = await service.get_stats_async(async_db)
+        
+        assert stats == service.get_stats(test_db)
+        assert stats["total_queries"] == 2
+        assert stats["slowest_query"]["generated_sql"] == "SELECT 2"
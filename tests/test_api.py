@@ -88,3 +88,29 @@ class TestAPIEndpoints:
         assert response.status_code == 200
         data = response.json()
         assert data["total_queries"] == 1
+    
+    def test_stats_window_parameter(self, client):
+        """Test stats endpoint with a keyword window"""
+        response = client.get("/stats?window=day")
+        assert response.status_code == 200
+        assert response.json()["window"] == "day"
+        
+        response = client.get("/stats?window=month")
+        assert response.status_code == 422
+    
+    def test_query_endpoint_template_question(self, client, test_db):
+        """Test the async /query path end to end with a template question"""
+        from app.models import QueryLog
+        
+        test_db.add_all([
+            Student(name="Ann", grade=10, created_at=datetime.now()),
+            Student(name="Ben", grade=11, created_at=datetime.now())
+        ])
+        test_db.commit()
+        
+        response = client.post("/query", json={"question": "List all students in grade 10"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["generated_sql"] == "SELECT id, name, grade FROM students WHERE grade = 10"
+        assert [row["name"] for row in data["result"]] == ["Ann"]
+        assert test_db.query(QueryLog).count() == 1
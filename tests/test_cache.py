@@ -0,0 +1,125 @@
+import fnmatch
+import time
+import pytest
+from app.cache import LRUCache, SQLiteCache, RedisCache, NamespacedCache, schema_version
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py client API used by RedisCache"""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def _alive(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            return None
+        return value
+    
+    def get(self, key):
+        return self._alive(key)
+    
+    def mget(self, keys):
+        return [self._alive(key) for key in keys]
+    
+    def set(self, key, value, px=None):
+        self.data[key] = (value.encode(), time.time() + px / 1000 if px else None)
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+    
+    def scan_iter(self, match="*", count=None):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+    
+    def pipeline(self):
+        client = self
+        
+        class Pipeline:
+            def __init__(self):
+                self.ops = []
+            
+            def set(self, *args, **kwargs):
+                self.ops.append((args, kwargs))
+            
+            def execute(self):
+                for args, kwargs in self.ops:
+                    client.set(*args, **kwargs)
+        
+        return Pipeline()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    """Each cache backend"""
+    if request.param == "memory":
+        return LRUCache(maxsize=100)
+    if request.param == "sqlite":
+        return SQLiteCache(str(tmp_path / "cache.db"))
+    return RedisCache(FakeRedis())
+
+
+class TestCacheBackends:
+    """Test cases shared by all cache backends"""
+    
+    def test_get_set_delete(self, backend):
+        """Test basic operations"""
+        backend.set("a", {"rows": [1, 2]})
+        assert backend.get("a") == {"rows": [1, 2]}
+        assert backend.get("missing", "default") == "default"
+        
+        backend.delete("a")
+        assert backend.get("a") is None
+    
+    def test_bulk_get_set(self, backend):
+        """Test bulk operations"""
+        backend.set_many({"a": 1, "b": [2], "c": "three"})
+        assert backend.get_many(["a", "b", "c", "d"]) == {"a": 1, "b": [2], "c": "three"}
+    
+    def test_ttl_expiry(self, backend):
+        """Test that entries expire after their TTL"""
+        backend.set("short", 1, ttl_seconds=0.05)
+        backend.set("long", 2, ttl_seconds=60)
+        time.sleep(0.1)
+        
+        assert backend.get("short") is None
+        assert backend.get("long") == 2
+    
+    def test_namespaces_are_isolated(self, backend):
+        """Test that namespaces never see each other's keys"""
+        v1 = NamespacedCache(backend, "edtech:v1:sql")
+        v2 = NamespacedCache(backend, "edtech:v2:sql")
+        v1.set("how many students", "SELECT COUNT(*) FROM students")
+        
+        assert v2.get("how many students") is None
+        assert v1.get_many(["how many students"]) == {"how many students": "SELECT COUNT(*) FROM students"}
+        
+        v1.clear()
+        assert v1.get("how many students") is None
+
+
+class TestCacheSharing:
+    """Test cases for cross-worker sharing"""
+    
+    def test_sqlite_cache_shared_between_instances(self, tmp_path):
+        """Test that two workers on a host see each other's entries"""
+        path = str(tmp_path / "cache.db")
+        SQLiteCache(path).set("k", "v")
+        assert SQLiteCache(path).get("k") == "v"
+    
+    def test_lru_eviction(self):
+        """Test least recently used eviction"""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+    
+    def test_schema_version_is_stable(self):
+        """Test that the schema fingerprint is deterministic"""
+        assert schema_version() == schema_version()
+        assert len(schema_version()) == 12
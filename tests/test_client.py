@@ -0,0 +1,129 @@
+import json
+import httpx
+import pytest
+from app.main import app
+from edtech_client import APIError, AsyncEdTechClient, EdTechClient
+
+
+def mock_client(handler, **options):
+    """Blocking client answered by a request handler function"""
+    return EdTechClient("http://api", transport=httpx.MockTransport(handler), backoff_seconds=0, **options)
+
+
+class TestRetries:
+    """Test cases for retrying refused requests"""
+    
+    def test_retries_429_and_503(self):
+        """Test that refusals are retried until a response succeeds"""
+        statuses = [429, 503, 200]
+        
+        def handler(request):
+            status = statuses.pop(0)
+            return httpx.Response(status, json={"status": "healthy"}, headers={"Retry-After": "0"})
+        
+        assert mock_client(handler).health() == {"status": "healthy"}
+        assert statuses == []
+    
+    def test_gives_up_after_retries(self):
+        """Test that the last refusal is raised with the server's detail"""
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(429, json={"detail": "Rate limit exceeded"})
+        
+        with pytest.raises(APIError) as error:
+            mock_client(handler, retries=2).health()
+        assert error.value.status_code == 429 and error.value.detail == "Rate limit exceeded"
+        assert len(calls) == 3
+    
+    def test_post_retries_only_connection_failures(self):
+        """Test that a POST is not resent once it may have reached the server"""
+        failures = [httpx.ConnectError("refused"), httpx.ReadTimeout("slow")]
+        calls = []
+        
+        def handler(request):
+            calls.append(request.method)
+            if failures:
+                raise failures.pop(0)
+            return httpx.Response(200, json={"status": "healthy"})
+        
+        with pytest.raises(httpx.ReadTimeout):
+            mock_client(handler).query("How many students are enrolled?")
+        assert calls == ["POST", "POST"]
+        
+        # GET is idempotent: read timeouts are retried too
+        failures[:] = [httpx.ReadTimeout("slow")]
+        assert mock_client(handler).health() == {"status": "healthy"}
+        assert calls[2:] == ["GET", "GET"]
+
+
+class TestResponseCache:
+    """Test cases for ETag-validated client caching"""
+    
+    def test_revalidates_with_etag(self):
+        """Test that a stale entry is revalidated and a 304 reuses its body"""
+        seen = []
+        
+        def handler(request):
+            seen.append(request.headers.get("if-none-match"))
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+            return httpx.Response(200, json={"total_queries": 3}, headers={"ETag": '"v1"', "Cache-Control": "no-cache"})
+        
+        client = mock_client(handler, cache=True)
+        assert client.stats() == {"total_queries": 3}
+        assert client.stats() == {"total_queries": 3}
+        assert seen == [None, '"v1"']
+    
+    def test_fresh_and_no_store(self):
+        """Test that max-age responses are reused and no-store ones never kept"""
+        calls = []
+        
+        def handler(request):
+            calls.append(request.url.path)
+            cache_control = "max-age=60" if request.url.path == "/stats" else "no-store"
+            return httpx.Response(200, json={"ok": True}, headers={"ETag": '"a"', "Cache-Control": cache_control})
+        
+        client = mock_client(handler, cache=True)
+        client.stats()
+        client.stats()
+        client.query("Pick a student at random")
+        client.query("Pick a student at random")
+        assert calls == ["/stats", "/query", "/query"]
+
+
+class TestBatching:
+    """Test cases for batched questions"""
+    
+    def test_falls_back_without_batch_endpoint(self):
+        """Test one request per question when the server has no /query/batch"""
+        def handler(request):
+            if request.url.path == "/openapi.json":
+                return httpx.Response(200, json={"paths": {"/query": {}}})
+            question = json.loads(request.content)["question"]
+            if question == "bad":
+                return httpx.Response(400, json={"detail": "Only SELECT queries are allowed"})
+            return httpx.Response(200, json={"question": question, "generated_sql": "SELECT 1", "result": 1,
+                                             "execution_time_ms": 1})
+        
+        results = mock_client(handler).query_many(["good", "bad"])
+        assert [r["status_code"] for r in results] == [200, 400]
+        assert results[0]["result"] == 1 and results[1]["error"] == "Only SELECT queries are allowed"
+    
+    async def test_async_client_uses_batch_endpoint(self, client):
+        """Test that the async client batches questions against the real app"""
+        transport = httpx.ASGITransport(app=app)
+        async with AsyncEdTechClient("http://api", transport=transport, batch_size=2, max_concurrency=2) as sdk:
+            questions = ["How many students are enrolled?", "Which teacher is the happiest?", "List all students"]
+            results = await sdk.query_many(questions)
+        
+        assert [r["question"] for r in results] == questions
+        # No LLM is configured in tests: the middle question fails in its own slot
+        assert [r["status_code"] for r in results] == [200, 500, 200]
+        assert results[0]["result"] == 0
+    
+    def test_batch_limit(self, client):
+        """Test that oversized batches are refused"""
+        response = client.post("/query/batch", json={"questions": ["How many students are enrolled?"] * 101})
+        assert response.status_code == 400
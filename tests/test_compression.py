@@ -0,0 +1,121 @@
+import asyncio
+import gzip
+import json
+import zlib
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from app.compression import CompressionMiddleware, negotiate_encoding
+
+ROWS = [{"id": i, "name": f"Student {i}", "grade": 9 + i % 4} for i in range(200)]
+
+
+def compressed_app(**options):
+    """Small app behind the compression middleware"""
+    app = FastAPI()
+    
+    @app.get("/rows")
+    def rows(limit: int = 200):
+        return JSONResponse(ROWS[:limit], headers={"ETag": '"rows"'})
+    
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((json.dumps(row) + "\n" for row in ROWS), media_type="application/x-ndjson")
+    
+    @app.get("/gzipped")
+    def gzipped():
+        body = gzip.compress(json.dumps(ROWS).encode())
+        return Response(body, media_type="text/csv", headers={"Cache-Control": "no-transform"})
+    
+    return CompressionMiddleware(app, **options)
+
+
+async def call(app, path: str, accept_encoding: str):
+    """Run one GET through an ASGI app and collect the messages it sends"""
+    scope = {
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())], "http_version": "1.1",
+        "scheme": "http", "server": ("test", 80), "client": ("127.0.0.1", 1), "root_path": "",
+    }
+    messages = []
+    requested = []
+    
+    async def receive():
+        if requested:
+            await asyncio.Event().wait()  # the client never disconnects
+        requested.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    await app(scope, receive, send)
+    return messages
+
+
+class TestNegotiation:
+    """Test cases for Accept-Encoding negotiation"""
+    
+    def test_negotiate_encoding(self):
+        """Test q-values, wildcards and the server's preference on ties"""
+        available = ("zstd", "gzip")
+        assert negotiate_encoding("gzip, deflate, br, zstd", available) == "zstd"
+        assert negotiate_encoding("gzip, zstd;q=0.5", available) == "gzip"
+        assert negotiate_encoding("zstd;q=0, *", available) == "gzip"
+        assert negotiate_encoding("br, identity", available) is None
+        assert negotiate_encoding(None, available) is None
+
+
+class TestCompressionMiddleware:
+    """Test cases for response compression"""
+    
+    def test_large_json_is_gzipped(self):
+        """Test that a large JSON body is gzipped, with weak ETag and Vary"""
+        client = TestClient(compressed_app(encodings=("gzip",)))
+        response = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"rows"'
+        assert response.json() == ROWS
+        assert int(response.headers["content-length"]) < len(json.dumps(ROWS)) / 4
+    
+    def test_small_and_unaccepted_responses_pass_through(self):
+        """Test the size threshold and clients without a shared encoding"""
+        client = TestClient(compressed_app(min_size=1024))
+        small = client.get("/rows?limit=2", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
+        assert small.headers["vary"] == "Accept-Encoding"
+        assert small.json() == ROWS[:2]
+        
+        identity = client.get("/rows", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in identity.headers
+        assert identity.headers["etag"] == '"rows"'
+    
+    def test_precompressed_body_is_untouched(self):
+        """Test that no-transform responses are not compressed twice"""
+        response = TestClient(compressed_app()).get("/gzipped", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert json.loads(gzip.decompress(response.content)) == ROWS
+    
+    async def test_stream_is_compressed_chunk_by_chunk(self):
+        """Test that each streamed chunk can be decoded as soon as it arrives"""
+        messages = await call(compressed_app(encodings=("gzip",), min_size=256), "/stream", "gzip")
+        headers = dict(messages[0]["headers"])
+        assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+        
+        decoder = zlib.decompressobj(31)
+        chunks = [m for m in messages[1:] if m.get("body")]
+        assert len(chunks) > 10
+        for chunk in chunks[:-1]:
+            assert decoder.decompress(chunk["body"]).endswith(b"\n")
+        decoder.decompress(chunks[-1]["body"])
+        assert decoder.eof
+    
+    async def test_zstd(self):
+        """Test zstd when the optional package is installed"""
+        zstandard = pytest.importorskip("zstandard")
+        messages = await call(compressed_app(), "/rows", "gzip, zstd")
+        assert dict(messages[0]["headers"])[b"content-encoding"] == b"zstd"
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(messages[1]["body"])
+        assert json.loads(body) == ROWS
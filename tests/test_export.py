@@ -0,0 +1,109 @@
+import csv
+import gzip
+import io
+import pytest
+from datetime import datetime
+from app.export import ResultExporter
+from app.models import QueryLog, Student
+from app.sql_executor import SQLExecutor
+
+
+class TestResultExporter:
+    """Test cases for bulk result encoding"""
+    
+    def test_csv_streams_one_chunk_per_batch(self):
+        """Test that CSV is encoded batch by batch after a header row"""
+        batches = [[(1, "Ann"), (2, "Ben, Jr.")], [(3, None)]]
+        chunks = list(ResultExporter().stream(["id", "name"], iter(batches), "csv"))
+        
+        assert len(chunks) == 3
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        assert rows == [["id", "name"], ["1", "Ann"], ["2", "Ben, Jr."], ["3", ""]]
+    
+    def test_csv_gzip(self):
+        """Test that gzipped CSV is a single valid gzip stream"""
+        batches = [[(i, f"row {i}")] for i in range(100)]
+        data = b"".join(ResultExporter().stream(["id", "label"], iter(batches), "csv", "gzip"))
+        
+        lines = gzip.decompress(data).decode().splitlines()
+        assert lines[0] == "id,label" and lines[-1] == "99,row 99"
+    
+    def test_rejects_unsupported_compression(self):
+        """Test that codecs are checked per format"""
+        with pytest.raises(ValueError, match="supported: gzip"):
+            ResultExporter().check("csv", "zstd")
+    
+    @pytest.mark.parametrize("fmt, compression", [("arrow", "zstd"), ("parquet", "snappy")])
+    def test_columnar_round_trip(self, fmt, compression):
+        """Test Arrow IPC and Parquet output across several batches"""
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        
+        batches = [[(None, "a")], [(2, "b"), (3, None)]]
+        data = b"".join(ResultExporter().stream(["n", "s"], iter(batches), fmt, compression))
+        
+        if fmt == "arrow":
+            table = pa.ipc.open_stream(data).read_all()
+        else:
+            table = pq.read_table(pa.BufferReader(data))
+        assert table.column_names == ["n", "s"]
+        assert table.num_rows == 3
+    
+    @pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+    def test_storage_classes_fix_schema_across_batches(self, fmt, test_db):
+        """Test that a column mixing integers and text in later batches still exports in full"""
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        
+        sql = "SELECT 1 AS v, 2 AS w UNION ALL SELECT 'x', 2.5 UNION ALL SELECT NULL, NULL"
+        classes = SQLExecutor().storage_classes(test_db, sql, 2)
+        assert classes == [{"integer", "text", "null"}, {"integer", "real", "null"}]
+        
+        batches = [[(1, 2)], [("x", 2.5)], [(None, None)]]
+        data = b"".join(ResultExporter().stream(["v", "w"], iter(batches), fmt, None, classes))
+        if fmt == "arrow":
+            table = pa.ipc.open_stream(data).read_all()
+        else:
+            table = pq.read_table(pa.BufferReader(data))
+        assert table.column("v").to_pylist() == ["1", "x", None]
+        assert table.column("w").to_pylist() == [2.0, 2.5, None]
+
+
+class TestExportEndpoint:
+    """Test cases for /query/export"""
+    
+    def test_export_csv(self, client, test_db):
+        """Test that a template question streams as a CSV attachment and is logged"""
+        test_db.add_all([
+            Student(name="Ann", grade=10, created_at=datetime.now()),
+            Student(name="Ben", grade=11, created_at=datetime.now())
+        ])
+        test_db.commit()
+        
+        response = client.post("/query/export", json={"question": "List all students"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="export.csv"' in response.headers["content-disposition"]
+        assert response.text.splitlines() == ["id,name,grade", "1,Ann,10", "2,Ben,11"]
+        
+        test_db.expire_all()
+        assert test_db.query(QueryLog).count() == 1
+    
+    def test_export_arrow_typed_from_whole_result(self, client, test_db):
+        """Test that an Arrow export takes its schema from the full result"""
+        pa = pytest.importorskip("pyarrow")
+        test_db.add(Student(name="Ann", grade=10, created_at=datetime.now()))
+        test_db.commit()
+        
+        response = client.post("/query/export", json={"question": "List all students", "format": "arrow"})
+        assert response.status_code == 200
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.schema.field("grade").type == pa.int64()
+        assert table.column("name").to_pylist() == ["Ann"]
+    
+    def test_export_rejects_bad_compression(self, client):
+        """Test that unsupported codecs fail before the query runs"""
+        response = client.post(
+            "/query/export", json={"question": "List all students", "compression": "lz4"}
+        )
+        assert response.status_code == 400
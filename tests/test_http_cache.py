@@ -0,0 +1,99 @@
+from app.http_cache import cache_control, etag_matches, is_deterministic, make_etag
+from app.main import analytics_service, nlp2sql_service, sql_executor
+from tests.conftest import INGEST_HEADERS
+
+
+class TestHelpers:
+    """Test cases for the conditional request helpers"""
+    
+    def test_etag_matches(self):
+        """Test If-None-Match parsing, lists, wildcards and weak tags"""
+        etag = make_etag("stats", 1, 2)
+        assert etag.startswith('"') and etag == make_etag("stats", 1, 2)
+        assert etag != make_etag("stats", 1, 3)
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+        assert not etag_matches('"other"', etag)
+    
+    def test_is_deterministic(self):
+        """Test that clock and random reads are detected"""
+        assert is_deterministic("SELECT COUNT(*) FROM students WHERE grade = 10")
+        assert not is_deterministic("SELECT * FROM students ORDER BY RANDOM() LIMIT 1")
+        assert not is_deterministic("SELECT * FROM enrollments WHERE enrolled_at > date('now', '-7 days')")
+        assert not is_deterministic("SELECT CURRENT_TIMESTAMP")
+    
+    def test_cache_control(self):
+        """Test max-age and forced revalidation"""
+        assert cache_control(5) == "max-age=5"
+        assert cache_control(0) == "no-cache"
+
+
+class TestConditionalStats:
+    """Test cases for ETags on /stats"""
+    
+    def test_not_modified_skips_stats(self, client, monkeypatch):
+        """Test that a current ETag gets a 304 without computing the stats"""
+        first = client.get("/stats")
+        etag = first.headers["etag"]
+        assert first.status_code == 200
+        assert first.headers["cache-control"].startswith("max-age=")
+        
+        async def fail(*args, **kwargs):
+            raise AssertionError("stats recomputed")
+        
+        monkeypatch.setattr(analytics_service, "get_stats_async", fail)
+        second = client.get("/stats", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.headers["etag"] == etag
+        assert second.content == b""
+    
+    def test_new_queries_change_etag(self, client):
+        """Test that logging a query invalidates the stats ETag"""
+        etag = client.get("/stats").headers["etag"]
+        assert client.get("/stats?window=day").headers["etag"] != etag
+        
+        client.post("/query", json={"question": "How many students are enrolled?"})
+        response = client.get("/stats", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+
+class TestConditionalQuery:
+    """Test cases for GET /query"""
+    
+    def test_not_modified_skips_execution(self, client, monkeypatch):
+        """Test that a current ETag gets a 304 without executing the query"""
+        params = {"question": "How many students are enrolled?"}
+        first = client.get("/query", params=params)
+        assert first.status_code == 200
+        assert first.json()["result"] == 0
+        etag = first.headers["etag"]
+        
+        async def fail(*args, **kwargs):
+            raise AssertionError("query executed")
+        
+        monkeypatch.setattr(sql_executor, "execute_query_async", fail)
+        second = client.get("/query", params=params, headers={"If-None-Match": etag})
+        assert second.status_code == 304
+    
+    def test_bulk_load_changes_etag(self, client):
+        """Test that a load bumps the data version in the ETag"""
+        params = {"question": "How many students are enrolled?"}
+        etag = client.get("/query", params=params).headers["etag"]
+        client.post("/ingest/students?format=csv", content=b"name,grade\nAnn,10\n", headers=INGEST_HEADERS)
+        
+        response = client.get("/query", params=params, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["result"] == 1
+        assert response.headers["etag"] != etag
+    
+    def test_nondeterministic_sql_is_not_cached(self, client):
+        """Test that SQL reading random numbers gets no ETag"""
+        question = "Pick one student at random for the raffle"
+        nlp2sql_service.prime(question, "SELECT name FROM students ORDER BY RANDOM() LIMIT 1")
+        response = client.get("/query", params={"question": question})
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+        assert response.headers["cache-control"] == "no-store"
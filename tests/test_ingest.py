@@ -0,0 +1,150 @@
+import io
+import json
+import threading
+from datetime import datetime
+from app.config import Settings
+from app.cache import DataVersionTracker, LRUCache
+from app.ingest import IngestService, iter_lines, read_records
+from app.models import Course, Enrollment, Student
+from app.sql_executor import SQLExecutor
+from tests.conftest import INGEST_HEADERS, TestSessionLocal
+
+
+def csv_records(text):
+    """Records of an in-memory CSV document"""
+    return read_records(io.StringIO(text), "csv")
+
+
+class TestReaders:
+    """Test cases for incremental parsing"""
+    
+    def test_iter_lines_across_chunk_boundaries(self):
+        """Test that lines and multi-byte characters split across chunks are rejoined"""
+        data = "id,name\n1,Zoë\n2,Bo".encode()
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+        assert list(iter_lines(chunks)) == ["id,name\n", "1,Zoë\n", "2,Bo"]
+    
+    def test_iter_lines_splits_only_on_newlines(self):
+        """Test that form feeds, separators and U+2028 stay inside their value"""
+        value = "a\x0cb\x1ec\u2028d\x85e"
+        csv_data = f'name,grade\r\n"{value}",10\r\n'.encode()
+        assert list(iter_lines([csv_data])) == ["name,grade\n", f'"{value}",10\n']
+        assert [r for _, r in read_records(iter_lines([csv_data]), "csv")] == [{"name": value, "grade": "10"}]
+        
+        ndjson_data = json.dumps({"name": value}, ensure_ascii=False).encode() + b"\n"
+        assert [r for _, r in read_records(iter_lines([ndjson_data]), "ndjson")] == [{"name": value}]
+    
+    def test_ndjson_reports_bad_lines(self):
+        """Test that unparseable NDJSON lines become per-line errors"""
+        records = list(read_records(['{"name": "A"}\n', "\n", "{oops\n", "[1]\n"], "ndjson"))
+        assert records[0] == (1, {"name": "A"})
+        assert [line for line, _ in records[1:]] == [3, 4]
+        assert all(isinstance(record, ValueError) for _, record in records[1:])
+
+
+class TestIngestService:
+    """Test cases for bulk loading"""
+    
+    def test_loads_and_rejects_rows(self, test_db):
+        """Test that valid rows load in batches and invalid ones are reported"""
+        test_db.add(Course(id=1, name="Python", category="Programming"))
+        test_db.commit()
+        report = IngestService(batch_size=2).ingest(test_db, "students", csv_records(
+            "id,name,grade,created_at\n"
+            "1,Ann,10,2024-01-05\n"
+            "2,Ben,eleven,\n"
+            "3,,9,\n"
+            "4,Cy,12,\n"
+            "5,Di,9,2024-02-01T10:00:00Z\n"
+        ))
+        
+        assert (report["rows"], report["inserted"], report["rejected"]) == (5, 3, 2)
+        assert [e["line"] for e in report["errors"]] == [3, 4]
+        assert "Invalid grade" in report["errors"][0]["error"]
+        assert report["rows_per_second"] > 0
+        assert [s.name for s in test_db.query(Student).order_by(Student.id)] == ["Ann", "Cy", "Di"]
+        assert test_db.get(Student, 1).created_at == datetime(2024, 1, 5)
+    
+    def test_enrollment_foreign_keys(self, test_db):
+        """Test that enrollments must reference existing students and courses"""
+        test_db.add_all([Student(id=1, name="Ann", grade=10), Course(id=1, name="Python", category="Programming")])
+        test_db.commit()
+        report = IngestService().ingest(test_db, "enrollments", csv_records(
+            "student_id,course_id,enrolled_at\n1,1,2024-03-01\n2,1,2024-03-01\n1,9,2024-03-01\n"
+        ))
+        
+        assert report["inserted"] == 1
+        assert [e["error"] for e in report["errors"]] == ["Unknown student_id: 2", "Unknown course_id: 9"]
+        assert test_db.query(Enrollment).count() == 1
+    
+    def test_upsert_updates_existing_ids(self, test_db):
+        """Test that existing ids are rejected without upsert and updated with it"""
+        test_db.add(Course(id=1, name="Python", category="Programming"))
+        test_db.commit()
+        data = '{"id": 1, "name": "Python 2", "category": "Programming"}\n{"id": 2, "name": "SQL", "category": "Database"}\n'
+        
+        report = IngestService().ingest(test_db, "courses", read_records(io.StringIO(data), "ndjson"))
+        assert (report["inserted"], report["rejected"]) == (1, 1)
+        assert "use upsert" in report["errors"][0]["error"]
+        
+        report = IngestService().ingest(test_db, "courses", read_records(io.StringIO(data), "ndjson"), upsert=True)
+        assert (report["inserted"], report["updated"]) == (0, 2)
+        test_db.expire_all()
+        assert test_db.get(Course, 1).name == "Python 2"
+    
+    def test_load_invalidates_cached_results(self, test_db):
+        """Test that a load bumps the data version used in result cache keys"""
+        tracker = DataVersionTracker(TestSessionLocal, ttl_seconds=0)
+        executor = SQLExecutor(result_cache=LRUCache(), data_version=tracker)
+        sql = "SELECT COUNT(*) FROM students"
+        assert executor.execute_query(test_db, sql, "count")[0] == 0
+        
+        report = IngestService(data_version=tracker).ingest(test_db, "students", csv_records("name,grade\nAnn,10\n"))
+        assert report["data_version"] == 1
+        assert executor.execute_query(test_db, sql, "count")[0] == 1
+    
+    async def test_async_version_read_runs_in_a_thread(self, test_db, monkeypatch):
+        """Test that async lookups re-read the data version off the event loop"""
+        tracker = DataVersionTracker(TestSessionLocal, ttl_seconds=60)
+        tracker.bump(test_db)
+        test_db.commit()
+        tracker._checked_at = float("-inf")
+        
+        threads = []
+        read = tracker.current
+        monkeypatch.setattr(tracker, "current", lambda: threads.append(threading.current_thread()) or read())
+        assert await tracker.current_async() == 1
+        assert threads and threads[0] is not threading.main_thread()
+        # Fresh within the TTL: no re-read at all
+        assert await tracker.current_async() == 1
+        assert len(threads) == 1
+
+
+class TestIngestEndpoint:
+    """Test cases for /ingest"""
+    
+    def test_ingest_csv_body(self, client, test_db):
+        """Test that a CSV body is streamed into the table"""
+        body = "name,grade\n" + "".join(f"Student {i},{9 + i % 4}\n" for i in range(250))
+        response = client.post("/ingest/students?format=csv", content=body.encode(), headers=INGEST_HEADERS)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["rows"], data["inserted"], data["rejected"]) == (250, 250, 0)
+        assert data["data_version"] == 1
+        assert test_db.query(Student).count() == 250
+    
+    def test_ingest_unknown_table(self, client):
+        """Test that only the loadable tables are accepted"""
+        assert client.post("/ingest/query_logs", content=b"", headers=INGEST_HEADERS).status_code == 422
+    
+    def test_ingest_requires_token(self, client, test_db):
+        """Test that loads without the ingest token are refused"""
+        body = b"name,grade\nAnn,10\n"
+        assert client.post("/ingest/students", content=body).status_code == 403
+        assert client.post("/ingest/students", content=body, headers={"X-Ingest-Token": "guess"}).status_code == 403
+        assert test_db.query(Student).count() == 0
+    
+    def test_ingest_disabled_by_default(self):
+        """Test that /ingest is off unless enabled"""
+        assert Settings.model_fields["ingest_enabled"].default is False
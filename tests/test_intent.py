@@ -0,0 +1,88 @@
+from app.intent import IntentClassifier
+from app.nlp2sql import NLP2SQLService, literals_in_question
+
+
+class TestIntentClassifier:
+    """Test cases for the TF-IDF intent classifier"""
+    
+    def test_paraphrase_matches_nearest_label(self):
+        """Test that a reworded question scores highest against its own label"""
+        classifier = IntentClassifier()
+        classifier.add_many([
+            ("How many students are enrolled?", "count"),
+            ("List all courses in the catalog", "courses"),
+            ("Average grade of students", "average"),
+        ])
+        ranked = classifier.classify("how many learners are enroled", top_k=3)
+        assert ranked[0][0] == "count"
+        assert 0 < ranked[0][1] <= 1
+    
+    def test_incremental_segments(self):
+        """Test that examples added in many small steps stay searchable after merges"""
+        classifier = IntentClassifier()
+        for i in range(100):
+            classifier.add(f"question number {i} about topic{i}", f"label{i}")
+            classifier.classify("warm up", top_k=1)
+        assert len(classifier) == 100
+        # Size-tiered merging keeps few segments
+        assert len(classifier._segments) <= 8
+        assert classifier.classify("question about topic42", top_k=1)[0][0] == "label42"
+    
+    def test_duplicates_and_capacity(self):
+        """Test that repeated questions and examples past the cap are not added"""
+        classifier = IntentClassifier(max_examples=2)
+        assert classifier.add("Count students", "a")
+        assert not classifier.add("count   STUDENTS?", "b")
+        assert classifier.add("List courses", "c")
+        assert not classifier.add("Average grade", "d")
+        assert len(classifier) == 2
+    
+    def test_classify_many_matches_classify(self):
+        """Test that batched scoring gives the same results as one at a time"""
+        classifier = IntentClassifier()
+        classifier.add_many([("count students", "a"), ("list courses", "b"), ("top course", "c")])
+        questions = ["number of students", "show the courses", "nothing related"]
+        assert classifier.classify_many(questions) == [classifier.classify(q) for q in questions]
+
+
+class TestIntentRouting:
+    """Test cases for routing questions through the classifier"""
+    
+    def test_template_paraphrases(self):
+        """Test that reworded template questions are answered without the LLM"""
+        service = NLP2SQLService(intents=IntentClassifier())
+        assert service.lookup_query("Count of learners in the Python class").params["match"]
+        assert service.lookup_query("How many students do we have?").sql == "SELECT COUNT(*) FROM students"
+        query = service.lookup_query("Show learners in grade 9")
+        assert query.params == {"grade": 9}
+    
+    def test_logged_sql_requires_matching_literals(self):
+        """Test that logged SQL is only reused when the question's literals agree"""
+        service = NLP2SQLService(intents=IntentClassifier())
+        sql = "SELECT AVG(grade) FROM students WHERE grade = 11"
+        service.prime_many([("What is the average grade of students in grade 11?", sql)])
+        
+        assert service.lookup_query("average grade of grade 11 students").sql == sql
+        assert service.lookup_query("average grade of grade 9 students") is None
+    
+    def test_unrelated_questions_fall_through(self):
+        """Test that low-confidence questions are left to the LLM"""
+        service = NLP2SQLService(intents=IntentClassifier())
+        assert service.lookup_query("Which courses have no students in Data Science?") is None
+        assert NLP2SQLService().lookup_query("Count of learners in the Python class") is None
+    
+    def test_unknown_content_words_fall_through(self):
+        """Test that confident matches asking about something else are left to the LLM"""
+        service = NLP2SQLService(intents=IntentClassifier())
+        assert service.lookup_query("How many courses do we have?") is None
+        assert service.lookup_query("How many teachers do we have?") is None
+        assert service.lookup_query("Show me every student named Alice") is None
+        assert service.lookup_query("Show me every student who never enrolled") is None
+    
+    def test_literals_in_question(self):
+        """Test the literal agreement check"""
+        sql = "SELECT name FROM courses WHERE category = 'Data Science' LIMIT 5"
+        assert literals_in_question(sql, "top 5 data science courses")
+        assert literals_in_question(sql, "data science courses")
+        assert not literals_in_question(sql, "programming courses")
+        assert not literals_in_question("SELECT COUNT(*) FROM students WHERE grade = 10", "students in grade 12")
@@ -0,0 +1,119 @@
+import numpy as np
+from app.near_duplicates import NearDuplicateIndex, UNSORTED_TAIL, shingles
+from app.nlp2sql import NLP2SQLService
+
+QUESTION = "How many students are enrolled in Python courses?"
+SQL = "SELECT COUNT(*) FROM enrollments e JOIN courses c ON e.course_id = c.id WHERE c.name = 'Python'"
+
+# Not covered by a template
+AVERAGE_QUESTION = "What is the average grade of students enrolled in Python courses?"
+AVERAGE_SQL = (
+    "SELECT AVG(s.grade) FROM students s JOIN enrollments e ON s.id = e.student_id "
+    "JOIN courses c ON e.course_id = c.id WHERE c.name = 'Python'"
+)
+
+
+class TestNearDuplicateIndex:
+    """Test cases for the MinHash/LSH index"""
+    
+    def test_filler_words_and_word_order(self):
+        """Test that rewordings with the same words find the indexed question"""
+        index = NearDuplicateIndex()
+        index.add(QUESTION, SQL)
+        assert index.lookup("Python courses: how many students enrolled")[:2] == (QUESTION, SQL)
+        assert index.lookup("list courses taught by teachers") is None
+    
+    def test_signature_estimates_jaccard(self):
+        """Test that signature agreement tracks the Jaccard similarity of shingles"""
+        index = NearDuplicateIndex(num_perm=256, bands=16)
+        a, b = QUESTION, "How many learners signed up for Python courses?"
+        set_a, set_b = set(shingles(a).tolist()), set(shingles(b).tolist())
+        exact = len(set_a & set_b) / len(set_a | set_b)
+        estimate = float(np.mean(index.signature(a) == index.signature(b)))
+        assert abs(estimate - exact) < 0.1
+    
+    def test_threshold(self):
+        """Test that matches below the threshold are not returned"""
+        strict = NearDuplicateIndex(threshold=1.0)
+        strict.add(QUESTION, SQL)
+        assert strict.lookup("How many studnets are enrolled in Python courses") is None
+        loose = NearDuplicateIndex(threshold=0.6)
+        loose.add(QUESTION, SQL)
+        assert loose.lookup("How many studnets are enrolled in Python courses")[1] == SQL
+    
+    def test_sorted_and_unsorted_entries(self):
+        """Test that questions are found before and after the band keys are re-sorted"""
+        index = NearDuplicateIndex()
+        for i in range(UNSORTED_TAIL + 10):
+            index.add(f"question {i} about topic{i * 7919}", f"SELECT {i}")
+        assert index._sorted_count > 0
+        assert index.lookup("about topic7919 question 1")[1] == "SELECT 1"
+        last = UNSORTED_TAIL + 9
+        assert index.lookup(f"question {last} about topic{last * 7919}")[1] == f"SELECT {last}"
+    
+    def test_save_and_load(self, tmp_path):
+        """Test that a saved index loads with the same answers"""
+        index = NearDuplicateIndex()
+        index.add_many([(QUESTION, SQL), ("Liste der Kurse – Übersicht", "SELECT name FROM courses")])
+        path = str(tmp_path / "index.npz")
+        index.save(path)
+        
+        loaded = NearDuplicateIndex()
+        assert loaded.load(path) == 2
+        assert loaded.questions == index.questions
+        assert loaded.lookup("Übersicht der Kurse liste")[1] == "SELECT name FROM courses"
+        assert not loaded.add(QUESTION, SQL)
+        # Signatures from other parameters are not comparable
+        assert NearDuplicateIndex(num_perm=32, bands=8).load(path) == 0
+    
+    def test_save_tag_and_temp_files(self, tmp_path):
+        """Test that files saved for another schema are ignored and no temp files remain"""
+        index = NearDuplicateIndex()
+        index.add(QUESTION, SQL)
+        path = str(tmp_path / "index.npz")
+        index.save(path, tag="schema-a")
+        
+        assert NearDuplicateIndex().load(path, tag="schema-b") == 0
+        assert NearDuplicateIndex().load(path, tag="schema-a") == 1
+        assert [p.name for p in tmp_path.iterdir()] == ["index.npz"]
+    
+    def test_negation_and_comparison_words_must_match(self):
+        """Test that "not"/"never"/"most" questions never reuse SQL of the plain question"""
+        index = NearDuplicateIndex()
+        index.add("Which students are enrolled in the Python course?", "SELECT 1")
+        assert index.lookup("Which students are enrolled in the Python course")[1] == "SELECT 1"
+        assert index.lookup("Which students are not enrolled in the Python course?") is None
+        assert index.lookup("Which students aren't enrolled in the Python course?") is None
+        assert index.lookup("Which students are never enrolled in the Python course?") is None
+        assert index.lookup("Which students are enrolled in the most Python courses?") is None
+
+
+class TestNearDuplicateRouting:
+    """Test cases for near-duplicate reuse in the NLP-to-SQL service"""
+    
+    def test_reuses_logged_sql(self):
+        """Test that a near-duplicate of a logged question reuses its SQL"""
+        service = NLP2SQLService(near_duplicates=NearDuplicateIndex())
+        service.prime_many([(AVERAGE_QUESTION, AVERAGE_SQL)])
+        assert service.lookup_query("python courses: average grade of enrolled students").sql == AVERAGE_SQL
+    
+    def test_changed_aggregate_or_projection_falls_through(self):
+        """Test that one different aggregate or projection word never reuses the SQL"""
+        names = "Show names of students enrolled in Web Development"
+        names_sql = (
+            "SELECT s.name FROM students s JOIN enrollments e ON s.id = e.student_id "
+            "JOIN courses c ON e.course_id = c.id WHERE c.name = 'Web Development'"
+        )
+        service = NLP2SQLService(near_duplicates=NearDuplicateIndex(threshold=0.5))
+        service.prime_many([(names, names_sql), (AVERAGE_QUESTION, AVERAGE_SQL)])
+        
+        assert service.lookup_query("Show the names of students enrolled in Web Development").sql == names_sql
+        assert service.lookup_query("Show count of students enrolled in Web Development") is None
+        assert service.lookup_query("Show ids of students enrolled in Web Development") is None
+        assert service.lookup_query("What is the sum grade of students enrolled in Python courses?") is None
+    
+    def test_literals_must_agree(self):
+        """Test that SQL for one course is not reused for another"""
+        service = NLP2SQLService(near_duplicates=NearDuplicateIndex(threshold=0.5))
+        service.prime_many([(AVERAGE_QUESTION, AVERAGE_SQL)])
+        assert service.lookup_query("What is the average grade of students enrolled in Java courses?") is None
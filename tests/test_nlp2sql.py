@@ -1,5 +1,5 @@
 import pytest
-from app.nlp2sql import NLP2SQLService
+from app.nlp2sql import NLP2SQLService, SQLQuery
 
 
 class TestNLP2SQL:
@@ -60,3 +60,30 @@ class TestNLP2SQL:
         assert "student_id" in service.schema_info
         assert "course_id" in service.schema_info
         assert "enrolled_at" in service.schema_info
+    
+    def test_template_queries_use_bind_parameters(self):
+        """Test that template values are bind parameters, not inlined literals"""
+        service = NLP2SQLService()
+        
+        query_2023 = service.generate_query("How many students enrolled in Python courses in 2023?")
+        query_2024 = service.generate_query("How many students enrolled in Python courses in 2024?")
+        
+        assert query_2023.sql == query_2024.sql
+        assert ":year" in query_2023.sql and "2023" not in query_2023.sql
+        assert query_2023.params["year"] == "2023"
+        assert service.generate_query("List students in grade 11").params == {"grade": 11}
+    
+    def test_generate_sql_renders_parameters(self):
+        """Test that generate_sql still returns executable SQL text"""
+        service = NLP2SQLService()
+        sql = service.generate_sql("List all programming courses")
+        assert sql == "SELECT id, name, category FROM courses WHERE category = 'Programming'"
+    
+    def test_render_quotes_strings_and_skips_literals(self):
+        """Test literal rendering of parameters"""
+        query = SQLQuery(
+            "SELECT * FROM courses WHERE name = :name AND category <> ':name' AND id > :id",
+            {"name": "O'Brien", "id": 3}
+        )
+        assert query.render() == \
+            "SELECT * FROM courses WHERE name = 'O''Brien' AND category <> ':name' AND id > 3"
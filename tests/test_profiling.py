@@ -0,0 +1,110 @@
+import pstats
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.main import app as main_app
+from app.profiling import ProfileStore, ProfilingMiddleware
+
+
+def busy_wait(seconds):
+    """Burn CPU so samplers see this frame"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profiled_client(store, **options):
+    """Test client for a small app behind the profiling middleware"""
+    app = FastAPI()
+    
+    @app.get("/work")
+    async def work():
+        busy_wait(0.05)
+        return {"ok": True}
+    
+    @app.get("/blocking")
+    def blocking():
+        busy_wait(0.05)
+        return {"ok": True}
+    
+    app.add_middleware(ProfilingMiddleware, store=store, token="secret", **options)
+    return TestClient(app)
+
+
+class TestProfileStore:
+    """Test cases for the on-disk profile ring"""
+    
+    def test_ring_keeps_newest(self, tmp_path):
+        """Test that saving past the limit drops the oldest profiles"""
+        store = ProfileStore(str(tmp_path), max_profiles=2)
+        ids = []
+        for i in range(3):
+            profile_id = f"{1700000000000 + i:013d}-0000000{i}"
+            store.save(profile_id, "sample", lambda path: open(path, "w").write("a;b 1\n"), {"path": "/x"})
+            ids.append(profile_id)
+        
+        assert [p["id"] for p in store.list()] == [ids[2], ids[1]]
+        assert store.path(ids[0]) is None
+        assert store.path(ids[2])[1] == "sample"
+        assert store.path("../../etc/passwd") is None
+
+
+class TestProfilingMiddleware:
+    """Test cases for per-request profiling"""
+    
+    def test_token_profiles_request(self, tmp_path):
+        """Test that a request with the token is sampled into collapsed stacks"""
+        store = ProfileStore(str(tmp_path))
+        client = profiled_client(store)
+        
+        response = client.get("/work", headers={"X-Profile-Token": "secret"})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+        path, mode = store.path(profile_id)
+        assert mode == "sample"
+        assert "busy_wait" in open(path).read()
+        assert store.list()[0]["path"] == "/work"
+    
+    def test_worker_threads_are_sampled(self, tmp_path):
+        """Test that blocking work in the threadpool shows up in the profile"""
+        store = ProfileStore(str(tmp_path))
+        response = profiled_client(store).get("/blocking?profile_token=secret")
+        path, _ = store.path(response.headers["x-profile-id"])
+        assert "blocking" in open(path).read()
+    
+    def test_token_is_not_stored(self, tmp_path):
+        """Test that a query-string token is stripped from the saved metadata"""
+        store = ProfileStore(str(tmp_path))
+        profiled_client(store).get("/work?limit=5&profile_token=secret")
+        assert store.list()[0]["query"] == "limit=5"
+        assert not any("secret" in path.read_text(errors="ignore") for path in tmp_path.iterdir())
+    
+    def test_cprofile_mode(self, tmp_path):
+        """Test that the deterministic profiler writes loadable pstats"""
+        store = ProfileStore(str(tmp_path))
+        headers = {"X-Profile-Token": "secret", "X-Profile-Mode": "cprofile"}
+        response = profiled_client(store).get("/work", headers=headers)
+        path, mode = store.path(response.headers["x-profile-id"])
+        assert mode == "cprofile"
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        assert "busy_wait" in functions
+    
+    def test_unprofiled_requests(self, tmp_path):
+        """Test that requests without a valid token are not profiled"""
+        store = ProfileStore(str(tmp_path))
+        client = profiled_client(store)
+        assert "x-profile-id" not in client.get("/work").headers
+        assert "x-profile-id" not in client.get("/work", headers={"X-Profile-Token": "wrong"}).headers
+        assert store.list() == []
+    
+    def test_background_sample_rate(self, tmp_path):
+        """Test that the sample rate profiles requests without a token"""
+        store = ProfileStore(str(tmp_path))
+        response = profiled_client(store, sample_rate=1.0, interval_ms=0.5).get("/work")
+        assert response.headers["x-profile-id"]
+        assert store.list()[0]["samples"] > 0
+    
+    def test_disabled_by_default(self):
+        """Test that the main app installs nothing unless profiling is enabled"""
+        assert all(m.cls is not ProfilingMiddleware for m in main_app.user_middleware)
+        assert all(getattr(route, "path", "") != "/profiles" for route in main_app.routes)
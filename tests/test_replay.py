@@ -0,0 +1,88 @@
+import io
+import json
+import httpx
+import pytest
+from datetime import datetime, timedelta
+from app.cache import LRUCache
+from app.main import app, nlp2sql_service
+from app.models import QueryLog
+from app.nlp2sql import NLP2SQLService
+from app.replay import compare, export_recording, replay, schedule
+
+RECORDED_SQL = "SELECT COUNT(*) FROM students WHERE grade = 12"
+
+
+@pytest.fixture
+def recording(test_db):
+    """Three logged questions exported as a recording"""
+    start = datetime(2024, 6, 1, 9, 0, 0)
+    test_db.add_all([
+        QueryLog(question="How many students are enrolled?", generated_sql="SELECT COUNT(*) FROM students",
+                 execution_time=3, created_at=start),
+        QueryLog(question="Which teacher is the happiest?", generated_sql=RECORDED_SQL,
+                 execution_time=900, created_at=start + timedelta(seconds=2)),
+        QueryLog(question="List all students", generated_sql="SELECT id, name, grade FROM students",
+                 execution_time=4, created_at=start + timedelta(hours=8)),
+    ])
+    test_db.commit()
+    out = io.StringIO()
+    assert export_recording(test_db, out, since=start) == 3
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def outcome(index, question, latency_ms, status_code=200, digest="a", generated_sql="SELECT 1"):
+    """One replayed question as returned by replay()"""
+    return {"index": index, "question": question, "status_code": status_code, "latency_ms": latency_ms,
+            "lag_ms": 0.0, "digest": digest, "generated_sql": generated_sql}
+
+
+class TestRecording:
+    """Test cases for exporting and scheduling recorded traffic"""
+    
+    def test_export_and_schedule(self, recording):
+        """Test that offsets keep the recorded gaps, scaled and capped"""
+        assert [r["question"] for r in recording][1] == "Which teacher is the happiest?"
+        assert recording[1]["generated_sql"] == RECORDED_SQL
+        assert schedule(recording) == [0.0, 2.0, 2.0 + 8 * 3600 - 2]
+        assert schedule(recording, speed=2.0, max_gap_seconds=60) == [0.0, 1.0, 31.0]
+        assert schedule(recording, speed=0) == [0.0, 0.0, 0.0]
+    
+    def test_llm_stub_answers_recorded_sql(self):
+        """Test that the stub returns recorded SQL and never calls Gemini"""
+        service = NLP2SQLService(recorded_sql={"which teacher is the happiest": RECORDED_SQL})
+        assert service.generate_sql("Which teacher is the happiest?") == RECORDED_SQL
+        with pytest.raises(Exception, match="no SQL was recorded"):
+            service.generate_sql("Who teaches chemistry?")
+        assert service._model is None
+
+
+class TestReplay:
+    """Test cases for replaying against a build and comparing runs"""
+    
+    async def test_replay_against_app(self, client, recording, monkeypatch):
+        """Test an offline replay where the LLM question gets its recorded SQL"""
+        monkeypatch.setattr(nlp2sql_service, "recorded_sql", {"which teacher is the happiest": RECORDED_SQL})
+        # Keep the stubbed answer out of the shared service's caches
+        monkeypatch.setattr(nlp2sql_service, "sql_cache", LRUCache(maxsize=16))
+        monkeypatch.setattr(nlp2sql_service, "intents", None)
+        monkeypatch.setattr(nlp2sql_service, "near_duplicates", None)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as http:
+            outcomes = await replay(recording, http, speed=0)
+        
+        assert [o["status_code"] for o in outcomes] == [200, 200, 200]
+        assert outcomes[1]["generated_sql"] == RECORDED_SQL
+        assert all(o["latency_ms"] > 0 and o["digest"] for o in outcomes)
+        assert compare(outcomes, outcomes, min_delta_ms=float("inf"))["differences"] == []
+    
+    def test_compare_reports_regressions_and_differences(self):
+        """Test per-question medians, the noise floor and changed answers"""
+        baseline = [outcome(0, "slow", 10), outcome(1, "slow", 12), outcome(2, "fast", 0.2), outcome(3, "sql", 5)]
+        candidate = [outcome(0, "slow", 30), outcome(1, "slow", 34), outcome(2, "fast", 0.9),
+                     outcome(3, "sql", 5, digest="b", generated_sql="SELECT 2")]
+        
+        report = compare(baseline, candidate, tolerance=0.2, min_delta_ms=1.0)
+        assert [(r["question"], r["count"], r["delta_ms"]) for r in report["regressions"]] == [("slow", 2, 21.0)]
+        assert [(d["index"], d["changed"]) for d in report["differences"]] == [(3, ["generated_sql", "digest"])]
+        
+        with pytest.raises(ValueError):
+            compare(baseline, candidate[:2])
@@ -0,0 +1,101 @@
+import pytest
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta
+from app.models import QueryLog, QueryLogArchiveDay
+from app.retention import RetentionService, tenant_retention_loop
+from app.analytics import AnalyticsService
+
+
+@pytest.fixture
+def old_and_new_logs(test_db):
+    """Five logs from 40 days ago and two recent ones"""
+    now = datetime.utcnow()
+    old = (now - timedelta(days=40)).replace(hour=12, minute=0)
+    test_db.add_all([
+        QueryLog(question=f"List python courses {i}", generated_sql="SELECT 1",
+                 execution_time=10 * i, created_at=old + timedelta(minutes=i))
+        for i in range(5)
+    ] + [
+        QueryLog(question="How many students?", generated_sql="SELECT COUNT(*) FROM students",
+                 execution_time=15, created_at=now),
+        QueryLog(question="List students", generated_sql="SELECT * FROM students",
+                 execution_time=5, created_at=now),
+    ])
+    test_db.commit()
+    return test_db
+
+
+class TestRetention:
+    """Test cases for query log retention"""
+    
+    def test_old_rows_are_archived_in_batches(self, old_and_new_logs, tmp_path):
+        """Test that old rows move to the archive and recent ones stay"""
+        db = old_and_new_logs
+        service = RetentionService(archive_dir=str(tmp_path), batch_size=2, pause_seconds=0)
+        
+        summary = service.run(db, older_than=timedelta(days=30))
+        
+        assert summary["archived_rows"] == 5
+        assert summary["batches"] == 3
+        assert db.query(QueryLog).count() == 2
+        
+        archived = []
+        for path in tmp_path.glob("query_logs-*.jsonl.gz"):
+            with gzip.open(path, "rt") as f:
+                archived.extend(json.loads(line) for line in f)
+        assert len(archived) == 5
+    
+    def test_stats_include_archived_rows(self, old_and_new_logs, tmp_path):
+        """Test that all-time stats survive archival"""
+        db = old_and_new_logs
+        before = AnalyticsService().get_stats(db)
+        
+        RetentionService(archive_dir=str(tmp_path), pause_seconds=0).run(db, older_than=timedelta(days=30))
+        after = AnalyticsService().get_stats(db)
+        
+        assert after["total_queries"] == before["total_queries"] == 7
+        assert after["slowest_query"]["execution_time_ms"] == 40
+        assert after["most_common_keywords"] == before["most_common_keywords"]
+    
+    def test_rerun_is_idempotent(self, old_and_new_logs, tmp_path):
+        """Test that a second run has nothing left to archive"""
+        db = old_and_new_logs
+        service = RetentionService(archive_dir=str(tmp_path), pause_seconds=0)
+        service.run(db, older_than=timedelta(days=30))
+        
+        assert service.run(db, older_than=timedelta(days=30))["archived_rows"] == 0
+        assert db.query(QueryLogArchiveDay).one().query_count == 5
+    
+    async def test_tenant_databases_are_archived(self, tmp_path):
+        """Test that retention also runs over each known tenant's database"""
+        from app.main import _tenant_services
+        from app.tenancy import TenantRegistry
+        
+        tenants = TenantRegistry(f"sqlite:///{tmp_path}/{{tenant}}.db", _tenant_services, known_tenants={"a", "b"})
+        db = tenants.get("a").session_factory()
+        db.add(QueryLog(question="Old question", generated_sql="SELECT 1", execution_time=5,
+                        created_at=datetime.utcnow() - timedelta(days=90)))
+        db.commit()
+        db.close()
+        
+        loop = asyncio.create_task(tenant_retention_loop(
+            tenants, str(tmp_path / "archive"), 100, older_than=timedelta(days=30),
+            minute_buckets_older_than=timedelta(days=7), interval_seconds=3600
+        ))
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.05)
+                # Tenants run in order: "b" opening means "a" is done
+                if "b" in tenants:
+                    break
+        finally:
+            loop.cancel()
+        
+        db = tenants.get("a").session_factory()
+        assert db.query(QueryLog).count() == 0
+        assert db.query(QueryLogArchiveDay).one().query_count == 1
+        db.close()
+        assert len(list((tmp_path / "archive" / "a").iterdir())) == 1
+        await tenants.close()
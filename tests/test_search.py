@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import text
+from app.models import Student, Course
+from app.search import fts_phrase
+
+
+class TestFullTextSearch:
+    """Test cases for FTS5 name search"""
+    
+    def test_course_match_is_case_insensitive(self, test_db):
+        """Test that course names are matched regardless of case"""
+        test_db.add_all([
+            Course(name="Python Programming", category="Programming"),
+            Course(name="Web Development", category="Programming"),
+        ])
+        test_db.commit()
+        
+        rows = test_db.execute(
+            text("SELECT rowid FROM courses_fts WHERE courses_fts MATCH :q"),
+            {"q": fts_phrase("PYTHON", "name")}
+        ).fetchall()
+        
+        assert len(rows) == 1
+    
+    def test_index_follows_updates_and_deletes(self, test_db):
+        """Test that triggers keep the index in sync with the base table"""
+        course = Course(name="Data Science", category="Data")
+        test_db.add(course)
+        test_db.commit()
+        
+        course.name = "Machine Learning"
+        test_db.commit()
+        
+        match = text("SELECT COUNT(*) FROM courses_fts WHERE courses_fts MATCH :q")
+        assert test_db.execute(match, {"q": fts_phrase("science", "name")}).scalar() == 0
+        assert test_db.execute(match, {"q": fts_phrase("learning", "name")}).scalar() == 1
+        
+        test_db.delete(course)
+        test_db.commit()
+        assert test_db.execute(match, {"q": fts_phrase("learning", "name")}).scalar() == 0
+    
+    def test_student_name_search(self, test_db):
+        """Test student name lookup through the FTS index"""
+        test_db.add_all([
+            Student(name="Alice Johnson", grade=10),
+            Student(name="Bob Smith", grade=11),
+        ])
+        test_db.commit()
+        
+        rows = test_db.execute(text(
+            "SELECT s.name FROM students s WHERE s.id IN "
+            "(SELECT rowid FROM students_fts WHERE students_fts MATCH :q)"
+        ), {"q": fts_phrase("johnson", "name")}).fetchall()
+        
+        assert [r[0] for r in rows] == ["Alice Johnson"]
+    
+    def test_fts_phrase_quotes_operators(self):
+        """Test that user terms cannot inject FTS operators"""
+        assert fts_phrase('a" OR "b') == '"a"" OR ""b"'
+        assert fts_phrase("python", "name") == 'name : "python"'
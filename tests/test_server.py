@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from app.models import QueryLog, QueryLogBucket
+from app.log_writer import LogEntry, QueryLogWriter
+from app.sql_executor import SQLExecutor
+from app.database import _configure_sqlite
+from app.server import MaintenanceLock, default_workers
+from tests.conftest import TestSessionLocal
+
+
+class TestServerConfig:
+    """Test cases for multi-worker server configuration"""
+    
+    def test_default_workers_follow_cpus(self):
+        """Test that workers are sized from CPUs within bounds"""
+        assert default_workers(1) == 1
+        assert default_workers(4) == 4
+        assert default_workers(64) == 8
+        assert default_workers() >= 1
+    
+    async def test_one_worker_holds_the_maintenance_lock(self, tmp_path):
+        """Test that only one holder runs maintenance and another takes over after it"""
+        path = str(tmp_path / "maintenance.lock")
+        first, second = MaintenanceLock(path), MaintenanceLock(path)
+        assert first.acquire() and first.held
+        assert not second.acquire()
+        
+        first.release()
+        await second.wait(poll_seconds=0.01)
+        assert second.held and not first.acquire()
+        second.release()
+    
+    def test_sqlite_pragmas(self, tmp_path):
+        """Test that SQLite connections use WAL and a busy timeout"""
+        connection = sqlite3.connect(str(tmp_path / "shared.db"))
+        _configure_sqlite(connection, None)
+        
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert connection.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        connection.close()
+
+
+class TestQueryLogWriter:
+    """Test cases for the background query log writer"""
+    
+    def test_close_drains_queue(self, test_db):
+        """Test that every queued entry is written before close returns"""
+        writer = QueryLogWriter(TestSessionLocal, batch_size=7, flush_interval=0.01)
+        writer.start()
+        now = datetime.utcnow()
+        for i in range(50):
+            writer.submit(LogEntry(f"Question {i}", "SELECT 1", i, now))
+        writer.close()
+        
+        assert writer.written == 50
+        assert test_db.query(QueryLog).count() == 50
+        bucket = test_db.query(QueryLogBucket).filter_by(granularity="minute").one()
+        assert bucket.query_count == 50
+    
+    def test_close_gives_up_on_a_full_queue(self):
+        """Test that close returns within its timeout when the writer is stuck"""
+        writer = QueryLogWriter(TestSessionLocal, max_queue=1)
+        writer._thread = threading.Thread(target=lambda: None)  # started, never drains
+        writer.submit(LogEntry("Question", "SELECT 1", 1, datetime.utcnow()))
+        
+        started = time.monotonic()
+        writer.close(timeout=0.2)
+        assert time.monotonic() - started < 2
+    
+    def test_executor_queues_logs(self, test_db):
+        """Test that the executor hands logs to the writer instead of committing"""
+        writer = QueryLogWriter(TestSessionLocal, flush_interval=0.01)
+        executor = SQLExecutor(log_writer=writer)
+        
+        executor.execute_query(test_db, "SELECT 1", "One")
+        assert test_db.query(QueryLog).count() == 0
+        
+        writer.start()
+        writer.close()
+        assert test_db.query(QueryLog).count() == 1
@@ -0,0 +1,57 @@
+import pytest
+from app.sketches import SpaceSaving, SlidingWindowTopK
+
+
+class TestSpaceSaving:
+    """Test cases for the Space-Saving sketch"""
+    
+    def test_exact_below_capacity(self):
+        """Test that counts are exact while items fit in the sketch"""
+        sketch = SpaceSaving(capacity=10)
+        for word in ["python", "python", "students", "python", "courses"]:
+            sketch.add(word)
+        
+        assert sketch.top(1) == [("python", 3)]
+        assert sketch.counts == {"python": 3, "students": 1, "courses": 1}
+    
+    def test_memory_is_bounded(self):
+        """Test that the sketch never holds more than its capacity"""
+        sketch = SpaceSaving(capacity=20)
+        for i in range(10_000):
+            sketch.add(f"word{i}")
+            sketch.add("frequent")
+        
+        assert len(sketch) == 20
+        assert sketch.top(1)[0][0] == "frequent"
+        assert len(sketch._heap) <= 4 * 20 + 1
+    
+    def test_merge(self):
+        """Test merging two sketches adds their counts"""
+        a, b = SpaceSaving(10), SpaceSaving(10)
+        a.add("python", 2)
+        b.add("python", 3)
+        b.add("java")
+        a.merge(b)
+        
+        assert a.counts == {"python": 5, "java": 1}
+
+
+class TestSlidingWindowTopK:
+    """Test cases for windowed keyword trends"""
+    
+    def test_windows_expire_old_items(self):
+        """Test that items fall out of windows they no longer belong to"""
+        now = 1_700_000_000
+        trends = SlidingWindowTopK(capacity=10)
+        trends.add(["python"], timestamp=now - 3 * 24 * 3600)
+        trends.add(["courses"], timestamp=now - 3 * 3600)
+        trends.add(["students", "students"], timestamp=now - 60)
+        
+        assert trends.top("hour", now=now) == [("students", 2)]
+        assert dict(trends.top("day", now=now)) == {"students": 2, "courses": 1}
+        assert dict(trends.top("week", now=now)) == {"students": 2, "courses": 1, "python": 1}
+    
+    def test_unknown_window(self):
+        """Test that unknown windows are rejected"""
+        with pytest.raises(ValueError):
+            SlidingWindowTopK().top("month")
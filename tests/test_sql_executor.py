@@ -1,5 +1,7 @@
 import pytest
+import threading
 from datetime import datetime
+from app.cache import LRUCache, NamespacedCache, SQLiteCache
 from app.models import Student, Course, Enrollment
 from app.sql_executor import SQLExecutor
 
@@ -76,3 +78,78 @@ class TestSQLExecutor:
         rows = [MockRow(42)]
         result = executor._process_results(rows)
         assert result == 42
+    
+    def test_execute_query_updates_rollup_buckets(self, test_db):
+        """Test that logging a query also updates the timeseries buckets"""
+        from app.models import QueryLogBucket
+        
+        executor = SQLExecutor()
+        executor.execute_query(test_db, "SELECT COUNT(*) FROM students", "How many students?")
+        
+        buckets = test_db.query(QueryLogBucket).all()
+        assert sorted(b.granularity for b in buckets) == ["hour", "minute"]
+        assert all(b.query_count == 1 for b in buckets)
+    
+    async def test_execute_query_async(self, test_db, async_db):
+        """Test the async execution path and its query log"""
+        from app.models import QueryLog, QueryLogBucket
+        
+        test_db.add(Student(name="Async Student", grade=10, created_at=datetime.now()))
+        test_db.commit()
+        
+        executor = SQLExecutor()
+        result, execution_time = await executor.execute_query_async(
+            async_db, "SELECT COUNT(*) FROM students", "How many students?"
+        )
+        
+        assert result == 1
+        assert execution_time >= 0
+        assert test_db.query(QueryLog).one().question == "How many students?"
+        assert test_db.query(QueryLogBucket).count() == 2
+    
+    async def test_shared_result_cache_runs_off_the_event_loop(self, tmp_path, async_db):
+        """Test that a blocking result cache is read and written in a worker thread"""
+        cache = NamespacedCache(SQLiteCache(str(tmp_path / "cache.db")), "result")
+        threads = []
+        get, set_ = cache.get, cache.set
+        cache.get = lambda *args: threads.append(threading.current_thread()) or get(*args)
+        cache.set = lambda *args: threads.append(threading.current_thread()) or set_(*args)
+        
+        executor = SQLExecutor(result_cache=cache)
+        sql = "SELECT COUNT(*) FROM students"
+        assert (await executor.execute_query_async(async_db, sql, "count"))[0] == 0
+        assert (await executor.execute_query_async(async_db, sql, "count"))[0] == 0
+        assert len(threads) == 3
+        assert threading.main_thread() not in threads
+        assert cache.blocking and not LRUCache().blocking
+    
+    async def test_execute_invalid_query_async(self, async_db):
+        """Test that async execution errors are raised"""
+        with pytest.raises(Exception, match="Query execution failed"):
+            await SQLExecutor().execute_query_async(async_db, "SELECT * FROM nonexistent_table", "Invalid")
+    
+    def test_execute_query_with_parameters(self, test_db):
+        """Test bind-parameter execution, per-value result caching and logging"""
+        from app.models import QueryLog
+        from app.cache import LRUCache
+        
+        test_db.add_all([
+            Student(name="Grade Ten", grade=10, created_at=datetime.now()),
+            Student(name="Grade Eleven", grade=11, created_at=datetime.now())
+        ])
+        test_db.commit()
+        
+        executor = SQLExecutor(result_cache=LRUCache())
+        sql = "SELECT name FROM students WHERE grade = :grade"
+        ten, _ = executor.execute_query(test_db, sql, "Grade 10", params={"grade": 10})
+        eleven, _ = executor.execute_query(test_db, sql, "Grade 11", params={"grade": 11})
+        
+        assert ten == "Grade Ten"
+        assert eleven == "Grade Eleven"
+        assert executor._cached_result(sql, {"grade": 10}) == "Grade Ten"
+        
+        logged = [log.generated_sql for log in test_db.query(QueryLog).order_by(QueryLog.id)]
+        assert logged == [
+            "SELECT name FROM students WHERE grade = 10",
+            "SELECT name FROM students WHERE grade = 11"
+        ]
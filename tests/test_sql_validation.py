@@ -0,0 +1,51 @@
+import pytest
+from app.sql_validation import check_sql, validate_sql, _verdicts
+
+
+class TestSQLValidation:
+    """Test cases for the SQL lexer and validator"""
+    
+    @pytest.mark.parametrize("sql", [
+        "SELECT name, updated_at FROM students ORDER BY created_at DESC",
+        "SELECT * FROM courses WHERE name = 'Create Art'",
+        "SELECT \"update\" FROM t",
+        "SELECT replace(name, 'a', 'b') FROM students",
+        "WITH recent AS (SELECT * FROM enrollments) SELECT COUNT(*) FROM recent;",
+        "SELECT 1 -- DROP TABLE students",
+        "SELECT /* DELETE */ 1",
+        "SELECT 'it''s; fine'",
+        "SELECT name FROM pragma_table_info('students')",
+    ])
+    def test_accepts_read_only_queries(self, sql):
+        """Test that keywords inside identifiers, strings and comments are ignored"""
+        assert check_sql(sql) is None
+    
+    @pytest.mark.parametrize("sql, reason", [
+        ("SELECT 1; DROP TABLE students", "Multiple statements"),
+        ("SELECT 1; SELECT 2", "Multiple statements"),
+        ("WITH x AS (SELECT 1) DELETE FROM students", "forbidden keyword: DELETE"),
+        ("REPLACE INTO students VALUES (1, 'x', 9)", "forbidden keyword: REPLACE"),
+        ("PRAGMA table_info(students)", "forbidden keyword: PRAGMA"),
+        ("EXPLAIN SELECT 1", "Only SELECT queries are allowed"),
+        ("SELECT 'unterminated", "Unterminated string literal"),
+        ("", "Only SELECT queries are allowed"),
+    ])
+    def test_rejects_unsafe_queries(self, sql, reason):
+        """Test rejection reasons"""
+        assert reason in check_sql(sql)
+    
+    def test_literals_are_opaque(self):
+        """Test that statement separators inside literals and comments are ignored"""
+        assert check_sql("SELECT [drop;], 'a -- b; c' FROM t; -- tail; DROP") is None
+        assert check_sql("SELECT `x` FROM t /* ; DELETE */;;") is None
+        assert "Unterminated comment" in check_sql("SELECT 1 /* DROP")
+        assert "Unterminated quoted identifier" in check_sql("SELECT [name FROM t")
+    
+    def test_verdicts_are_memoized(self):
+        """Test that a repeated query is answered from the memo"""
+        sql = "SELECT 42 AS memo_test; DELETE FROM students"
+        with pytest.raises(ValueError, match="Multiple statements"):
+            validate_sql(sql)
+        assert any(error and "Multiple" in error for error in _verdicts.values())
+        with pytest.raises(ValueError, match="Multiple statements"):
+            validate_sql(sql)
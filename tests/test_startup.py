@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import pytest
+
+# Cumulative import time budget for ``app.main`` (microseconds)
+IMPORT_BUDGET_US = 1_500_000
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_app(code: str = "import app.main") -> subprocess.CompletedProcess:
+    """Import the app in a fresh interpreter without a Gemini API key"""
+    env = {k: v for k, v in os.environ.items() if k != "GEMINI_API_KEY"}
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+
+
+def cumulative_import_us(stderr: str, module: str) -> int:
+    """Read a module's cumulative time from ``-X importtime`` output"""
+    for line in stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+@pytest.mark.slow
+class TestStartup:
+    """Test cases for cold-start cost"""
+    
+    def test_import_without_api_key(self):
+        """Test that the app imports without GEMINI_API_KEY"""
+        result = import_app()
+        assert result.returncode == 0, result.stderr[-2000:]
+    
+    def test_llm_client_not_imported_at_startup(self):
+        """Test that google.generativeai is only imported on first LLM use"""
+        result = import_app(
+            "import sys, app.main; "
+            "assert 'google.generativeai' not in sys.modules; "
+            "assert 'app.database' in sys.modules"
+        )
+        assert result.returncode == 0, result.stderr[-2000:]
+    
+    def test_import_time_budget(self):
+        """Test that importing app.main stays within the cold-start budget"""
+        result = import_app()
+        assert result.returncode == 0, result.stderr[-2000:]
+        
+        elapsed = cumulative_import_us(result.stderr, "app.main")
+        assert elapsed < IMPORT_BUDGET_US, f"app.main imported in {elapsed / 1000:.0f} ms"
@@ -0,0 +1,105 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.config import Settings
+from app.main import app as main_app, _tenant_services, data_version
+from app.tenancy import TenantMiddleware, TenantRegistry, resolve_tenant_id, shard_of
+from tests.conftest import INGEST_HEADERS, TestSessionLocal
+
+
+def make_registry(tmp_path, **options):
+    """Registry of tenant databases in a temporary directory"""
+    return TenantRegistry(f"sqlite:///{tmp_path}/{{tenant}}.db", _tenant_services, **options)
+
+
+class TestTenantRegistry:
+    """Test cases for the per-tenant engine registry"""
+    
+    def test_database_urls(self, tmp_path):
+        """Test tenant and shard placeholders and tenant id validation"""
+        registry = TenantRegistry("sqlite:///./shard{shard}/{tenant}.db", _tenant_services, shards=4)
+        assert registry.database_url("school-a") == f"sqlite:///./shard{shard_of('school-a', 4)}/school-a.db"
+        assert shard_of("school-a", 4) == shard_of("school-a", 4) < 4
+        with pytest.raises(ValueError):
+            registry.database_url("../etc")
+        with pytest.raises(ValueError):
+            TenantRegistry("sqlite:///./shared.db", _tenant_services)
+    
+    async def test_least_recently_used_tenant_is_closed(self, tmp_path):
+        """Test that opening past the limit evicts and disposes the LRU tenant"""
+        registry = make_registry(tmp_path, max_open=2)
+        a = registry.get("a")
+        registry.get("b")
+        assert registry.lookup("a") is a
+        registry.get("c")
+        
+        assert "b" not in registry and "a" in registry and len(registry) == 2
+        assert (tmp_path / "b.db").exists()
+        await registry.close_evicted()
+        assert registry._evicted == []
+        assert registry.get("a") is a
+        await registry.close()
+        assert len(registry) == 0
+    
+    def test_resolve_tenant_id(self):
+        """Test that a mapped API key wins over the header"""
+        api_keys = {"k1": "school-b"}
+        assert resolve_tenant_id({"x-tenant-id": "school-a"}, api_keys) == "school-a"
+        assert resolve_tenant_id({"x-tenant-id": "school-a", "x-api-key": "k1"}, api_keys) == "school-b"
+        assert resolve_tenant_id({"x-tenant-id": "school-a"}, api_keys, header=None) is None
+        assert resolve_tenant_id({}, api_keys) is None
+    
+    def test_only_known_tenants_are_opened(self, tmp_path):
+        """Test that unknown tenants get no database unless one already exists"""
+        registry = make_registry(tmp_path, known_tenants={"a"})
+        registry.get("a")
+        with pytest.raises(LookupError):
+            registry.get("intruder")
+        assert not (tmp_path / "intruder.db").exists()
+        
+        (tmp_path / "provisioned.db").touch()
+        assert registry.get("provisioned").tenant_id == "provisioned"
+    
+    def test_api_keys_turn_off_the_header(self, monkeypatch):
+        """Test that the tenant header defaults to off once API keys are mapped"""
+        monkeypatch.setenv("TENANT_API_KEYS", '{"k1": "school-b"}')
+        assert Settings().tenant_header is None
+        monkeypatch.setenv("TENANT_HEADER", "X-Tenant-ID")
+        assert Settings().tenant_header == "X-Tenant-ID"
+
+
+class TestTenantRouting:
+    """Test cases for per-tenant databases behind the main app"""
+    
+    @pytest.fixture
+    def tenant_client(self, tmp_path, monkeypatch):
+        """Client of the main app with tenants in a temporary directory"""
+        # Startup touches the default database only through the data version
+        monkeypatch.setattr(data_version, "session_factory", TestSessionLocal)
+        registry = make_registry(tmp_path, known_tenants={"school-a", "school-b", "school-c"})
+        with TestClient(TenantMiddleware(main_app, registry=registry, api_keys={"k1": "school-b"})) as client:
+            yield client
+            # Pooled aiosqlite connections belong to the client's event loop
+            client.portal.call(registry.close)
+    
+    def test_tenants_see_only_their_data(self, tenant_client):
+        """Test that loads, queries, logs and stats stay within a tenant"""
+        school_a = {"X-Tenant-ID": "school-a"}
+        school_b = {"X-API-Key": "k1", "X-Tenant-ID": "school-a"}
+        params = {"question": "How many students are enrolled?"}
+        
+        loaded = tenant_client.post("/ingest/students?format=csv", content=b"name,grade\nAnn,10\n", headers={**school_a, **INGEST_HEADERS})
+        assert loaded.json()["inserted"] == 1
+        assert tenant_client.get("/query", params=params, headers=school_a).json()["result"] == 1
+        assert tenant_client.get("/query", params=params, headers=school_b).json()["result"] == 0
+        tenant_client.get("/query", params=params, headers=school_a)
+        
+        assert tenant_client.get("/stats", headers=school_a).json()["total_queries"] == 2
+        assert tenant_client.get("/stats", headers=school_b).json()["total_queries"] == 1
+        assert tenant_client.get("/stats", headers={"X-Tenant-ID": "school-c"}).json()["total_queries"] == 0
+    
+    def test_tenant_is_required(self, tenant_client):
+        """Test that requests without a valid tenant are rejected"""
+        assert tenant_client.get("/stats").status_code == 400
+        assert tenant_client.get("/stats", headers={"X-Tenant-ID": "../x"}).status_code == 400
+        assert tenant_client.get("/stats", headers={"X-Tenant-ID": "school-z"}).status_code == 404
+        assert tenant_client.get("/health").status_code == 200
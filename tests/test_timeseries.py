@@ -0,0 +1,94 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql
+from app.models import QueryLogBucket
+from app.timeseries import TimeseriesService, percentile, LATENCY_BUCKETS_MS
+
+
+class TestTimeseries:
+    """Test cases for time-bucketed query rollups"""
+    
+    def test_record_upserts_minute_and_hour_buckets(self, test_db):
+        """Test that each logged query lands in one minute and one hour bucket"""
+        service = TimeseriesService()
+        base = datetime(2024, 5, 1, 10, 15, 30)
+        for ms in (3, 40, 40):
+            service.record(test_db, ms, base)
+        service.record(test_db, 700, base + timedelta(minutes=1))
+        test_db.commit()
+        
+        minute = test_db.query(QueryLogBucket).filter_by(granularity="minute").order_by(QueryLogBucket.bucket_start).all()
+        hour = test_db.query(QueryLogBucket).filter_by(granularity="hour").all()
+        
+        assert [b.query_count for b in minute] == [3, 1]
+        assert minute[0].total_execution_ms == 83
+        assert minute[0].max_execution_ms == 40
+        assert len(hour) == 1 and hour[0].query_count == 4
+        assert hour[0].max_execution_ms == 700
+    
+    def test_get_timeseries_percentiles(self, test_db):
+        """Test throughput and percentiles merged across buckets"""
+        service = TimeseriesService()
+        base = datetime(2024, 5, 1, 10, 0, 0)
+        for i in range(100):
+            service.record(test_db, 5 if i < 90 else 1500, base + timedelta(minutes=i % 10))
+        test_db.commit()
+        
+        stats = service.get_timeseries(test_db, base, base + timedelta(hours=1))
+        
+        assert stats["granularity"] == "minute"
+        assert stats["total_queries"] == 100
+        assert len(stats["buckets"]) == 10
+        assert stats["p50_ms"] <= 5
+        assert 1000 <= stats["p95_ms"] <= 1500
+        assert stats["max_execution_ms"] == 1500
+    
+    def test_long_ranges_use_hour_buckets(self, test_db):
+        """Test that granularity is chosen from the range length"""
+        service = TimeseriesService()
+        service.record(test_db, 10, datetime(2024, 5, 1, 10, 0))
+        service.record(test_db, 10, datetime(2024, 5, 1, 20, 0))
+        test_db.commit()
+        
+        stats = service.get_timeseries(test_db, datetime(2024, 5, 1), datetime(2024, 5, 2))
+        assert stats["granularity"] == "hour"
+        assert stats["total_queries"] == 2
+    
+    def test_short_ranges_past_minute_retention_use_hour_buckets(self, test_db):
+        """Test that ranges whose minute buckets were pruned are answered from hours"""
+        service = TimeseriesService(minute_retention=timedelta(days=7))
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=30)
+        service.record(test_db, 10, start + timedelta(minutes=5))
+        test_db.commit()
+        test_db.query(QueryLogBucket).filter(QueryLogBucket.granularity == "minute").delete()
+        test_db.commit()
+        
+        stats = service.get_timeseries(test_db, start, start + timedelta(hours=1))
+        assert stats["granularity"] == "hour"
+        assert stats["total_queries"] == 1
+        assert service.get_timeseries(test_db, datetime.utcnow() - timedelta(hours=1), datetime.utcnow())["granularity"] == "minute"
+    
+    def test_upserts_per_dialect(self):
+        """Test the PostgreSQL upsert and that other dialects skip the buckets"""
+        service = TimeseriesService()
+        statement = next(service._upserts("postgresql", 42, datetime(2024, 5, 1)))
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (granularity, bucket_start) DO UPDATE" in sql
+        assert "greatest(" in sql and "jsonb_set(" in sql
+        
+        assert list(service._upserts("mysql", 42, datetime(2024, 5, 1))) == []
+    
+    def test_percentile_empty_histogram(self):
+        """Test percentile without data"""
+        assert percentile([0] * (len(LATENCY_BUCKETS_MS) + 1), 0.95) is None
+    
+    def test_timeseries_endpoint(self, client):
+        """Test the /stats/timeseries endpoint"""
+        response = client.get("/stats/timeseries")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_queries"] == 0
+        assert data["p95_ms"] is None
+        
+        response = client.get("/stats/timeseries?start=2024-01-02T00:00:00&end=2024-01-01T00:00:00")
+        assert response.status_code == 400
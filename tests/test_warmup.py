@@ -0,0 +1,73 @@
+import pytest
+from datetime import datetime
+from app.models import Student, QueryLog
+from app.nlp2sql import NLP2SQLService, normalize_question
+from app.sql_executor import SQLExecutor
+from app.cache import LRUCache
+from app.warmup import CacheWarmer
+
+
+def log(question, sql, n=1):
+    return [QueryLog(question=question, generated_sql=sql, execution_time=5) for _ in range(n)]
+
+
+class TestCacheWarmer:
+    """Test cases for cache warming from the query log"""
+    
+    def test_primes_top_questions_without_llm(self, test_db, monkeypatch):
+        """Test that the most frequent questions are primed with their logged SQL"""
+        test_db.add_all(
+            log("Show the oldest student", "SELECT name FROM students ORDER BY grade DESC LIMIT 1", 3)
+            + log("Count all courses", "SELECT COUNT(*) FROM courses", 2)
+            + log("Rare question", "SELECT 1", 1)
+        )
+        test_db.commit()
+        
+        service = NLP2SQLService()
+        monkeypatch.setattr(NLP2SQLService, "model", property(lambda self: pytest.fail("LLM called")))
+        warmer = CacheWarmer(service, SQLExecutor(), top_n=2, rate_per_second=0)
+        
+        summary = warmer.warm(test_db)
+        
+        assert summary["primed_questions"] == 2
+        assert service.generate_sql("show the oldest student?") == \
+            "SELECT name FROM students ORDER BY grade DESC LIMIT 1"
+        assert service.sql_cache.get(normalize_question("Rare question")) is None
+    
+    def test_skips_unsafe_logged_sql(self, test_db):
+        """Test that logged SQL failing validation is not primed"""
+        test_db.add_all(log("Remove everyone", "DELETE FROM students", 5))
+        test_db.commit()
+        
+        service = NLP2SQLService()
+        summary = CacheWarmer(service, SQLExecutor(), rate_per_second=0).warm(test_db)
+        
+        assert summary["primed_questions"] == 0
+        assert len(service.sql_cache) == 0
+    
+    def test_warms_result_cache(self, test_db):
+        """Test optional result cache warming"""
+        test_db.add(Student(name="Alice", grade=10, created_at=datetime.now()))
+        test_db.add_all(log("Count all students", "SELECT COUNT(*) FROM students", 2))
+        test_db.commit()
+        
+        executor = SQLExecutor(result_cache=LRUCache())
+        summary = CacheWarmer(
+            NLP2SQLService(), executor, rate_per_second=0, warm_results=True
+        ).warm(test_db)
+        
+        assert summary["primed_results"] == 1
+        assert executor._cached_result("SELECT COUNT(*) FROM students") == 1
+    
+    def test_health_not_ready_until_warm(self, client):
+        """Test that /health reports 503 until warm-up has finished"""
+        warmer = client.app.state.cache_warmer
+        warmer.ready.clear()
+        try:
+            response = client.get("/health")
+            assert response.status_code == 503
+            assert response.json() == {"status": "warming_up"}
+        finally:
+            warmer.ready.set()
+        
+        assert client.get("/health").status_code == 200